@@ -0,0 +1,149 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from month_calendar import get_month_calendar
+from schedule_ortools import generate_schedule_ortools
+from real_shift import generate_real_schedule, save_real_schedule_to_xlsx, _count_shifts
+from excel_export import save_schedule_to_xlsx
+from decomposition import ScheduleMonth, RealShiftMonth, split_quota, fits_carry_in, reconcile_month
+
+# Batch solving of a range of months. The months are solved concurrently in a process
+# pool without knowing each other. A boundary-fix pass then walks the months in order:
+# when a month's first days break a rest rule against the previous month's last days
+# (night -> day, 3-day windows, rest after a weekend), the month is re-solved with those
+# days carried in, changing as few assignments as possible. The pass is pipelined with
+# the pool (month m is fixed while later months are still solving) and every finished
+# month is exported by a background thread while the next one is fixed.
+
+
+def month_range(start, end):
+    """
+    Months from start to end inclusive.
+    Args:
+        start / end: "YYYY-MM" strings
+    Returns:
+        list of (year, month)
+    """
+    year, month = map(int, start.split("-"))
+    end_year, end_month = map(int, end.split("-"))
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def scale_quotas(doctor_data, calendar):
+    """
+    Quotas of another month with each doctor's share kept. The raw quotas (before
+    adjust_doctor_data for the monthly model) of each period and shift type add up to the
+    number of days of that period, so they are rescaled to the days of `calendar`.
+    Doctors without data are left out.
+    """
+    doctors = [doc for doc, data in doctor_data.items() if data]
+    scaled = {doc: {"weekday": {}, "weekend": {}} for doc in doctors}
+    for period, days in (("weekday", calendar.weekday_days), ("weekend", calendar.weekend_days)):
+        for shift in ("ER", "ward"):
+            current = {doc: doctor_data[doc][period][shift] for doc in doctors}
+            for doc, quota in split_quota(current, len(days), sum(current.values())).items():
+                scaled[doc][period][shift] = quota
+    return scaled
+
+
+def _solve_schedule_month(spec, time_limit_seconds, profile):
+    return generate_schedule_ortools(spec.year, spec.month, spec.doctor_data,
+                                     time_limit_seconds=time_limit_seconds, profile=profile) or None
+
+
+def _solve_real_month(spec, time_limit_seconds, profile):
+    result = generate_real_schedule(spec.year, spec.month, spec.doctor_data, spec.date_doubles,
+                                    doctor_date_off=spec.doctor_date_off, time_limit_seconds=time_limit_seconds,
+                                    pinned=spec.pinned, no_shift=spec.no_shift, profile=profile)
+    return result[0] if result else None
+
+
+def _save_schedule_month(spec, schedule, output_dir):
+    save_schedule_to_xlsx(schedule, filename=os.path.join(output_dir, f"schedule_{spec.year}_{spec.month:02d}.xlsx"),
+                          calendar=get_month_calendar(spec.year, spec.month))
+
+
+def _save_real_month(spec, schedule, output_dir):
+    save_real_schedule_to_xlsx(schedule, _count_shifts(schedule),
+                               filename=os.path.join(output_dir, f"real_schedule_{spec.year}_{spec.month:02d}.xlsx"),
+                               calendar=get_month_calendar(spec.year, spec.month))
+
+
+def _run_batch(specs, solve_month, save_month, processes, time_limit_seconds, profile, output_dir):
+    results = {}
+    with ProcessPoolExecutor(max_workers=processes) as pool, ThreadPoolExecutor(max_workers=1) as writer:
+        jobs = [pool.submit(solve_month, spec, time_limit_seconds, profile) for spec in specs]
+        exports, previous = [], None
+        for spec, job in zip(specs, jobs):
+            label = f"{spec.year}-{spec.month:02d}"
+            schedule = job.result()
+            if schedule is None:
+                print(f"[Batch] {label}: no solution")
+                previous = None
+                continue
+            if previous is not None and not fits_carry_in(spec, schedule, previous):
+                print(f"[Batch] {label}: breaks a rest rule after the previous month, fixing the boundary")
+                fixed = reconcile_month(spec, schedule, carry_in=previous, time_limit_seconds=time_limit_seconds,
+                                        profile=profile)
+                if fixed is None:
+                    print(f"[Batch] {label}: no boundary fix found, keeping the month as solved")
+                else:
+                    schedule = fixed
+            print(f"[Batch] {label}: done")
+            results[(spec.year, spec.month)] = schedule
+            exports.append(writer.submit(save_month, spec, schedule, output_dir))
+            previous = schedule
+        for export in exports:
+            export.result()
+    return results
+
+
+def batch_schedule(months, doctor_data, processes=None, time_limit_seconds=300, profile=None, output_dir="."):
+    """
+    Solve a range of months of the monthly (schedule_ortools) model concurrently.
+    Args:
+        months: list of (year, month), consecutive and in order
+        doctor_data: raw quotas, rescaled to each month with scale_quotas
+        processes: worker processes (default: one per CPU)
+        time_limit_seconds: limit of each month solve and of each boundary fix
+        profile: solver profile name, parameter dict or JSON profile path
+        output_dir: where schedule_YYYY_MM.xlsx files are written
+    Returns:
+        dict (year, month) -> schedule, without the months that have no solution
+    """
+    specs = [ScheduleMonth(year, month, scale_quotas(doctor_data, get_month_calendar(year, month)))
+             for year, month in months]
+    return _run_batch(specs, _solve_schedule_month, _save_schedule_month, processes, time_limit_seconds,
+                      profile, output_dir)
+
+
+def batch_real_schedule(months, processes=None, time_limit_seconds=60, profile=None, output_dir="."):
+    """
+    Solve a range of real_shift months concurrently (arguments as batch_schedule).
+    Args:
+        months: list of RealShiftMonth, consecutive and in order
+    Returns:
+        dict (year, month) -> schedule ({date: {"ER": doctor, "ward": doctor}})
+    """
+    return _run_batch(months, _solve_real_month, _save_real_month, processes, time_limit_seconds, profile,
+                      output_dir)
+
+
+def real_shift_months(months, doctor_data, date_doubles, doctor_date_off=None, pinned=None, no_shift=None,
+                      roster_month=None):
+    """
+    RealShiftMonth entries for a range of months from one roster. Dated entries (date_doubles,
+    days off, pins) apply where their dates fall; no_shift rows are day numbers, so they only
+    apply to roster_month (year, month). Quotas are rescaled to each month.
+    """
+    specs = []
+    for year, month in months:
+        calendar = get_month_calendar(year, month)
+        month_pins = {d: doc for d, doc in (pinned or {}).items() if d in calendar.day_index}
+        specs.append(RealShiftMonth(year, month, scale_quotas(doctor_data, calendar), date_doubles,
+                                    doctor_date_off, month_pins,
+                                    no_shift if (year, month) == roster_month else None))
+    return specs
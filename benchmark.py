@@ -0,0 +1,153 @@
+import argparse
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from ortools.sat.python import cp_model
+from doctor_data import SHIFT_TIMES, adjust_doctor_data
+from month_calendar import get_month_calendar
+from schedule_ortools import build_schedule_model, FORMULATIONS
+from solver_tools import make_solver, FirstSolutionTimer
+from tuning import balanced_quotas, format_time, march_instance, score_config
+
+# Benchmark of the schedule_ortools formulations. Every (formulation, instance) pair is one
+# run, solved in its own process on a freshly built model; a run records the model size,
+# the build time, when the first solution was found and when optimality was proved.
+# Instances are grouped by roster size, and the formulation that proves more of a size's
+# instances optimal, then faster, is recommended for it (same order as tuning.score_config).
+
+# One month of the schedule model: quotas already adjusted with adjust_doctor_data.
+BenchmarkInstance = namedtuple("BenchmarkInstance", ["name", "year", "month", "doctor_data", "autopsy_data"])
+
+# Outcome of one run, first_solution / optimal as in tuning.TrialResult.
+BenchmarkResult = namedtuple("BenchmarkResult", ["formulation", "instance", "doctors", "variables", "constraints",
+                                                 "build_time", "status", "objective", "first_solution", "optimal",
+                                                 "wall_time"])
+
+
+def march_benchmark_instance():
+    """tuning.march_instance, the March case solved by main.py, with its quotas adjusted."""
+    march = march_instance()
+    return BenchmarkInstance(march.name, march.year, march.month, adjust_doctor_data(march.data["doctor_data"]),
+                             march.data["autopsy_data"])
+
+
+def roster_instances(sizes, per_size=2, autopsies=2, seed=0, year=2026):
+    """
+    Generated months with `size` doctors each, balanced quotas and `autopsies` random
+    autopsies per doctor. The autopsies can make an instance infeasible; such runs
+    simply report INFEASIBLE.
+    """
+    rng = random.Random(seed)
+    instances = []
+    for size in sizes:
+        for k in range(per_size):
+            month = rng.randint(1, 12)
+            calendar = get_month_calendar(year, month)
+            doctors = [f"doctor-{n + 1}" for n in range(size)]
+            autopsy_data = {
+                doc: [(rng.choice(calendar.days), rng.choice(list(SHIFT_TIMES.values()))) for _ in range(autopsies)]
+                for doc in doctors
+            }
+            instances.append(BenchmarkInstance(f"{size}-doctors-{k + 1}", year, month,
+                                               adjust_doctor_data(balanced_quotas(calendar, doctors, rng)),
+                                               autopsy_data))
+    return instances
+
+
+def run_benchmark(formulation, instance, time_limit_seconds, profile=None):
+    """
+    Build and solve one instance with one formulation.
+    Returns:
+        BenchmarkResult
+    """
+    calendar = get_month_calendar(instance.year, instance.month)
+    start = time.perf_counter()
+    sm = build_schedule_model(calendar, instance.doctor_data, autopsy_data=instance.autopsy_data,
+                              formulation=formulation)
+    build_time = time.perf_counter() - start
+    variables, constraints = sm.stats()
+    solver = make_solver(time_limit_seconds, profile)
+    timer = FirstSolutionTimer()
+    status = solver.Solve(sm.model, timer)
+    found = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return BenchmarkResult(
+        formulation=formulation,
+        instance=instance.name,
+        doctors=len(instance.doctor_data),
+        variables=variables,
+        constraints=constraints,
+        build_time=build_time,
+        status=solver.StatusName(status),
+        objective=solver.ObjectiveValue() + 0.0 if found else None,
+        first_solution=timer.first,
+        optimal=solver.WallTime() if status == cp_model.OPTIMAL else None,
+        wall_time=solver.WallTime(),
+    )
+
+
+def _run_benchmark(args):
+    return run_benchmark(*args)
+
+
+def benchmark_formulations(instances, formulations=FORMULATIONS, time_limit_seconds=60, processes=2, profile=None):
+    """
+    Run every formulation on every instance in parallel processes.
+    Returns:
+        list of BenchmarkResult, in (instance, formulation) order
+    """
+    jobs = [(formulation, instance, time_limit_seconds, profile)
+            for instance in instances for formulation in formulations]
+    print(f"[Benchmark] {len(formulations)} formulations x {len(instances)} instances, "
+          f"{processes} processes, {time_limit_seconds}s per run")
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(_run_benchmark, jobs))
+
+
+def recommend_formulations(results, time_limit_seconds):
+    """
+    Faster formulation per roster size.
+    Returns:
+        dict number of doctors -> formulation
+    """
+    by_size = {}
+    for result in results:
+        by_size.setdefault(result.doctors, {}).setdefault(result.formulation, []).append(result)
+    return {
+        size: min(runs, key=lambda formulation: score_config(runs[formulation], time_limit_seconds))
+        for size, runs in sorted(by_size.items())
+    }
+
+
+def print_results(results, time_limit_seconds):
+    """Print model size and timings per run, then the recommended formulation per roster size."""
+    for result in results:
+        print(f"{result.instance:<16} {result.formulation:<9} {result.variables:>6} vars {result.constraints:>6} cons  "
+              f"build {result.build_time:.3f}s  {result.status:<10} first {format_time(result.first_solution):>8}  "
+              f"optimal {format_time(result.optimal):>8}")
+    for size, formulation in recommend_formulations(results, time_limit_seconds).items():
+        print(f"[Benchmark] {size} doctors: {formulation}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the Boolean and interval schedule_ortools formulations")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[6, 9, 12, 16], metavar="DOCTORS",
+                        help="Roster sizes of the generated instances (default: 6 9 12 16)")
+    parser.add_argument("--per-size", type=int, default=2, metavar="N",
+                        help="Generated instances per roster size (default: 2)")
+    parser.add_argument("--autopsies", type=int, default=2, metavar="N",
+                        help="Random autopsies per doctor in the generated instances (default: 2)")
+    parser.add_argument("--no-march", action="store_true", help="Leave out the March instance")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated instances (default: 0)")
+    parser.add_argument("--time-limit", type=float, default=60, metavar="SECONDS",
+                        help="Time limit of each run (default: 60)")
+    parser.add_argument("--processes", type=int, default=2, help="Runs solved in parallel (default: 2)")
+    parser.add_argument("--profile", default=None, metavar="NAME|FILE",
+                        help="Solver parameter profile of every run (default: balanced)")
+    args = parser.parse_args()
+
+    instances = [] if args.no_march else [march_benchmark_instance()]
+    instances += roster_instances(args.sizes, per_size=args.per_size, autopsies=args.autopsies, seed=args.seed)
+    results = benchmark_formulations(instances, time_limit_seconds=args.time_limit, processes=args.processes,
+                                     profile=args.profile)
+    print_results(results, args.time_limit)
@@ -1,5 +1,8 @@
-import datetime
+from array import array
+from functools import lru_cache
 from doctor_data import THAI_HOLIDAYS, SHIFT_TIMES, DOCTOR_AUTOPSY_DATA
+from month_calendar import calendar_for_schedule
+from rules import compile_rules, TIMES_PER_DAY
 
 def is_weekend(date):
     return date.weekday() >= 5
@@ -11,65 +14,109 @@ def is_weekday(date):
     return not is_weekend(date) and not is_holiday(date)
 
 def violates_constraints(schedule, doctor, date, shift_type, shift_time):
-    # No double booking in ER and ward at the same time, unless it's the same shift type (current shift)
-    for s_type, s_time, d in schedule[date]:
-        if d == doctor and s_time == shift_time:
-            # Allow if it's the current shift (same type and time)
-            if s_type != shift_type:
+    """
+    Whether `doctor` taking (shift_type, shift_time) on `date` breaks a rule of rules.SHIFT_RULES
+    or an autopsy block, given the other assignments of `schedule`. The ConstraintChecker is shared
+    per month and doctor set, but the schedule is reloaded on every call; use one ConstraintChecker
+    directly to check many assignments.
+    """
+    doctors = frozenset({doctor} | {d for shifts in schedule.values() for _, _, d in shifts})
+    checker = _shared_checker(calendar_for_schedule(schedule) or calendar_for_schedule({date: []}), doctors)
+    checker.load_schedule(schedule)
+    return checker.violates(doctor, date, shift_type, shift_time)
+
+
+@lru_cache(maxsize=32)
+def _shared_checker(calendar, doctors):
+    return ConstraintChecker(calendar, sorted(doctors))
+
+
+SHIFT_TIME_INDEX = {SHIFT_TIMES["DAY"]: 0, SHIFT_TIMES["EVENING"]: 1, SHIFT_TIMES["NIGHT"]: 2}
+SHIFT_TYPE_INDEX = {"ER": 0, "ward": 1}
+
+# Number of shifts held at one position, indexed by its 2-bit (ER, ward) mask
+_SHIFTS_AT_TIME = (0, 1, 1, 2)
+
+
+class ConstraintChecker:
+    """
+    Annealer and post-solve form of the compiled rules (rules.compile_rules), built once per MonthCalendar.
+    Keeps a 2-bit (ER, ward) occupancy mask per doctor and timeline position and the autopsy
+    conflicts as a bitmask of blocked shift times per doctor and day, so checking one
+    assignment is a walk over the position's precomputed rule tables.
+    Doctors and days are addressed by index for the annealer; days are 1-based with a
+    padding day on each side of the month, so day `day` and time t are position 3 * day + t.
+    The date-based helpers serve post-solve checks.
+    """
+
+    def __init__(self, calendar, doctors, autopsy_data=None):
+        self.rules = compile_rules(calendar)
+        self.days = calendar.days
+        self.doctors = list(doctors)
+        self.doctor_index = {doctor: i for i, doctor in enumerate(self.doctors)}
+        self.day_index = {date: day for day, date in enumerate(self.days, start=1)}
+        self.num_day_slots = len(self.days) + 2
+        self.num_positions = self.rules.num_positions
+        self.occupancy = array("b", [0] * (len(self.doctors) * self.num_positions))
+
+        # Autopsy conflicts: shift times blocked for a doctor on a padded day
+        if autopsy_data is None:
+            autopsy_data = DOCTOR_AUTOPSY_DATA
+        self.blocked = array("b", [0] * (len(self.doctors) * self.num_day_slots))
+        for doctor, autopsies in autopsy_data.items():
+            if doctor not in self.doctor_index:
+                continue
+            base = self.doctor_index[doctor] * self.num_day_slots
+            for autopsy_date, autopsy_time in autopsies:
+                for p in self.rules.autopsy_positions(autopsy_date, SHIFT_TIME_INDEX[autopsy_time]):
+                    day, t = divmod(p, TIMES_PER_DAY)
+                    self.blocked[base + day] |= 1 << t
+
+    def clear(self):
+        for i in range(len(self.occupancy)):
+            self.occupancy[i] = 0
+
+    def add(self, doc, day, shift_type, t):
+        self.occupancy[doc * self.num_positions + TIMES_PER_DAY * day + t] |= 1 << shift_type
+
+    def remove(self, doc, day, shift_type, t):
+        self.occupancy[doc * self.num_positions + TIMES_PER_DAY * day + t] &= ~(1 << shift_type)
+
+    def violates_at(self, doc, day, shift_type, t):
+        """Whether doctor `doc` taking shift (shift_type, t) on `day` breaks a rule, given the other shifts."""
+        occupancy = self.occupancy
+        base = doc * self.num_positions
+        p = TIMES_PER_DAY * day + t
+        # Same time: the other shift type at this position
+        if 1 + _SHIFTS_AT_TIME[occupancy[base + p] & (0b10 >> shift_type)] > self.rules.same_time_limit:
+            return True
+        # Windows and sequences through this position
+        for others, budget in self.rules.checks[p]:
+            if sum(_SHIFTS_AT_TIME[occupancy[base + q]] for q in others) > budget:
                 return True
-    # No more than 2 consecutive shifts for a doctor
-    prev_date = date - datetime.timedelta(days=1)
-    next_date = date + datetime.timedelta(days=1)
-    consecutive_count = 1
-    if shift_time == SHIFT_TIMES["DAY"]:
-        for s_type, s_time, d in schedule.get(prev_date, []):
-            if d == doctor and s_time == SHIFT_TIMES["NIGHT"]:
-                consecutive_count += 1
-        for s_type, s_time, d in schedule.get(date, []):
-            if d == doctor and s_time == SHIFT_TIMES["EVENING"]:
-                consecutive_count += 1
-    if shift_time == SHIFT_TIMES["EVENING"]:
-        if is_weekday(date):
-            consecutive_count += 1
-            for s_type, s_time, d in schedule.get(date, []):
-                if d == doctor and s_time == SHIFT_TIMES["NIGHT"]:
-                    consecutive_count += 1
-        else:
-            for s_type, s_time, d in schedule.get(date, []):
-                if d == doctor and s_time != SHIFT_TIMES["EVENING"]:
-                    consecutive_count += 1
-    if shift_time == SHIFT_TIMES["NIGHT"]:
-        if is_weekday(next_date):
-            consecutive_count += 1
-            for s_type, s_time, d in schedule.get(next_date, []):
-                if d == doctor and s_time == SHIFT_TIMES["EVENING"]:
-                    consecutive_count += 1
-        else:
-            for s_type, s_time, d in schedule.get(next_date, []):
-                if d == doctor and s_time == SHIFT_TIMES["DAY"]:
-                    consecutive_count += 1000  # Large number to ensure violation
-        for s_type, s_time, d in schedule.get(date, []):
-            if d == doctor and s_time == SHIFT_TIMES["EVENING"]:
-                consecutive_count += 1
-    if consecutive_count > 2:
-        return True
-        
-    # Prevent scheduling a doctor for a shift that overlaps with their autopsy assignment
-    if doctor in DOCTOR_AUTOPSY_DATA:
-        for autopsy_date, autopsy_time in DOCTOR_AUTOPSY_DATA[doctor]:
-            if autopsy_date == date:
-                if autopsy_time == shift_time:
-                    return True
-                if autopsy_time == SHIFT_TIMES["DAY"]:
-                    return True
-                if autopsy_time == SHIFT_TIMES["EVENING"] and shift_time == SHIFT_TIMES["DAY"]:
-                    return True
-                if autopsy_time == SHIFT_TIMES["NIGHT"] and shift_time == SHIFT_TIMES["DAY"]:
-                    return True
-            if autopsy_date == prev_date:
-                if autopsy_time == SHIFT_TIMES["EVENING"] and shift_time == SHIFT_TIMES["NIGHT"]:
-                    return True
-            if autopsy_date == next_date:
-                if autopsy_time == SHIFT_TIMES["NIGHT"] and shift_time == SHIFT_TIMES["EVENING"]:
-                    return True
-    return False
+        # Autopsy conflicts
+        return bool(self.blocked[doc * self.num_day_slots + day] >> t & 1)
+
+    def load_schedule(self, schedule):
+        """Replace the occupancy index with the assignments of a date-keyed schedule."""
+        self.clear()
+        for date, shifts in schedule.items():
+            for shift_type, shift_time, doctor in shifts:
+                if doctor in self.doctor_index and date in self.day_index:
+                    self.add(self.doctor_index[doctor], self.day_index[date],
+                             SHIFT_TYPE_INDEX[shift_type], SHIFT_TIME_INDEX[shift_time])
+
+    def violates(self, doctor, date, shift_type, shift_time):
+        """Date-based equivalent of violates_constraints against the loaded schedule."""
+        return self.violates_at(self.doctor_index[doctor], self.day_index[date],
+                                SHIFT_TYPE_INDEX[shift_type], SHIFT_TIME_INDEX[shift_time])
+
+    def find_violations(self, schedule):
+        """Load a schedule and return every (date, shift_type, shift_time, doctor) breaking a rule."""
+        self.load_schedule(schedule)
+        return [
+            (date, shift_type, shift_time, doctor)
+            for date in sorted(schedule)
+            for shift_type, shift_time, doctor in schedule[date]
+            if doctor in self.doctor_index and self.violates(doctor, date, shift_type, shift_time)
+        ]
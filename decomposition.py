@@ -0,0 +1,353 @@
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from ortools.sat.python import cp_model
+from doctor_data import adjust_doctor_data
+from month_calendar import get_month_calendar, block_calendar
+from schedule_ortools import build_schedule_model
+from real_shift import build_real_model, real_shift_stages, _count_shifts
+from solver_tools import make_solver, solve_lexicographic, LexStage
+
+# Week-block decomposition for horizons of several months.
+#
+# Each month is cut into week blocks that are solved one after another (or side by side
+# with parallel=True). A block model covers the block plus `overlap` look-ahead days, which
+# are solved so that the block does not end in a corner but are then discarded; the
+# already stitched days before the block are passed to the builder as carry_in, which
+# applies the cross-day rules (night -> day, 3-day windows, rest after a weekend) at the
+# boundary. Quotas are split over the blocks in proportion to the slots each block covers
+# and are only soft inside a block. A final reconciliation solve per month restores the
+# exact quotas while keeping as much of the stitched schedule as possible. Every model is
+# at most one month wide, so the horizon can grow without the model growing with it.
+
+BLOCK_DAYS = 7
+OVERLAP_DAYS = 2
+
+# One month of a schedule_ortools horizon; doctor_data holds raw quotas (before
+# adjust_doctor_data), autopsy_data defaults to DOCTOR_AUTOPSY_DATA.
+ScheduleMonth = namedtuple("ScheduleMonth", ["year", "month", "doctor_data", "autopsy_data"], defaults=(None,))
+
+# One month of a real_shift horizon, with the inputs of build_real_model.
+RealShiftMonth = namedtuple("RealShiftMonth", ["year", "month", "doctor_data", "date_doubles",
+                                               "doctor_date_off", "pinned", "no_shift"],
+                            defaults=(None, None, None))
+
+
+def week_blocks(calendar, block_days=BLOCK_DAYS, overlap=OVERLAP_DAYS):
+    """
+    Blocks of a month as (start, stop, solve_stop) day indices: the block keeps days
+    [start, stop) and its model covers [start, solve_stop). A tail shorter than half a
+    block is merged into the block before it.
+    """
+    n_days = len(calendar.days)
+    starts = list(range(0, n_days, block_days))
+    if len(starts) > 1 and n_days - starts[-1] < block_days / 2:
+        starts.pop()
+    stops = starts[1:] + [n_days]
+    return [(start, stop, min(stop + overlap, n_days)) for start, stop in zip(starts, stops)]
+
+
+def split_quota(remaining, block_slots, remaining_slots):
+    """
+    Share of the remaining quotas that falls on one block, proportional to its slots.
+    Largest-remainder rounding makes the shares add up to block_slots.
+    Args:
+        remaining: dict doctor -> shifts still to assign in the month (negative counts as 0)
+        block_slots: slots of the block
+        remaining_slots: slots left in the month, block included
+    Returns:
+        dict doctor -> target
+    """
+    remaining = {doc: max(0, count) for doc, count in remaining.items()}
+    if remaining_slots <= 0 or block_slots <= 0:
+        return {doc: 0 for doc in remaining}
+    exact = {doc: count * block_slots / remaining_slots for doc, count in remaining.items()}
+    targets = {doc: int(share) for doc, share in exact.items()}
+    missing = block_slots - sum(targets.values())
+    for doc in sorted(exact, key=lambda doc: exact[doc] - targets[doc], reverse=True)[:max(0, missing)]:
+        targets[doc] += 1
+    return targets
+
+
+class _ScheduleKind:
+    """schedule_ortools side of the decomposition: schedules are date -> [(shift_type, shift_time, doctor)]."""
+    label = "OR-Tools CP-SAT"
+
+    @staticmethod
+    def quotas(spec):
+        return adjust_doctor_data(spec.doctor_data)
+
+    @staticmethod
+    def slots(calendar, period, shift):
+        return calendar.slot_count(period, shift)
+
+    @staticmethod
+    def counts(calendar, schedule):
+        counts = defaultdict(int)
+        for date, entries in schedule.items():
+            for shift_type, _, doc in entries:
+                counts[(doc, calendar.period[date], shift_type)] += 1
+        return counts
+
+    @staticmethod
+    def solve_block(spec, calendar, targets, carry_in, time_limit_seconds, profile):
+        sm = build_schedule_model(calendar, targets, autopsy_data=spec.autopsy_data, carry_in=carry_in,
+                                  soft_quotas=True)
+        solver = make_solver(time_limit_seconds, profile)
+        status = solver.Solve(sm.model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None
+        return sm.extract_schedule(solver.Value)
+
+    @staticmethod
+    def build_month(spec, calendar, carry_in):
+        return build_schedule_model(calendar, adjust_doctor_data(spec.doctor_data), autopsy_data=spec.autopsy_data,
+                                    carry_in=carry_in)
+
+    @staticmethod
+    def assigned_vars(sm, schedule):
+        """Variables of the schedule's assignments, None where the model has no such variable."""
+        doctor_index = {doc: i for i, doc in enumerate(sm.doctors)}
+        found = []
+        for s, (date, shift_type, shift_time, _) in enumerate(sm.slots):
+            for stype, stime, doc in schedule.get(date, []):
+                if (stype, stime) == (shift_type, shift_time):
+                    found.append(sm.x[s][doctor_index[doc]] if doc in doctor_index else None)
+        return found
+
+    @staticmethod
+    def reconcile_stages(sm, kept, time_limit_seconds):
+        return [LexStage("kept", sum(kept), True, time_limit_seconds / 2),
+                LexStage("penalty", sum(sm.penalty_vars), False, time_limit_seconds / 2)]
+
+    @staticmethod
+    def schedule_of(solution):
+        return solution
+
+
+class _RealShiftKind:
+    """real_shift side of the decomposition: schedules are date -> {"ER": doctor, "ward": doctor}."""
+    label = "OR-Tools"
+
+    @staticmethod
+    def quotas(spec):
+        return spec.doctor_data
+
+    @staticmethod
+    def slots(calendar, period, shift):
+        return len(calendar.weekday_days if period == "weekday" else calendar.weekend_days)
+
+    @staticmethod
+    def counts(calendar, schedule):
+        counts = defaultdict(int)
+        for date, entry in schedule.items():
+            for shift, doc in entry.items():
+                counts[(doc, calendar.period[date], shift)] += 1
+        return counts
+
+    @staticmethod
+    def _build(spec, calendar, doctor_data, carry_in, soft_quotas):
+        return build_real_model(calendar, doctor_data, spec.date_doubles, doctor_date_off=spec.doctor_date_off,
+                                pinned=spec.pinned, no_shift=spec.no_shift, symmetry_breaking=False,
+                                carry_in=carry_in, soft_quotas=soft_quotas)
+
+    @staticmethod
+    def solve_block(spec, calendar, targets, carry_in, time_limit_seconds, profile):
+        rm = _RealShiftKind._build(spec, calendar, targets, carry_in, True)
+        solver = make_solver(time_limit_seconds, profile)
+        _, _, solution = solve_lexicographic(solver, rm.model, real_shift_stages(rm, time_limit_seconds),
+                                             rm.extract_schedule)
+        return solution[0] if solution else None
+
+    @staticmethod
+    def build_month(spec, calendar, carry_in):
+        return _RealShiftKind._build(spec, calendar, spec.doctor_data, carry_in, False)
+
+    @staticmethod
+    def assigned_vars(rm, schedule):
+        """Variables of the schedule's assignments, None where the model has no such variable."""
+        found = []
+        for d, entry in schedule.items():
+            if d in rm.er:
+                for shift, variables in (("ER", rm.er[d]), ("ward", rm.ward[d])):
+                    doc = entry[shift]
+                    found.append(variables[rm.doctors.index(doc)] if doc in rm.doctors else None)
+        return found
+
+    @staticmethod
+    def reconcile_stages(rm, kept, time_limit_seconds):
+        return [LexStage("kept", sum(kept), True, time_limit_seconds / 2)] + real_shift_stages(rm, time_limit_seconds / 2)
+
+    @staticmethod
+    def schedule_of(solution):
+        return solution[0]
+
+
+_KINDS = {ScheduleMonth: _ScheduleKind, RealShiftMonth: _RealShiftKind}
+
+
+def _reconcile(kind, spec, calendar, schedule, carry_in, time_limit_seconds, profile):
+    """Month model with exact quotas, keeping as many of the schedule's assignments as possible."""
+    m = kind.build_month(spec, calendar, carry_in)
+    m.add_hint(schedule)
+    kept = [var for var in kind.assigned_vars(m, schedule) if var is not None]
+    solver = make_solver(time_limit_seconds, profile)
+    solver.parameters.repair_hint = True
+    _, _, solution = solve_lexicographic(solver, m.model, kind.reconcile_stages(m, kept, time_limit_seconds),
+                                         m.extract_schedule)
+    return kind.schedule_of(solution) if solution else None
+
+
+def reconcile_month(spec, schedule, carry_in=None, time_limit_seconds=30, profile=None):
+    """
+    Re-solve one month (ScheduleMonth or RealShiftMonth) with exact quotas and the carried-in
+    previous days, changing as few of the schedule's assignments as possible.
+    Returns:
+        the month's schedule, None when the month has no solution
+    """
+    kind = _KINDS[type(spec)]
+    return _reconcile(kind, spec, get_month_calendar(spec.year, spec.month), schedule, carry_in,
+                      time_limit_seconds, profile)
+
+
+def fits_carry_in(spec, schedule, carry_in, time_limit_seconds=10):
+    """True when a complete month schedule still satisfies every rule after the carried-in days."""
+    kind = _KINDS[type(spec)]
+    m = kind.build_month(spec, get_month_calendar(spec.year, spec.month), carry_in)
+    assigned = kind.assigned_vars(m, schedule)
+    if any(var is None for var in assigned):
+        return False
+    for var in assigned:
+        m.model.Add(var == 1)
+    solver = make_solver(time_limit_seconds)
+    solver.parameters.stop_after_first_solution = True
+    return solver.Solve(m.model) in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+
+def _block_targets(kind, spec, calendar, start, solve_stop, assigned):
+    """Proportional quota targets (doctor_data format) of the days [start, solve_stop) of a month."""
+    quotas = kind.quotas(spec)
+    block = block_calendar(calendar, start, solve_stop)
+    rest = block_calendar(calendar, start, len(calendar.days))
+    targets = {doc: {"weekday": {}, "weekend": {}} for doc in quotas}
+    for period in ("weekday", "weekend"):
+        for shift in ("ER", "ward"):
+            remaining = {doc: quotas[doc][period][shift] - assigned[(doc, period, shift)] for doc in quotas}
+            share = split_quota(remaining, kind.slots(block, period, shift), kind.slots(rest, period, shift))
+            for doc, target in share.items():
+                targets[doc][period][shift] = target
+    return targets
+
+
+def _solve_block(kind, spec, start, stop, solve_stop, targets, carry_in, time_limit_seconds, profile):
+    """Solve one block and keep its days [start, stop); None when the block has no solution."""
+    calendar = get_month_calendar(spec.year, spec.month)
+    solution = kind.solve_block(spec, block_calendar(calendar, start, solve_stop), targets, carry_in,
+                                time_limit_seconds, profile)
+    if solution is None:
+        return None
+    kept_days = set(calendar.days[start:stop])
+    return {date: entry for date, entry in solution.items() if date in kept_days}
+
+
+def _quota_deviation(kind, spec, calendar, schedule):
+    quotas = kind.quotas(spec)
+    counts = kind.counts(calendar, schedule)
+    return sum(abs(quotas[doc][period][shift] - counts[(doc, period, shift)])
+               for doc in quotas for period in ("weekday", "weekend") for shift in ("ER", "ward"))
+
+
+def _decompose_month(kind, spec, carry_in, block_days, overlap, time_limit_seconds, parallel, pool, profile):
+    calendar = get_month_calendar(spec.year, spec.month)
+    stitched = {}
+    if parallel:
+        # Blocks cannot see each other's result: there is no look-ahead, targets come from
+        # the quotas alone and only the first block gets the carry-in; reconciliation fixes
+        # the boundaries between blocks
+        blocks = week_blocks(calendar, block_days, 0)
+        jobs, assigned = [], defaultdict(int)
+        for k, (start, stop, solve_stop) in enumerate(blocks):
+            targets = _block_targets(kind, spec, calendar, start, solve_stop, assigned)
+            for doc, periods in targets.items():
+                for period, shifts in periods.items():
+                    for shift, target in shifts.items():
+                        assigned[(doc, period, shift)] += target
+            jobs.append(pool.submit(_solve_block, kind, spec, start, stop, solve_stop, targets,
+                                    carry_in if k == 0 else None, time_limit_seconds, profile))
+        for (start, stop, _), job in zip(blocks, jobs):
+            part = job.result()
+            print(f"[Decompose] {calendar.days[start]}..{calendar.days[stop - 1]}: "
+                  f"{'solved' if part is not None else 'no solution'}")
+            stitched.update(part or {})
+    else:
+        for start, stop, solve_stop in week_blocks(calendar, block_days, overlap):
+            assigned = kind.counts(calendar, stitched)
+            targets = _block_targets(kind, spec, calendar, start, solve_stop, assigned)
+            part = _solve_block(kind, spec, start, stop, solve_stop, targets, {**(carry_in or {}), **stitched},
+                                time_limit_seconds, profile)
+            if part is None:
+                # Boundary dead end: solve the block on its own and let reconciliation repair it
+                part = _solve_block(kind, spec, start, stop, solve_stop, targets, None, time_limit_seconds, profile)
+            print(f"[Decompose] {calendar.days[start]}..{calendar.days[stop - 1]}: "
+                  f"{'solved' if part is not None else 'no solution'}")
+            stitched.update(part or {})
+
+    deviation = _quota_deviation(kind, spec, calendar, stitched)
+    if len(stitched) == len(calendar.days) and deviation == 0 and not parallel:
+        print(f"[Decompose] {spec.year}-{spec.month:02d}: stitched blocks meet every quota")
+        return stitched
+    print(f"[Decompose] {spec.year}-{spec.month:02d}: reconciling (quota deviation {deviation}, "
+          f"{len(calendar.days) - len(stitched)} days unsolved)")
+    return _reconcile(kind, spec, calendar, stitched, carry_in, time_limit_seconds, profile)
+
+
+def _decompose(kind, months, block_days, overlap, time_limit_seconds, parallel, processes, profile):
+    result, carry_in = {}, None
+    pool = ProcessPoolExecutor(max_workers=processes) if parallel else None
+    try:
+        for spec in months:
+            schedule = _decompose_month(kind, spec, carry_in, block_days, overlap, time_limit_seconds,
+                                        parallel, pool, profile)
+            if schedule is None:
+                print(f"[{kind.label}] Decomposition failed for {spec.year}-{spec.month:02d}")
+                return None
+            result.update(schedule)
+            carry_in = schedule
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return result
+
+
+def decompose_schedule(months, block_days=BLOCK_DAYS, overlap=OVERLAP_DAYS, time_limit_seconds=30,
+                       parallel=False, processes=None, profile=None):
+    """
+    Solve a horizon of schedule_ortools months block by block.
+    Args:
+        months: list of ScheduleMonth, consecutive months in order
+        block_days: days per block
+        overlap: look-ahead days solved with each block and then discarded
+        time_limit_seconds: limit of each block solve and of each reconciliation
+        parallel: solve the blocks of a month side by side in worker processes (without look-ahead)
+        processes: worker processes for parallel (default: one per CPU)
+        profile: solver profile name, parameter dict or JSON profile path
+    Returns:
+        schedule: dict date -> list of (shift_type, shift_time, doctor) over the whole horizon,
+        None when a month could not be reconciled
+    """
+    return _decompose(_ScheduleKind(), months, block_days, overlap, time_limit_seconds, parallel, processes,
+                      profile)
+
+
+def decompose_real_schedule(months, block_days=BLOCK_DAYS, overlap=OVERLAP_DAYS, time_limit_seconds=30,
+                            parallel=False, processes=None, profile=None):
+    """
+    Solve a horizon of real_shift months block by block (arguments as decompose_schedule,
+    with RealShiftMonth entries).
+    Returns:
+        (schedule, shift_count) over the whole horizon, None when a month could not be reconciled
+    """
+    schedule = _decompose(_RealShiftKind(), months, block_days, overlap, time_limit_seconds, parallel, processes,
+                          profile)
+    if schedule is None:
+        return None
+    return schedule, _count_shifts(schedule)
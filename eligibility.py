@@ -0,0 +1,102 @@
+import datetime
+from doctor_data import DOCTOR_AUTOPSY_DATA
+from constraints import SHIFT_TIME_INDEX
+from rules import compile_rules
+
+# Eligibility pre-pass shared by the CP-SAT model builders.
+# A (slot, doctor) pair that can never be part of a solution (autopsy conflict, day off,
+# no_shift entry) is marked ineligible here, and the builders do not create a variable
+# for it instead of creating one and pinning it to 0.
+
+
+def autopsy_blocked_times(calendar, autopsy_date, a):
+    """(day index, shift time index) pairs a doctor cannot work around an autopsy at time `a` (rules.AUTOPSY_RULE)."""
+    rules = compile_rules(calendar)
+    blocked = []
+    for p in rules.autopsy_positions(autopsy_date, a):
+        day, t = rules.day_time(p)
+        if 0 <= day < len(calendar.days):
+            blocked.append((day, t))
+    return blocked
+
+
+def schedule_eligibility(calendar, doctors, autopsy_data=None):
+    """
+    Eligibility of every (slot, doctor) pair of the schedule_ortools model.
+    Returns:
+        eligible: eligible[s][i] is False when doctor i can never work calendar.slots[s]
+    """
+    if autopsy_data is None:
+        autopsy_data = DOCTOR_AUTOPSY_DATA
+    eligible = [[True] * len(doctors) for _ in calendar.slots]
+    slot_at = {
+        (calendar.day_index[date], SHIFT_TIME_INDEX[shift_time]): []
+        for date, _, shift_time, _ in calendar.slots
+    }
+    for s, (date, _, shift_time, _) in enumerate(calendar.slots):
+        slot_at[(calendar.day_index[date], SHIFT_TIME_INDEX[shift_time])].append(s)
+    for i, doctor in enumerate(doctors):
+        for autopsy_date, autopsy_time in autopsy_data.get(doctor, []):
+            for key in autopsy_blocked_times(calendar, autopsy_date, SHIFT_TIME_INDEX[autopsy_time]):
+                for s in slot_at.get(key, []):
+                    eligible[s][i] = False
+    return eligible
+
+
+def real_shift_eligibility(calendar, doctors, date_doubles, doctor_date_off=None, no_shift=None, pinned=None,
+                           frozen=None):
+    """
+    Eligibility of every (day, shift, doctor) triple of the real_shift model.
+    Args:
+        calendar: MonthCalendar
+        doctors: list of doctor names
+        date_doubles: dates on which one doctor covers both ER and ward
+        doctor_date_off: dict doctor -> list of dates off
+        no_shift: list of (day, doctor, shift) with shift "ER" or "ward"
+        pinned: dict date -> doctor who must work that day
+        frozen: dict date -> {"ER": doctor, "ward": doctor}; on these dates only the given
+            doctor stays eligible for each shift (used when repairing a published schedule)
+    Returns:
+        (er_ok, ward_ok): dicts date -> list of bool per doctor index
+    """
+    n_doc = len(doctors)
+    er_ok   = {d: [True] * n_doc for d in calendar.days}
+    ward_ok = {d: [True] * n_doc for d in calendar.days}
+
+    # Days off remove both shifts
+    for i, doc in enumerate(doctors):
+        for d in (doctor_date_off or {}).get(doc, []):
+            if d in er_ok:
+                er_ok[d][i] = False
+                ward_ok[d][i] = False
+
+    # Shift-type restrictions per doctor/date
+    for day_num, doc, shift_type in no_shift or []:
+        d = datetime.date(calendar.year, calendar.month, day_num)
+        if d in er_ok and doc in doctors:
+            (er_ok if shift_type == "ER" else ward_ok)[d][doctors.index(doc)] = False
+
+    # On double days the same doctor takes both shifts, so both must be possible
+    for d in date_doubles:
+        if d in er_ok:
+            for i in range(n_doc):
+                er_ok[d][i] = ward_ok[d][i] = er_ok[d][i] and ward_ok[d][i]
+
+    # A doctor pinned to a double day is the only one who can cover it
+    double_set = set(date_doubles)
+    for d, doc in (pinned or {}).items():
+        if d in double_set and d in er_ok and doc in doctors:
+            pi = doctors.index(doc)
+            for i in range(n_doc):
+                if i != pi:
+                    er_ok[d][i] = ward_ok[d][i] = False
+
+    # Frozen days keep their published doctors
+    for d, entry in (frozen or {}).items():
+        if d in er_ok:
+            for shift, ok in (("ER", er_ok), ("ward", ward_ok)):
+                for i, doc in enumerate(doctors):
+                    if doc != entry[shift]:
+                        ok[d][i] = False
+
+    return er_ok, ward_ok
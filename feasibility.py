@@ -0,0 +1,207 @@
+import datetime
+import time
+from collections import namedtuple
+from doctor_data import DOCTOR_AUTOPSY_DATA
+from eligibility import schedule_eligibility, real_shift_eligibility
+
+# Cheap necessary conditions checked before any CP-SAT model is built. Passing them does
+# not prove a roster feasible, but failing one proves it infeasible.
+
+# One failed check.
+#   check: short identifier of the rule that failed (e.g. "quota_sum", "day_coverage")
+#   message: readable explanation
+#   date / doctor: what the issue is about, None when not specific to one
+FeasibilityIssue = namedtuple("FeasibilityIssue", ["check", "message", "date", "doctor"], defaults=(None, None))
+
+
+def _max_spaced(days, gap):
+    """Largest number of the given sorted days that can be picked with at least `gap` days between picks."""
+    count, last = 0, None
+    for d in days:
+        if last is None or (d - last).days >= gap:
+            count += 1
+            last = d
+    return count
+
+
+def check_schedule_inputs(calendar, doctor_data, autopsy_data=None):
+    """
+    Pre-check the monthly (ER/ward x DAY/EVENING/NIGHT) model inputs.
+    Args:
+        calendar: MonthCalendar
+        doctor_data: dict, already adjusted with adjust_doctor_data
+        autopsy_data: dict, doctor -> list of (date, shift_time), DOCTOR_AUTOPSY_DATA when omitted
+    Returns:
+        list of FeasibilityIssue, empty when every check passes
+    """
+    if autopsy_data is None:
+        autopsy_data = DOCTOR_AUTOPSY_DATA
+    issues = []
+    doctors = list(doctor_data.keys())
+
+    # Quota sums per (period, shift type) must equal the slots of that kind
+    for period in ["weekday", "weekend"]:
+        for shift_type in ["ER", "ward"]:
+            slots = calendar.slot_count(period, shift_type)
+            quota = sum(doctor_data[doc][period][shift_type] for doc in doctors)
+            if quota != slots:
+                issues.append(FeasibilityIssue(
+                    "quota_sum", f"{period} {shift_type}: {slots} slots but quotas add up to {quota}"))
+
+    eligible = schedule_eligibility(calendar, doctors, autopsy_data)
+
+    # Every slot needs an eligible doctor, and the slots sharing a shift time need distinct doctors
+    slots_at = {}
+    for s, (date, shift_type, shift_time, _) in enumerate(calendar.slots):
+        if not any(eligible[s]):
+            issues.append(FeasibilityIssue(
+                "day_coverage", f"{date} {shift_type} {shift_time}: every doctor is blocked", date=date))
+        slots_at.setdefault((date, shift_time), []).append(s)
+    for (date, shift_time), slot_ids in slots_at.items():
+        available = {i for s in slot_ids for i in range(len(doctors)) if eligible[s][i]}
+        if len(slot_ids) > 1 and len(available) < len(slot_ids):
+            issues.append(FeasibilityIssue(
+                "day_coverage",
+                f"{date} {shift_time}: {len(slot_ids)} slots but only {len(available)} doctors available",
+                date=date))
+
+    # Each doctor's quota must fit the slots they can take, and the rest rules:
+    # at most one of evening/night per weekday, at most two shifts per weekend/holiday day
+    for i, doc in enumerate(doctors):
+        for period in ["weekday", "weekend"]:
+            for shift_type in ["ER", "ward"]:
+                open_slots = sum(
+                    1 for s, (_, st, _, key) in enumerate(calendar.slots)
+                    if key == period and st == shift_type and eligible[s][i]
+                )
+                quota = doctor_data[doc][period][shift_type]
+                if quota > open_slots:
+                    issues.append(FeasibilityIssue(
+                        "doctor_capacity",
+                        f"{doc}: {period} {shift_type} quota {quota} but only {open_slots} slots open",
+                        doctor=doc))
+        weekday_total = doctor_data[doc]["weekday"]["ER"] + doctor_data[doc]["weekday"]["ward"]
+        if weekday_total > len(calendar.weekday_days):
+            issues.append(FeasibilityIssue(
+                "rest_bound",
+                f"{doc}: {weekday_total} weekday shifts but at most one per weekday ({len(calendar.weekday_days)})",
+                doctor=doc))
+        weekend_total = doctor_data[doc]["weekend"]["ER"] + doctor_data[doc]["weekend"]["ward"]
+        if weekend_total > 2 * len(calendar.weekend_days):
+            issues.append(FeasibilityIssue(
+                "rest_bound",
+                f"{doc}: {weekend_total} weekend shifts but at most two per weekend/holiday day "
+                f"({2 * len(calendar.weekend_days)})",
+                doctor=doc))
+    return issues
+
+
+def check_real_shift_inputs(calendar, doctor_data, date_doubles, doctor_date_off=None, pinned=None, no_shift=None):
+    """
+    Pre-check the real-shift (one ER + one ward per day) model inputs.
+    Args:
+        calendar: MonthCalendar
+        doctor_data: dict, doctor -> {"weekday": {"ER", "ward"}, "weekend": {"ER", "ward"}}
+        date_doubles: dates on which one doctor covers both ER and ward
+        doctor_date_off: dict doctor -> list of dates off
+        pinned: dict date -> doctor who must work that day
+        no_shift: list of (day, doctor, shift) with shift "ER" or "ward"
+    Returns:
+        list of FeasibilityIssue, empty when every check passes
+    """
+    issues = []
+    doctors = list(doctor_data.keys())
+    double_set = set(date_doubles)
+    days_of = {"weekday": calendar.weekday_days, "weekend": calendar.weekend_days}
+
+    # Input references
+    for day_num, doc, shift in no_shift or []:
+        if doc not in doctor_data:
+            issues.append(FeasibilityIssue("no_shift", f"no_shift row for unknown doctor {doc}", doctor=doc))
+        if not 1 <= day_num <= len(calendar.days):
+            issues.append(FeasibilityIssue("no_shift", f"no_shift day {day_num} is outside the month", doctor=doc))
+        if shift not in ("ER", "ward"):
+            issues.append(FeasibilityIssue("no_shift", f"no_shift shift {shift!r} is not ER or ward", doctor=doc))
+    if issues:
+        return issues
+
+    # Quota sums per (period, shift) must equal the number of days of that period
+    for period, period_days in days_of.items():
+        for shift in ["ER", "ward"]:
+            quota = sum(doctor_data[doc][period][shift] for doc in doctors)
+            if quota != len(period_days):
+                issues.append(FeasibilityIssue(
+                    "quota_sum", f"{period} {shift}: {len(period_days)} days but quotas add up to {quota}"))
+
+    # Pinned dates against days off and shift restrictions
+    off = {doc: set(dates) for doc, dates in (doctor_date_off or {}).items()}
+    blocked_shifts = {}
+    for day_num, doc, shift in no_shift or []:
+        blocked_shifts.setdefault((datetime.date(calendar.year, calendar.month, day_num), doc), set()).add(shift)
+    for date, doc in (pinned or {}).items():
+        if date not in calendar.day_index:
+            issues.append(FeasibilityIssue("pinned", f"{date}: pinned date is outside the month", date=date, doctor=doc))
+        elif doc not in doctor_data:
+            issues.append(FeasibilityIssue("pinned", f"{date}: pinned doctor {doc} is not on the roster", date=date, doctor=doc))
+        elif date in off.get(doc, ()):
+            issues.append(FeasibilityIssue("pinned", f"{date}: {doc} is pinned but has the day off", date=date, doctor=doc))
+        else:
+            blocked = blocked_shifts.get((date, doc), set())
+            if blocked == {"ER", "ward"} or (date in double_set and blocked):
+                issues.append(FeasibilityIssue(
+                    "pinned", f"{date}: {doc} is pinned but no_shift rules out every shift", date=date, doctor=doc))
+
+    er_ok, ward_ok = real_shift_eligibility(calendar, doctors, date_doubles, doctor_date_off=doctor_date_off,
+                                            no_shift=no_shift, pinned=pinned)
+
+    # Every day needs an ER and a ward doctor, two different ones on non-double weekend days
+    for date in calendar.days:
+        er_docs = {i for i, ok in enumerate(er_ok[date]) if ok}
+        ward_docs = {i for i, ok in enumerate(ward_ok[date]) if ok}
+        if not er_docs or not ward_docs:
+            missing = "ER" if not er_docs else "ward"
+            issues.append(FeasibilityIssue("day_coverage", f"{date}: no doctor available for {missing}", date=date))
+        elif (date not in double_set and calendar.period[date] == "weekend"
+              and len(er_docs | ward_docs) < 2):
+            issues.append(FeasibilityIssue(
+                "day_coverage", f"{date}: ER and ward need different doctors but only one is available", date=date))
+
+    # Each doctor's quota must fit the days they can take, and the spacing rules:
+    # at most one ER in any 3 consecutive days, no ward on consecutive days
+    for i, doc in enumerate(doctors):
+        for shift, ok, gap in (("ER", er_ok, 3), ("ward", ward_ok, 2)):
+            for period, period_days in days_of.items():
+                open_days = sum(1 for date in period_days if ok[date][i])
+                quota = doctor_data[doc][period][shift]
+                if quota > open_days:
+                    issues.append(FeasibilityIssue(
+                        "doctor_capacity",
+                        f"{doc}: {period} {shift} quota {quota} but only {open_days} days available",
+                        doctor=doc))
+            total = doctor_data[doc]["weekday"][shift] + doctor_data[doc]["weekend"][shift]
+            bound = _max_spaced([date for date in calendar.days if ok[date][i]], gap)
+            if total > bound:
+                issues.append(FeasibilityIssue(
+                    "rest_bound",
+                    f"{doc}: {total} {shift} shifts but the spacing rule allows at most {bound}",
+                    doctor=doc))
+    return issues
+
+
+def report_issues(issues, label, elapsed=None):
+    """Print the outcome of a pre-check. Returns True when there are no issues."""
+    took = f" ({elapsed * 1000:.1f} ms)" if elapsed is not None else ""
+    if not issues:
+        print(f"[{label}] Pre-check passed{took}")
+        return True
+    print(f"[{label}] Pre-check found {len(issues)} issue(s){took}:")
+    for issue in issues:
+        print(f"  - [{issue.check}] {issue.message}")
+    return False
+
+
+def timed_check(check, *args, **kwargs):
+    """Run a check function and return (issues, seconds)."""
+    start = time.perf_counter()
+    issues = check(*args, **kwargs)
+    return issues, time.perf_counter() - start
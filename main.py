@@ -1,14 +1,26 @@
 import datetime
 import argparse
 from doctor_data import DOCTOR_DATA
+from month_calendar import get_month_calendar
 from scheduler import (
+    generate_schedule_parallel,
     print_expected_shifts,
     print_schedule_summary,
     verify_schedule,
     verify_total_shifts_against_doctor_data
 )
-from schedule_ortools import generate_schedule
-from excel_export import save_schedule_to_xlsx
+from schedule_ortools import (
+    generate_schedule,
+    stream_schedule_ortools,
+    diagnose_schedule_ortools,
+    generate_schedule_pool_ortools,
+    FORMULATIONS,
+)
+from excel_export import save_schedule_to_xlsx, save_schedules_to_xlsx, load_schedule_from_xlsx
+from solver_tools import SOLVER_PROFILES, StopPolicy, resolve_profile
+from decomposition import decompose_schedule, ScheduleMonth, BLOCK_DAYS
+from batch import batch_schedule, month_range
+from portfolio import race_schedule, RACE_QUALITIES
 from blank_excel import generate_blank_excel
 
 
@@ -21,20 +33,136 @@ def main():
     blank_parser.add_argument("--year", type=int, default=datetime.date.today().year)
     blank_parser.add_argument("--month", type=int, default=datetime.date.today().month)
 
+    # Batch subcommand
+    batch_parser = subparsers.add_parser("batch", help="Solve a range of months concurrently")
+    batch_parser.add_argument("--start", required=True, metavar="YYYY-MM", help="First month")
+    batch_parser.add_argument("--end", required=True, metavar="YYYY-MM", help="Last month")
+    batch_parser.add_argument("--processes", type=int, default=None,
+                              help="Months solved at the same time (default: one per CPU)")
+    batch_parser.add_argument("--time-limit", type=int, default=300, metavar="SECONDS",
+                              help="Time limit per month (default: 300)")
+    batch_parser.add_argument("--output-dir", default=".", metavar="DIR",
+                              help="Where schedule_YYYY_MM.xlsx files are written (default: .)")
+
+    parser.add_argument("--hint", metavar="FILE",
+                        help="Warm-start the solver from a schedule.xlsx (previous run or hand-edited)")
+    parser.add_argument("--repair-hint", action="store_true",
+                        help="Let the solver repair a hint that breaks constraints")
+    parser.add_argument("--stream", action="store_true",
+                        help="Report every improving solution while solving (Ctrl+C saves the latest)")
+    parser.add_argument("--diagnose", action="store_true",
+                        help="Only report which constraint families conflict, without solving")
+    parser.add_argument("--profile", default=None, metavar="NAME|FILE",
+                        help=f"Solver parameter profile: {', '.join(SOLVER_PROFILES)} "
+                             "or a JSON file written by tuning.py (default: balanced)")
+    parser.add_argument("--log-search", action="store_true",
+                        help="Print the CP-SAT search log")
+    parser.add_argument("--stop-no-improvement", type=float, metavar="SECONDS",
+                        help="Stop the search after this long without a better solution")
+    parser.add_argument("--stop-gap", type=float, metavar="FRACTION",
+                        help="Stop the search once the relative gap is at most this (e.g. 0.01)")
+    parser.add_argument("--formulation", choices=FORMULATIONS, default="boolean",
+                        help="Time-conflict rules as Boolean constraints or as intervals on an hourly timeline "
+                             "(default: boolean; compare them with benchmark.py)")
+    parser.add_argument("--decompose", action="store_true",
+                        help="Solve week blocks in sequence and reconcile the month (long-horizon mode)")
+    parser.add_argument("--block-days", type=int, default=BLOCK_DAYS, metavar="DAYS",
+                        help=f"Days per block with --decompose (default: {BLOCK_DAYS})")
+    parser.add_argument("--race", action="store_true",
+                        help="Race the annealer against CP-SAT in parallel processes and keep the winner")
+    parser.add_argument("--race-quality", choices=list(RACE_QUALITIES), default="feasible",
+                        help="When a --race is won: " + "; ".join(f"{name}: {text}" for name, text in RACE_QUALITIES.items()))
+    parser.add_argument("--race-log", metavar="FILE",
+                        help="Append the --race outcome and instance shape to this JSON-lines file")
+    parser.add_argument("--tempering", action="store_true",
+                        help="Use the annealer with parallel tempering, one chain per --seeds entry, instead of CP-SAT")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[42, 43, 44, 45], metavar="SEED",
+                        help="Chain seeds with --tempering; the result depends only on this set (default: 42 43 44 45)")
+    parser.add_argument("--pool", type=int, metavar="N",
+                        help="Write N alternative schedules to schedules.xlsx, one sheet each")
+    parser.add_argument("--min-distance", type=int, default=10, metavar="SHIFTS",
+                        help="Minimum number of differing shifts between alternatives (default: 10)")
+    parser.add_argument("--pool-time-limit", type=int, default=60, metavar="SECONDS",
+                        help="Solver time limit per alternative with --pool (default: 60)")
+
     args = parser.parse_args()
+    if args.profile:
+        try:
+            resolve_profile(args.profile)
+        except (ValueError, OSError) as e:
+            parser.error(str(e))
+    # Only the plain and --stream solves take the CP-SAT search options
+    mode = next((flag for flag, used in (("--pool", args.pool), ("--decompose", args.decompose),
+                                         ("--race", args.race), ("--tempering", args.tempering)) if used), None)
+    if mode:
+        ignored = [flag for flag, used in (("--stream", args.stream), ("--hint", args.hint),
+                                           ("--repair-hint", args.repair_hint), ("--log-search", args.log_search),
+                                           ("--stop-no-improvement", args.stop_no_improvement is not None),
+                                           ("--stop-gap", args.stop_gap is not None),
+                                           ("--formulation", args.formulation != "boolean"),
+                                           ("--profile", mode == "--tempering" and args.profile)) if used]
+        if ignored:
+            parser.error(f"{', '.join(ignored)} cannot be combined with {mode}")
 
     if args.command == "blank":
         generate_blank_excel(args.year, args.month)
         return
+    if args.command == "batch":
+        # DOCTOR_DATA quotas are rescaled to each month's days
+        batch_schedule(month_range(args.start, args.end), DOCTOR_DATA, processes=args.processes,
+                       time_limit_seconds=args.time_limit, profile=args.profile, output_dir=args.output_dir)
+        return
 
     year = 2026  # Fixed year for the schedule
     month = 3  # Fixed month for the schedule
-    if verify_total_shifts_against_doctor_data(year, month, DOCTOR_DATA):
+    calendar = get_month_calendar(year, month)
+    stop_policy = None
+    if args.stop_no_improvement is not None or args.stop_gap is not None:
+        stop_policy = StopPolicy(args.stop_no_improvement, args.stop_gap)
+    if args.diagnose:
+        diagnose_schedule_ortools(year, month, DOCTOR_DATA, calendar=calendar)
+        return
+    if verify_total_shifts_against_doctor_data(year, month, DOCTOR_DATA, calendar=calendar):
         print_expected_shifts(DOCTOR_DATA)
-        schedule = generate_schedule(year, month, DOCTOR_DATA)
-        print_schedule_summary(schedule)
-        verify_schedule(schedule, DOCTOR_DATA)
-        save_schedule_to_xlsx(schedule)
+        hint = load_schedule_from_xlsx(args.hint) if args.hint else None
+        if args.pool:
+            schedules = generate_schedule_pool_ortools(year, month, DOCTOR_DATA, count=args.pool,
+                                                       min_distance=args.min_distance,
+                                                       time_limit_seconds=args.pool_time_limit, calendar=calendar,
+                                                       profile=args.profile)
+            for schedule in schedules:
+                verify_schedule(schedule, DOCTOR_DATA, calendar=calendar)
+            if schedules:
+                save_schedules_to_xlsx(schedules, calendar=calendar)
+            return
+        if args.decompose:
+            schedule = decompose_schedule([ScheduleMonth(year, month, DOCTOR_DATA)], block_days=args.block_days,
+                                          profile=args.profile) or {}
+        elif args.tempering:
+            schedule = generate_schedule_parallel(year, month, DOCTOR_DATA, seeds=args.seeds, calendar=calendar)
+        elif args.race:
+            schedule = race_schedule(year, month, DOCTOR_DATA, quality=args.race_quality, calendar=calendar,
+                                     profile=args.profile, race_log=args.race_log).schedule
+        elif args.stream:
+            schedule = {}
+            try:
+                for update in stream_schedule_ortools(year, month, DOCTOR_DATA, calendar=calendar,
+                                                      hint=hint, repair_hint=args.repair_hint,
+                                                      profile=args.profile, log_search=args.log_search,
+                                                      stop_policy=stop_policy, formulation=args.formulation):
+                    print(f"[OR-Tools CP-SAT] Solution #{update.index}: objective {update.objective:g}, "
+                          f"bound {update.bound:g}, {update.elapsed:.2f}s")
+                    schedule = update.solution
+            except KeyboardInterrupt:
+                print("[OR-Tools CP-SAT] Stopped, keeping the latest solution.")
+        else:
+            schedule = generate_schedule(year, month, DOCTOR_DATA, calendar=calendar,
+                                         hint=hint, repair_hint=args.repair_hint,
+                                         profile=args.profile, log_search=args.log_search,
+                                         stop_policy=stop_policy, formulation=args.formulation)
+        print_schedule_summary(schedule, calendar=calendar)
+        verify_schedule(schedule, DOCTOR_DATA, calendar=calendar)
+        save_schedule_to_xlsx(schedule, calendar=calendar)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import calendar
+import datetime
+from functools import lru_cache
+from doctor_data import THAI_HOLIDAYS, SHIFT_TIMES
+
+WEEKDAY_SHIFTS = [
+    ("ER", SHIFT_TIMES["EVENING"]),
+    ("ER", SHIFT_TIMES["NIGHT"]),
+    ("ward", SHIFT_TIMES["EVENING"])
+]
+WEEKEND_SHIFTS = [
+    ("ER", SHIFT_TIMES["DAY"]),
+    ("ER", SHIFT_TIMES["EVENING"]),
+    ("ER", SHIFT_TIMES["NIGHT"]),
+    ("ward", SHIFT_TIMES["DAY"]),
+    ("ward", SHIFT_TIMES["EVENING"]),
+    ("ward", SHIFT_TIMES["NIGHT"])
+]
+
+
+class MonthCalendar:
+    """
+    Day classification and slot layout of one month, computed once.
+    `days` restricts the calendar to consecutive dates of the month (a block, see block_calendar).
+    Attributes:
+        days: list of datetime.date in the month (or the block)
+        period: dict date -> "weekday" or "weekend" (weekends and holidays)
+        prev_day / next_day: dict date -> neighbouring date inside the month, or None
+        slots: list of (date, shift_type, shift_time, period) in schedule order
+        day_slots: dict date -> list of (shift_type, shift_time) for that day
+        weekday_days / weekend_days: days of each period
+    """
+
+    def __init__(self, year, month, holidays=None, days=None):
+        self.year = year
+        self.month = month
+        self.holidays = frozenset(THAI_HOLIDAYS if holidays is None else holidays)
+        if days is None:
+            days_in_month = calendar.monthrange(year, month)[1]
+            days = [datetime.date(year, month, d) for d in range(1, days_in_month + 1)]
+        self.days = list(days)
+        self.day_index = {date: i for i, date in enumerate(self.days)}
+        self.period = {
+            date: "weekend" if date.weekday() >= 5 or date in self.holidays else "weekday"
+            for date in self.days
+        }
+        self.prev_day = {date: self.days[i - 1] if i > 0 else None for i, date in enumerate(self.days)}
+        self.next_day = {date: self.days[i + 1] if i + 1 < len(self.days) else None for i, date in enumerate(self.days)}
+        self.weekday_days = [date for date in self.days if self.period[date] == "weekday"]
+        self.weekend_days = [date for date in self.days if self.period[date] == "weekend"]
+        self.day_slots = {
+            date: WEEKEND_SHIFTS if self.period[date] == "weekend" else WEEKDAY_SHIFTS
+            for date in self.days
+        }
+        self.slots = [
+            (date, shift_type, shift_time, self.period[date])
+            for date in self.days
+            for shift_type, shift_time in self.day_slots[date]
+        ]
+
+    def is_weekend_or_holiday(self, date):
+        """O(1) check, also valid for dates outside the month."""
+        period = self.period.get(date)
+        if period is not None:
+            return period == "weekend"
+        return date.weekday() >= 5 or date in self.holidays
+
+    def period_of(self, date):
+        return "weekend" if self.is_weekend_or_holiday(date) else "weekday"
+
+    def slot_count(self, period, shift_type=None):
+        return sum(
+            1 for _, st, _, key in self.slots
+            if key == period and (shift_type is None or st == shift_type)
+        )
+
+
+@lru_cache(maxsize=None)
+def _cached_calendar(year, month, holidays):
+    return MonthCalendar(year, month, holidays)
+
+
+def get_month_calendar(year, month, holidays=None):
+    """Shared MonthCalendar per (year, month, holiday set)."""
+    return _cached_calendar(year, month, frozenset(THAI_HOLIDAYS if holidays is None else holidays))
+
+
+def block_calendar(month_calendar, start, stop):
+    """MonthCalendar of the days month_calendar.days[start:stop]."""
+    return MonthCalendar(month_calendar.year, month_calendar.month, month_calendar.holidays,
+                         days=month_calendar.days[start:stop])
+
+
+def calendar_for_schedule(schedule):
+    """MonthCalendar of the month a date-keyed schedule belongs to, None for an empty schedule."""
+    if not schedule:
+        return None
+    first = min(schedule)
+    return get_month_calendar(first.year, first.month)
@@ -0,0 +1,248 @@
+import json
+import multiprocessing
+import queue
+import random
+import threading
+import time
+from collections import namedtuple
+from doctor_data import DOCTOR_AUTOPSY_DATA
+from month_calendar import get_month_calendar
+from scheduler import _AnnealingState, quota_mismatches
+from schedule_ortools import _prepare_ortools
+from solver_tools import SolutionStreamer
+
+# Portfolio race between the two engines. The annealer and CP-SAT run in their own
+# processes and report to the parent through one event queue. The annealer keeps the
+# per-type quotas of the CP-SAT model (_AnnealingState with per_type), and a zero-cost
+# schedule only counts once quota_mismatches confirms them. The first such annealer
+# schedule is passed on to CP-SAT: if CP-SAT has no solution yet, it stops its
+# search and restarts from that schedule as a (repaired) hint. The parent returns as soon
+# as one engine meets the requested quality, or at the deadline with the best schedule
+# seen, and reports who won together with the shape of the instance.
+
+RACE_QUALITIES = {
+    "feasible": "first schedule without rule violations",
+    "optimal": "CP-SAT proves the schedule optimal",
+}
+
+# Outcome of a race.
+#   winner: "annealer", "cpsat" or None when neither engine produced a valid schedule (the
+#       annealer only counts with a zero-cost schedule meeting the per-type quotas)
+#   reason: "quality" (target met), "deadline", or "exhausted" (both engines stopped early)
+#   timeline: list of (seconds since start, engine, event) in arrival order
+RaceResult = namedtuple("RaceResult", ["winner", "schedule", "reason", "elapsed", "timeline"])
+
+
+class _EngineQueue:
+    """Queue-like adapter tagging every SolutionStreamer update with the engine name."""
+
+    def __init__(self, events, engine):
+        self.events = events
+        self.engine = engine
+
+    def put(self, update):
+        self.events.put((self.engine, "solution", update.solution, update.objective))
+
+
+def _annealer_worker(year, month, doctor_data, calendar, seed, max_iter, time_limit_seconds, events):
+    """
+    Anneal from successive seeds, reporting every improvement, until a zero-cost schedule is
+    found or no time is left for another restart.
+    """
+    try:
+        start = time.perf_counter()
+        state = _AnnealingState(year, month, doctor_data, calendar, per_type=True)
+        best_cost = None
+        while best_cost != 0:
+            if time.perf_counter() - start >= time_limit_seconds:
+                events.put(("annealer", "done", None, f"time limit, best cost {best_cost}"))
+                return
+            rng = random.Random()
+            rng.seed(seed)
+            state.random_fill(rng)
+            _, _, assign, cost = state.anneal(rng, max_iter, 10.0, 0.995)
+            if best_cost is None or cost < best_cost:
+                best_cost = cost
+                events.put(("annealer", "solution", dict(state.to_schedule(assign)), cost))
+            seed += 1
+        events.put(("annealer", "done", None, "zero cost"))
+    except RuntimeError as e:
+        events.put(("annealer", "done", None, str(e)))
+
+
+def _cpsat_worker(year, month, doctor_data, calendar, time_limit_seconds, profile, events, hints):
+    """Solve the month model; restart from the annealer's schedule if it arrives before any solution."""
+    sm, solver = _prepare_ortools(year, month, doctor_data, time_limit_seconds, calendar, False, None, False, profile)
+    if sm is None:
+        events.put(("cpsat", "done", None, "pre-check failed"))
+        return
+    streamer = SolutionStreamer(sm.extract_schedule, _EngineQueue(events, "cpsat"))
+    received = []
+
+    def wait_for_hint():
+        hint = hints.get()
+        if hint is not None and streamer.count == 0:
+            received.append(hint)
+            solver.StopSearch()
+
+    threading.Thread(target=wait_for_hint, daemon=True).start()
+    start = time.perf_counter()
+    status = solver.Solve(sm.model, streamer)
+    remaining = time_limit_seconds - (time.perf_counter() - start)
+    if received and streamer.count == 0 and remaining > 0:
+        events.put(("cpsat", "restart", None, f"hinted {sm.add_hint(received[0])} of {len(sm.slots)} slots"))
+        solver.parameters.max_time_in_seconds = remaining
+        solver.parameters.repair_hint = True
+        status = solver.Solve(sm.model, streamer)
+    events.put(("cpsat", "done", None, solver.StatusName(status)))
+
+
+def instance_shape(calendar, doctor_data, autopsy_data=None):
+    """Size of a month instance as reported with the race outcome."""
+    if autopsy_data is None:
+        autopsy_data = DOCTOR_AUTOPSY_DATA
+    return {
+        "days": len(calendar.days),
+        "weekend_days": len(calendar.weekend_days),
+        "slots": len(calendar.slots),
+        "doctors": sum(1 for data in doctor_data.values() if data),
+        "autopsies": sum(len(entries) for entries in autopsy_data.values()),
+    }
+
+
+def _stop(process):
+    if process.is_alive():
+        process.terminate()
+    process.join()
+
+
+def race_schedule(year, month, doctor_data, quality="feasible", time_limit_seconds=300, calendar=None,
+                  profile=None, seed=42, max_iter=100000, race_log=None):
+    """
+    Race the annealer against CP-SAT on one month.
+    Args:
+        year, month: int
+        doctor_data: dict, raw quotas as for either engine
+        quality: key of RACE_QUALITIES
+        time_limit_seconds: deadline of the race, also the CP-SAT time limit
+        calendar: MonthCalendar, built from year and month when omitted
+        profile: CP-SAT solver profile name, parameter dict or JSON profile path
+        seed: first annealer seed, later restarts use the following seeds until the deadline
+        max_iter: annealer iterations per seed
+        race_log: optional file; the outcome and instance shape are appended as a JSON line
+    Returns:
+        RaceResult
+    """
+    if quality not in RACE_QUALITIES:
+        raise ValueError(f"Unknown race quality {quality!r}, expected one of {', '.join(RACE_QUALITIES)}")
+    calendar = calendar or get_month_calendar(year, month)
+    events, hints = multiprocessing.Queue(), multiprocessing.Queue()
+    processes = {
+        "annealer": multiprocessing.Process(target=_annealer_worker, daemon=True,
+                                            args=(year, month, doctor_data, calendar, seed, max_iter,
+                                                  time_limit_seconds, events)),
+        "cpsat": multiprocessing.Process(target=_cpsat_worker, daemon=True,
+                                         args=(year, month, doctor_data, calendar, time_limit_seconds, profile,
+                                               events, hints)),
+    }
+    print(f"[Portfolio] Racing the annealer against CP-SAT (quality: {quality}, deadline {time_limit_seconds}s)")
+    start = time.perf_counter()
+    for process in processes.values():
+        process.start()
+
+    timeline = []
+    best = {}  # engine -> (schedule, cost or objective)
+    running = set(processes)
+    winner, reason = None, "deadline"
+    hint_sent = False
+    annealer_zero = False
+    while running:
+        remaining = time_limit_seconds - (time.perf_counter() - start)
+        if remaining <= 0:
+            break
+        try:
+            engine, kind, schedule, detail = events.get(timeout=remaining)
+        except queue.Empty:
+            break
+        elapsed = time.perf_counter() - start
+        if kind == "solution":
+            best[engine] = (schedule, detail)
+            label = f"cost {detail}" if engine == "annealer" else f"objective {detail:g}"
+            timeline.append((elapsed, engine, f"solution, {label}"))
+        else:
+            timeline.append((elapsed, engine, f"{kind}: {detail}"))
+        if kind == "done":
+            running.discard(engine)
+
+        # A zero-cost annealer schedule must also meet the per-type quotas of the CP-SAT model
+        annealer_zero = ("annealer" in best and best["annealer"][1] == 0
+                         and not quota_mismatches(best["annealer"][0], doctor_data, calendar))
+        if annealer_zero and not hint_sent:
+            hints.put(best["annealer"][0])
+            hint_sent = True
+        if quality == "feasible":
+            if engine == "cpsat" and kind == "solution":
+                winner, reason = "cpsat", "quality"
+            elif engine == "annealer" and annealer_zero:
+                winner, reason = "annealer", "quality"
+        elif engine == "cpsat" and kind == "done" and detail == "OPTIMAL":
+            winner, reason = "cpsat", "quality"
+        if winner:
+            break
+    else:
+        reason = "exhausted"
+
+    if winner is None:
+        # Deadline or nothing left running: CP-SAT's incumbent, else a valid annealer schedule;
+        # an annealer schedule with a positive cost breaks rules and is not returned
+        if "cpsat" in best:
+            winner = "cpsat"
+        elif annealer_zero:
+            winner = "annealer"
+    elapsed = time.perf_counter() - start
+    hints.put(None)
+    for process in processes.values():
+        _stop(process)
+
+    result = RaceResult(winner, best[winner][0] if winner else {}, reason, elapsed, timeline)
+    shape = instance_shape(calendar, doctor_data)
+    print_race(result, shape)
+    if race_log:
+        _append_race_log(race_log, year, month, quality, result, shape)
+    return result
+
+
+def _first(timeline, engine, prefix):
+    return next((elapsed for elapsed, who, event in timeline if who == engine and event.startswith(prefix)), None)
+
+
+def _round(seconds):
+    return None if seconds is None else round(seconds, 3)
+
+
+def print_race(result, shape):
+    """Print the race timeline and outcome."""
+    for elapsed, engine, event in result.timeline:
+        print(f"[Portfolio] {elapsed:7.2f}s {engine:<8} {event}")
+    described = ", ".join(f"{value} {name}" for name, value in shape.items())
+    if result.winner:
+        print(f"[Portfolio] Winner: {result.winner} after {result.elapsed:.2f}s ({result.reason}) on {described}")
+    else:
+        print(f"[Portfolio] No schedule after {result.elapsed:.2f}s ({result.reason}) on {described}")
+
+
+def _append_race_log(filename, year, month, quality, result, shape):
+    record = {
+        "year": year,
+        "month": month,
+        "quality": quality,
+        **shape,
+        "winner": result.winner,
+        "reason": result.reason,
+        "elapsed": round(result.elapsed, 3),
+        "annealer_zero_cost": _round(_first(result.timeline, "annealer", "solution, cost 0")),
+        "cpsat_first": _round(_first(result.timeline, "cpsat", "solution")),
+        "cpsat_restarted": _first(result.timeline, "cpsat", "restart") is not None,
+    }
+    with open(filename, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -1,10 +1,25 @@
 import argparse
 import datetime
+import itertools
 import os
-from collections import defaultdict
+import time
+from collections import defaultdict, namedtuple
+from functools import lru_cache
 from ortools.sat.python import cp_model
-from constraints import is_weekend, is_holiday
-from doctor_data import THAI_HOLIDAYS
+from month_calendar import get_month_calendar, calendar_for_schedule
+from eligibility import real_shift_eligibility
+from solver_tools import (
+    explain_infeasibility,
+    LexStage,
+    make_solver,
+    StopPolicy,
+    SOLVER_PROFILES,
+    resolve_profile,
+    solve_diverse,
+    solve_lexicographic,
+    stream_lexicographic,
+)
+from feasibility import check_real_shift_inputs, report_issues, timed_check
 
 # ─────────────────────────────────────────────────────────
 #  Doctor roster and month configuration
@@ -135,177 +150,555 @@ doctor_date_off = {
     ]
 }
 
+# Doctors who must work (ER or ward) on a day, per (year, month): {day: doctor}
+ROSTER_PINS = {
+    (2026, 4): {
+        10: "ธนัท",
+        15: "กุลประวีณ์",
+        22: "กุลประวีณ์",
+    },
+}
+
+# Shift-type restrictions per doctor/day, per (year, month)
+# Each entry: (day, doctor, shift) where shift is "ER" or "ward"
+ROSTER_NO_SHIFT = {
+    (2026, 4): [
+        (1, "ฤชุกร", "ER"),
+        (2, "ฤชุกร", "ER"),
+        (5, "ธนัท", "ER"),
+        (7, "ธนัท", "ER"),
+        (8, "ธนัท", "ER"),
+        (9, "ธนัท", "ER"),
+        (28, "สุประวีณ์", "ER"),
+        (29, "สุประวีณ์", "ER"),
+        # (30, "สุประวีณ์", "ER"),
+    ],
+}
+
+
+def roster_constraints(year, month, pinned=None, no_shift=None):
+    """
+    (pinned, no_shift) of a month: the given values, or the month's ROSTER_PINS /
+    ROSTER_NO_SHIFT entries for those left as None (empty for months without one).
+    Pass {} / [] to solve without any.
+    """
+    if pinned is None:
+        pinned = {datetime.date(year, month, day): doc for day, doc in ROSTER_PINS.get((year, month), {}).items()}
+    if no_shift is None:
+        no_shift = list(ROSTER_NO_SHIFT.get((year, month), []))
+    return pinned, no_shift
+
+
+pinned, no_shift = roster_constraints(Year, Month)
+
 
 # ─────────────────────────────────────────────────────────
 #  Schedule generator
 # ─────────────────────────────────────────────────────────
 
-def generate_real_schedule(year, month, doctor_data, date_doubles,
-                           doctor_date_off=None, time_limit_seconds=60):
+# Doctors referred to by name in the constraints or the objective; they are never
+# interchangeable with anyone else.
+NAMED_DOCTORS = ("ธนัท", "สุประวีณ์", "กุลพักตร์")
+
+
+def doctor_equivalence_classes(calendar, doctor_data, doctor_date_off=None, pinned=None, no_shift=None):
     """
-    Generate a simple daily schedule with exactly one ER and one ward
-    shift per day using OR-Tools CP-SAT.
+    Group doctors that are interchangeable in the real-shift model: same quotas,
+    same days off in the month, same pins and same no_shift rows.
+    Returns:
+        list of lists of doctor names, only classes with two or more doctors
+    """
+    month_days = set(calendar.days)
+    classes = defaultdict(list)
+    for doc, quota in doctor_data.items():
+        if doc in NAMED_DOCTORS:
+            continue
+        key = (
+            tuple((period, shift, quota[period][shift]) for period in sorted(quota) for shift in sorted(quota[period])),
+            tuple(sorted(d for d in (doctor_date_off or {}).get(doc, []) if d in month_days)),
+            tuple(sorted(d for d, pin_doc in (pinned or {}).items() if pin_doc == doc)),
+            tuple(sorted((day, shift) for day, row_doc, shift in (no_shift or []) if row_doc == doc)),
+        )
+        classes[key].append(doc)
+    return [docs for docs in classes.values() if len(docs) > 1]
 
-    Constraints
-    -----------
-    1. Each day has exactly one doctor assigned to ER and one to ward.
-    2. On date_doubles, the same doctor covers both ER and ward.
-    3. No doctor works on two consecutive calendar days.
 
-    Objective
-    ---------
-    Minimise the imbalance (max - min) in total shifts across doctors.
+def _add_lex_geq(model, xs, ys, name):
+    """
+    Constrain the 0/1 vector xs to be lexicographically >= ys.
+    eq[k] is true iff xs[:k+1] == ys[:k+1]; while the prefix is equal the next
+    position must satisfy xs[k] >= ys[k].
+    """
+    prefix_equal = None
+    for k, (x, y) in enumerate(zip(xs, ys)):
+        if prefix_equal is None:
+            model.Add(x >= y)
+        else:
+            model.Add(x >= y).OnlyEnforceIf(prefix_equal)
+        if k == len(xs) - 1:
+            break
+        eq = model.NewBoolVar(f"{name}_eq{k}")
+        model.Add(x == y).OnlyEnforceIf(eq)
+        guard = [] if prefix_equal is None else [prefix_equal.Not()]
+        model.AddBoolOr(guard + [x, y, eq])
+        model.AddBoolOr(guard + [x.Not(), y.Not(), eq])
+        if prefix_equal is not None:
+            model.AddImplication(eq, prefix_equal)
+        prefix_equal = eq
+
+
+class RealShiftModel:
+    """
+    CP-SAT model of the real-shift month.
+    er[d][i] / ward[d][i] is the BoolVar of doctor i working ER / ward on date d,
+    or None when the eligibility pre-pass ruled the pair out.
+    """
+
+    def __init__(self, calendar, doctors):
+        self.model = cp_model.CpModel()
+        self.calendar = calendar
+        self.doctors = doctors
+        self.er = {}
+        self.ward = {}
+        self.co_work_count = None
+        self.max_double = None
+        self.quota_deviation = None
+        self.symmetry_classes = []
+        self.encoding = "windows"
+        self.assumptions = {}
+        self.build_time = 0.0
+
+    def extract_schedule(self, value):
+        """Return (schedule, shift_count) from a value function (solver.Value or a callback's Value)."""
+        schedule    = {}
+        shift_count = defaultdict(int)
+        for d in self.calendar.days:
+            er_doc   = next(self.doctors[i] for i, v in enumerate(self.er[d])   if v is not None and value(v))
+            ward_doc = next(self.doctors[i] for i, v in enumerate(self.ward[d]) if v is not None and value(v))
+            schedule[d] = {"ER": er_doc, "ward": ward_doc}
+            shift_count[er_doc]   += 1
+            shift_count[ward_doc] += 1
+        return schedule, dict(shift_count)
+
+    def stats(self):
+        proto = self.model.Proto()
+        return len(proto.variables), len(proto.constraints)
+
+    def guard(self, family):
+        """Enforcement literals of a constraint family: none normally, its assumption literal when diagnosing."""
+        if family not in self.assumptions:
+            return []
+        return [self.assumptions[family]]
+
+    def add_hint(self, schedule):
+        """Hint the ER/ward variables from a schedule of the form {date: {"ER": doc, "ward": doc}}."""
+        hinted = 0
+        for d in self.calendar.days:
+            entry = schedule.get(d)
+            if not entry:
+                continue
+            for shift, variables in (("ER", self.er[d]), ("ward", self.ward[d])):
+                doc = entry.get(shift)
+                if doc not in self.doctors or variables[self.doctors.index(doc)] is None:
+                    continue
+                chosen = self.doctors.index(doc)
+                for i, var in enumerate(variables):
+                    if var is not None:
+                        self.model.AddHint(var, i == chosen)
+                hinted += 1
+        return hinted
+
+
+def _present(*variables):
+    """Drop the None entries left by eligibility pruning."""
+    return [v for v in variables if v is not None]
+
+
+# ── Spacing rules as an automaton (encoding="automaton") ──────────────
+# Constraints 3a, 3b, 3c and 4 only look at the last two days, so one automaton per doctor
+# can read the month day by day. Each doctor-day is one label: er + 2 * ward, plus 4 when
+# the day is a weekend/holiday before a weekday (3c), also for a doctor who cannot work it:
+# their next day still allows at most one shift.
+SpacingState = namedtuple("SpacingState", ["er1", "er2", "ward1", "run", "rest"])
+# rest: what 3c leaves for the next day, nothing / no ER and ward together / no shift at all
+REST_NONE, REST_NO_DOUBLE, REST_OFF = range(3)
+SPACING_STATES = [SpacingState(*values) for values in itertools.product((0, 1), (0, 1), (0, 1), range(3), range(3))]
+SPACING_LABELS = range(8)
+ENCODINGS = ("windows", "automaton")
+
+
+def _spacing_advance(state, label):
+    """SpacingState after a day labelled `label`, without checking the rules."""
+    shifts, rest_day = label & 0b11, label >> 2
+    worked = shifts > 0
+    rest = (REST_OFF if worked else REST_NO_DOUBLE) if rest_day else REST_NONE
+    return SpacingState(shifts & 1, state.er1, shifts >> 1, min(state.run + 1, 2) if worked else 0, rest)
+
+
+def _spacing_step(state, label):
+    """Next SpacingState after a day labelled `label`, or None when that day breaks a spacing rule."""
+    shifts = label & 0b11
+    if shifts & 1 and (state.er1 or state.er2):                 # 3a: ER at most once in 3 days
+        return None
+    if shifts >> 1 and state.ward1:                             # 3b: no consecutive ward days
+        return None
+    if state.rest == REST_OFF and shifts or state.rest == REST_NO_DOUBLE and shifts == 0b11:
+        return None                                             # 3c: rest after a weekend/holiday
+    if shifts and state.run == 2:                               # 4: at most 2 days in a row
+        return None
+    return _spacing_advance(state, label)
+
+
+@lru_cache(maxsize=None)
+def spacing_automaton(starts):
+    """
+    Transitions of the spacing automaton reachable from the states of `starts`.
+    Returns:
+        (final states, list of (state, label, next state)), states numbered by SPACING_STATES
     """
+    index = {state: k for k, state in enumerate(SPACING_STATES)}
+    seen, frontier, transitions = set(starts), list(starts), []
+    while frontier:
+        state = frontier.pop()
+        for label in SPACING_LABELS:
+            head = _spacing_step(state, label)
+            if head is None:
+                continue
+            transitions.append((index[state], label, index[head]))
+            if head not in seen:
+                seen.add(head)
+                frontier.append(head)
+    return sorted(index[state] for state in seen), transitions
+
+
+
+def spacing_start(calendar, doctor, carry_in):
+    """SpacingState of `doctor` before calendar.days[0], from the carried-in days (missing days are off)."""
+    state = SPACING_STATES[0]
+    first = calendar.days[0]
+    for back in (2, 1):
+        d = first - datetime.timedelta(days=back)
+        entry = (carry_in or {}).get(d, {})
+        shifts = (entry.get("ER") == doctor) + 2 * (entry.get("ward") == doctor)
+        # A carried-in weekend/holiday day asks for rest (3c), also from the doctors it left off
+        rest_day = (back == 1 and d in (carry_in or {}) and calendar.is_weekend_or_holiday(d)
+                    and calendar.period[first] == "weekday")
+        state = _spacing_advance(state, shifts + 4 * bool(rest_day))
+    return state
+
+
+def add_spacing_automata(rm, carry_in=None):
+    """
+    Post constraints 3a-4 of build_real_model as one AddAutomaton per doctor.
+    state[d][i] = er + 2 * ward (+ 4 on a weekend/holiday before a weekday) is the shared
+    state of doctor i on day d; the carried-in days set the automaton's starting state.
+    Returns:
+        dict date -> list of state expressions (IntVar, or int where the doctor cannot work)
+    """
+    model, calendar, days = rm.model, rm.calendar, rm.calendar.days
+    states = {}
+    for k, d in enumerate(days):
+        rest_before = (k + 1 < len(days) and calendar.period[d] == "weekend"
+                       and calendar.period[days[k + 1]] == "weekday")
+        states[d] = []
+        for i in range(len(rm.doctors)):
+            shifts = [(var, weight) for var, weight in ((rm.er[d][i], 1), (rm.ward[d][i], 2)) if var is not None]
+            offset = 4 if rest_before else 0
+            if not shifts:
+                states[d].append(offset)
+                continue
+            state = model.NewIntVar(offset, offset + 3, f"state_d{d.day}_doc{i}")
+            model.Add(state == offset + sum(weight * var for var, weight in shifts))
+            states[d].append(state)
+
+    starts = [spacing_start(calendar, doctor, carry_in) for doctor in rm.doctors]
+    final_states, transitions = spacing_automaton(frozenset(starts))
+    for i, start in enumerate(starts):
+        model.AddAutomaton([states[d][i] for d in days], SPACING_STATES.index(start), final_states, transitions)
+    return states
+
+# Constraint families that diagnose mode guards with assumption literals
+DIAGNOSIS_FAMILIES = {
+    "days_off":      "days off (doctor_date_off)",
+    "no_shift":      "shift-type restrictions (no_shift)",
+    "pinned":        "pinned assignments",
+    "date_doubles":  "one doctor covers ER and ward on date_doubles",
+    "weekend_split": "different ER and ward doctors on weekends/holidays",
+    "consecutive":   "spacing rules (ER 1 in 3 days, no back-to-back ward, rest after weekend, max 2 days in a row)",
+    "window_11_15":  "days 11-15 limits (max 3 shifts, ธนัท exactly 2)",
+    "quotas":        "per-doctor shift quotas (doctor_data)",
+}
+
+
+def build_real_model(calendar, doctor_data, date_doubles, doctor_date_off=None,
+                     pinned=None, no_shift=None, symmetry_breaking=True, diagnose=False, frozen=None,
+                     carry_in=None, soft_quotas=False, encoding="windows"):
+    """
+    Build the real-shift CP-SAT model. Day offs and no_shift entries never become
+    variables: the eligibility pre-pass removes those (day, shift, doctor) triples.
+    With symmetry_breaking, doctors of one equivalence class are ordered
+    lexicographically by their assignment vectors. frozen (date -> {"ER", "ward"})
+    keeps the given doctors on those dates; only the other days get free variables.
+
+    carry_in (date -> {"ER", "ward"}) holds already decided days before the calendar:
+    the spacing rules look two days back into it and the days 11-15 window counts its
+    shifts. It makes otherwise interchangeable doctors distinct, so it turns symmetry
+    breaking off. With soft_quotas the quotas are targets: rm.quota_deviation is the
+    total deviation and real_shift_stages minimises it first (see decomposition.py).
+
+    encoding selects how the spacing rules 3a-4 are posted: "windows" adds one constraint
+    (and fresh worked indicators) per window, "automaton" one shared state variable per
+    doctor-day and one AddAutomaton per doctor over them (see spacing_automaton).
+    Both accept the same schedules.
+
+    With diagnose, every (day, shift, doctor) variable is created, each family of
+    DIAGNOSIS_FAMILIES is enforced only under its literal in rm.assumptions, and
+    there is no objective; see diagnose_real_schedule. An automaton cannot be enforced
+    under a literal, so diagnose always uses the windows encoding.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding {encoding!r}, expected one of {', '.join(ENCODINGS)}")
+    start = time.perf_counter()
     doctors = list(doctor_data.keys())
     n_doc = len(doctors)
-
-    days_in_month = (
-        datetime.date(year, month % 12 + 1, 1) - datetime.timedelta(days=1)
-    ).day
-    days = [datetime.date(year, month, d) for d in range(1, days_in_month + 1)]
+    days = calendar.days
     double_set = set(date_doubles)
-    off_sets = {doc: set(dates) for doc, dates in (doctor_date_off or {}).items()}
+    rm = RealShiftModel(calendar, doctors)
+    model = rm.model
+    if diagnose:
+        rm.assumptions = {family: model.NewBoolVar(f"assume_{family}") for family in DIAGNOSIS_FAMILIES}
+        symmetry_breaking = False
+        encoding = "windows"
+    rm.encoding = encoding
+    if carry_in:
+        symmetry_breaking = False
+    guard = rm.guard
 
-    model = cp_model.CpModel()
+    # ── Constraint 0 / 0c: days off and shift-type restrictions ───────
+    if diagnose:
+        er_ok, ward_ok = real_shift_eligibility(calendar, doctors, [])
+    else:
+        er_ok, ward_ok = real_shift_eligibility(calendar, doctors, date_doubles,
+                                                doctor_date_off=doctor_date_off,
+                                                no_shift=no_shift, pinned=pinned, frozen=frozen)
 
     # Decision variables
     # er[d][i]   = 1 iff doctor i works ER on day d
     # ward[d][i] = 1 iff doctor i works ward on day d
-    er   = {d: [model.NewBoolVar(f"er_d{d.day}_doc{i}")   for i in range(n_doc)] for d in days}
-    ward = {d: [model.NewBoolVar(f"ward_d{d.day}_doc{i}") for i in range(n_doc)] for d in days}
+    er   = rm.er   = {d: [model.NewBoolVar(f"er_d{d.day}_doc{i}")   if er_ok[d][i]   else None for i in range(n_doc)] for d in days}
+    ward = rm.ward = {d: [model.NewBoolVar(f"ward_d{d.day}_doc{i}") if ward_ok[d][i] else None for i in range(n_doc)] for d in days}
 
-    # ── Constraint 0: doctor cannot work on their day off ──────────────
-    for i, doc in enumerate(doctors):
-        for d in days:
-            if d in off_sets.get(doc, set()):
-                model.Add(er[d][i] == 0)
-                model.Add(ward[d][i] == 0)
+    if diagnose:
+        # Pruning by days off and no_shift becomes a guarded constraint instead
+        for family, kwargs in (("days_off", {"doctor_date_off": doctor_date_off}), ("no_shift", {"no_shift": no_shift})):
+            fam_er_ok, fam_ward_ok = real_shift_eligibility(calendar, doctors, [], **kwargs)
+            for d in days:
+                for i in range(n_doc):
+                    if not fam_er_ok[d][i]:
+                        model.Add(er[d][i] == 0).OnlyEnforceIf(guard(family))
+                    if not fam_ward_ok[d][i]:
+                        model.Add(ward[d][i] == 0).OnlyEnforceIf(guard(family))
 
     # ── Constraint 0b: pinned assignments ─────────────────────────────
-    pinned = {
-        datetime.date(year, month, 10): "ธนัท",
-        datetime.date(year, month, 15): "กุลประวีณ์",
-        datetime.date(year, month, 22): "กุลประวีณ์",
-    }
-    for pin_date, pin_doc in pinned.items():
+    for pin_date, pin_doc in (pinned or {}).items():
         if pin_date in er:
             pi = doctors.index(pin_doc)
-            model.Add(er[pin_date][pi] + ward[pin_date][pi] >= 1)
-
-    # ── Constraint 0c: shift-type restrictions per doctor/date ─────────
-    # Each entry: (day, doctor, shift) where shift is "ER" or "ward"
-    no_shift = [
-        (1, "ฤชุกร", "ER"),
-        (2, "ฤชุกร", "ER"),
-        (5, "ธนัท", "ER"),
-        (7, "ธนัท", "ER"),
-        (8, "ธนัท", "ER"),
-        (9, "ธนัท", "ER"),
-        (28, "สุประวีณ์", "ER"),
-        (29, "สุประวีณ์", "ER"),
-        # (30, "สุประวีณ์", "ER"),
-    ]
-    for day_num, doc, shift_type in no_shift:
-        d = datetime.date(year, month, day_num)
-        if d in er:
-            di = doctors.index(doc)
-            if shift_type == "ER":
-                model.Add(er[d][di] == 0)
-            else:
-                model.Add(ward[d][di] == 0)
+            model.AddBoolOr(_present(er[pin_date][pi], ward[pin_date][pi])).OnlyEnforceIf(guard("pinned"))
 
     # ── Constraint 1: exactly one doctor per shift per day ────────────
     for d in days:
-        model.AddExactlyOne(er[d])
-        model.AddExactlyOne(ward[d])
+        model.AddExactlyOne(_present(*er[d]))
+        model.AddExactlyOne(_present(*ward[d]))
 
     # ── Constraint 2: date_doubles → same doctor for ER and ward ──────
     for d in days:
         if d in double_set:
             for i in range(n_doc):
-                model.Add(er[d][i] == ward[d][i])
+                if er[d][i] is not None:
+                    model.Add(er[d][i] == ward[d][i]).OnlyEnforceIf(guard("date_doubles"))
 
     # ── Constraint 2b: weekend/holiday → different doctors for ER and ward ──
     for d in days:
-        if d not in double_set and (is_weekend(d) or is_holiday(d)):
+        if d not in double_set and calendar.period[d] == "weekend":
             for i in range(n_doc):
-                model.Add(er[d][i] + ward[d][i] <= 1)
+                pair = _present(er[d][i], ward[d][i])
+                if len(pair) > 1:
+                    model.AddAtMostOne(pair).OnlyEnforceIf(guard("weekend_split"))
 
-    # ── Constraint 3a: no more than 1 ER shift per doctor in any 3 consecutive days ──
-    for k in range(len(days) - 2):
-        d0, d1, d2 = days[k], days[k + 1], days[k + 2]
-        for i in range(n_doc):
-            model.Add(er[d0][i] + er[d1][i] + er[d2][i] <= 1)
-    
-    # ── Constraint 3b: no doctor on consecutive ward days ──────────────
-    for k in range(len(days) - 1):
-        d_cur  = days[k]
-        d_next = days[k + 1]
-        for i in range(n_doc):
-            model.Add(ward[d_cur][i] + ward[d_next][i] <= 1)
+    # worked[d][i] = doctor i works any shift on day d (None when they cannot work that day)
+    def new_worked(d, i, name):
+        shifts = _present(er[d][i], ward[d][i])
+        if not shifts:
+            return None
+        worked = model.NewBoolVar(name)
+        model.AddMaxEquality(worked, shifts)
+        return worked
 
-    # ── Constraint 3c: no weekday shift immediately after a weekend/holiday ──
-    for k in range(len(days) - 1):
-        d_cur  = days[k]
-        d_next = days[k + 1]
-        if (is_weekend(d_cur) or is_holiday(d_cur)) and not (is_weekend(d_next) or is_holiday(d_next)):
+    if encoding == "windows":
+        # ── Constraint 3a: no more than 1 ER shift per doctor in any 3 consecutive days ──
+        for k in range(len(days) - 2):
+            d0, d1, d2 = days[k], days[k + 1], days[k + 2]
             for i in range(n_doc):
-                worked_cur  = model.NewBoolVar(f"worked_wkend_d{d_cur.day}_doc{i}")
-                model.AddMaxEquality(worked_cur, [er[d_cur][i], ward[d_cur][i]])
-                model.Add(worked_cur + er[d_next][i] + ward[d_next][i] <= 1)
+                window = _present(er[d0][i], er[d1][i], er[d2][i])
+                if len(window) > 1:
+                    model.AddAtMostOne(window).OnlyEnforceIf(guard("consecutive"))
 
-    # ── Constraint 4: no doctor works more than 2 consecutive days ────
-    for k in range(len(days) - 2):
-        d0, d1, d2 = days[k], days[k + 1], days[k + 2]
-        for i in range(n_doc):
-            worked0 = model.NewBoolVar(f"worked3_d{d0.day}_doc{i}")
-            worked1 = model.NewBoolVar(f"worked3_d{d1.day}_doc{i}")
-            worked2 = model.NewBoolVar(f"worked3_d{d2.day}_doc{i}")
-            model.AddMaxEquality(worked0, [er[d0][i], ward[d0][i]])
-            model.AddMaxEquality(worked1, [er[d1][i], ward[d1][i]])
-            model.AddMaxEquality(worked2, [er[d2][i], ward[d2][i]])
-            model.Add(worked0 + worked1 + worked2 <= 2)
+        # ── Constraint 3b: no doctor on consecutive ward days ──────────────
+        for k in range(len(days) - 1):
+            d_cur  = days[k]
+            d_next = days[k + 1]
+            for i in range(n_doc):
+                window = _present(ward[d_cur][i], ward[d_next][i])
+                if len(window) > 1:
+                    model.AddAtMostOne(window).OnlyEnforceIf(guard("consecutive"))
+
+        # ── Constraint 3c: no weekday shift immediately after a weekend/holiday ──
+        for k in range(len(days) - 1):
+            d_cur  = days[k]
+            d_next = days[k + 1]
+            if calendar.period[d_cur] == "weekend" and calendar.period[d_next] == "weekday":
+                for i in range(n_doc):
+                    worked_cur = new_worked(d_cur, i, f"worked_wkend_d{d_cur.day}_doc{i}")
+                    window = _present(worked_cur, er[d_next][i], ward[d_next][i])
+                    # A doctor who cannot work d_cur still takes at most one shift on d_next
+                    if len(window) > 1:
+                        model.Add(sum(window) <= 1).OnlyEnforceIf(guard("consecutive"))
+
+        # ── Constraint 4: no doctor works more than 2 consecutive days ────
+        for k in range(len(days) - 2):
+            d0, d1, d2 = days[k], days[k + 1], days[k + 2]
+            for i in range(n_doc):
+                if all(_present(er[d][i], ward[d][i]) for d in (d0, d1, d2)):
+                    worked0 = new_worked(d0, i, f"worked3_d{d0.day}_doc{i}")
+                    worked1 = new_worked(d1, i, f"worked3_d{d1.day}_doc{i}")
+                    worked2 = new_worked(d2, i, f"worked3_d{d2.day}_doc{i}")
+                    model.Add(worked0 + worked1 + worked2 <= 2).OnlyEnforceIf(guard("consecutive"))
+
+        # ── Carried-in days: the same spacing rules with their shifts as constants ──
+        carried = {}
+        if carry_in and days:
+            for back in (1, 2):
+                d = days[0] - datetime.timedelta(days=back)
+                if d in carry_in:
+                    carried[back] = (d, {shift: doctors.index(doc) for shift, doc in carry_in[d].items()
+                                         if doc in doctors})
+        for back, (d_prev, on_shift) in carried.items():
+            for i in set(on_shift.values()):
+                ahead = days[:3 - back]
+                blocked = []
+                # 3a: ER at most once in 3 days
+                if on_shift.get("ER") == i:
+                    blocked += [er[d][i] for d in ahead]
+                if back == 1:
+                    # 3b: no consecutive ward days
+                    if on_shift.get("ward") == i:
+                        blocked.append(ward[days[0]][i])
+                    # 3c: rest after a weekend/holiday
+                    if calendar.is_weekend_or_holiday(d_prev) and calendar.period[days[0]] == "weekday":
+                        blocked += [er[days[0]][i], ward[days[0]][i]]
+                for var in _present(*blocked):
+                    model.Add(var == 0).OnlyEnforceIf(guard("consecutive"))
+            # 3c for the doctors off on a carried-in weekend/holiday: at most one shift on days[0]
+            if back == 1 and calendar.is_weekend_or_holiday(d_prev) and calendar.period[days[0]] == "weekday":
+                for i in set(range(n_doc)) - set(on_shift.values()):
+                    pair = _present(er[days[0]][i], ward[days[0]][i])
+                    if len(pair) > 1:
+                        model.AddAtMostOne(pair).OnlyEnforceIf(guard("consecutive"))
+        # 4: at most 2 consecutive working days across the boundary
+        if 1 in carried:
+            for i in set(carried[1][1].values()):
+                if 2 in carried and i in carried[2][1].values():
+                    for var in _present(er[days[0]][i], ward[days[0]][i]):
+                        model.Add(var == 0).OnlyEnforceIf(guard("consecutive"))
+                elif len(days) > 1 and _present(er[days[0]][i], ward[days[0]][i]) and _present(er[days[1]][i], ward[days[1]][i]):
+                    worked0 = new_worked(days[0], i, f"worked_carry_d{days[0].day}_doc{i}")
+                    worked1 = new_worked(days[1], i, f"worked_carry_d{days[1].day}_doc{i}")
+                    model.Add(worked0 + worked1 <= 1).OnlyEnforceIf(guard("consecutive"))
+    else:
+        # ── Constraints 3a-4 and the carried-in days as one automaton per doctor ──
+        add_spacing_automata(rm, carry_in)
 
     # ── Constraint 4b: max 3 shifts per doctor during days 11-15 ──────
+    # Carried-in days of the same month count towards the window; when the calendar and
+    # the carried days do not cover all of days 11-15 (a block), ธนัท is only bounded from above
     window_days = [d for d in days if 11 <= d.day <= 15]
-    for i in range(n_doc):
-        model.Add(sum(er[d][i] + ward[d][i] for d in window_days) <= 3)
+    carried_window = defaultdict(int)
+    for d, entry in (carry_in or {}).items():
+        if (d.year, d.month) == (calendar.year, calendar.month) and 11 <= d.day <= 15:
+            for doc in entry.values():
+                carried_window[doc] += 1
+    if window_days:
+        for i in range(n_doc):
+            model.Add(sum(_present(*(v for d in window_days for v in (er[d][i], ward[d][i]))))
+                      + carried_window[doctors[i]] <= 3).OnlyEnforceIf(guard("window_11_15"))
 
-    # ── Constraint 4c: ธนัท must have exactly 2 shifts during days 11-15 ──
-    idx_thanat = doctors.index("ธนัท")
-    model.Add(sum(er[d][idx_thanat] + ward[d][idx_thanat] for d in window_days) == 2)
+        # ── Constraint 4c: ธนัท must have exactly 2 shifts during days 11-15 ──
+        idx_thanat = doctors.index("ธนัท")
+        thanat_window = sum(_present(*(v for d in window_days for v in (er[d][idx_thanat], ward[d][idx_thanat]))))
+        window_start = datetime.date(calendar.year, calendar.month, 11)
+        if days[-1].day >= 15 and (days[0] <= window_start or window_start in (carry_in or {})):
+            model.Add(thanat_window == 2 - carried_window["ธนัท"]).OnlyEnforceIf(guard("window_11_15"))
+        else:
+            model.Add(thanat_window <= 2 - carried_window["ธนัท"]).OnlyEnforceIf(guard("window_11_15"))
 
     # ── Constraint 5: enforce shift counts from doctor_data ───────────
     # Weekday days = not weekend and not holiday; weekend days = weekend or holiday
-    weekday_days = [d for d in days if not is_weekend(d) and not is_holiday(d)]
-    wkend_days   = [d for d in days if is_weekend(d) or is_holiday(d)]
+    weekday_days = calendar.weekday_days
+    wkend_days   = calendar.weekend_days
 
+    deviations, max_deviation = [], 0
     for i, doc in enumerate(doctors):
         quota = doctor_data[doc]
-        # ER on weekdays
-        model.Add(sum(er[d][i]   for d in weekday_days) == quota["weekday"]["ER"])
-        # ward on weekdays
-        model.Add(sum(ward[d][i] for d in weekday_days) == quota["weekday"]["ward"])
-        # ER on weekends/holidays
-        model.Add(sum(er[d][i]   for d in wkend_days)   == quota["weekend"]["ER"])
-        # ward on weekends/holidays
-        model.Add(sum(ward[d][i] for d in wkend_days)   == quota["weekend"]["ward"])
+        for period, period_days in (("weekday", weekday_days), ("weekend", wkend_days)):
+            # ER, then ward, on weekdays / on weekends and holidays
+            for shift, variables in (("ER", er), ("ward", ward)):
+                assigned = sum(_present(*(variables[d][i] for d in period_days)))
+                target = quota[period][shift]
+                if soft_quotas:
+                    deviation = model.NewIntVar(0, max(len(period_days), target), f"dev_{period}_{shift}_doc{i}")
+                    max_deviation += max(len(period_days), target)
+                    model.Add(assigned - target <= deviation)
+                    model.Add(target - assigned <= deviation)
+                    deviations.append(deviation)
+                else:
+                    model.Add(assigned == target).OnlyEnforceIf(guard("quotas"))
+    if soft_quotas:
+        rm.quota_deviation = model.NewIntVar(0, max_deviation, "quota_deviation")
+        model.Add(rm.quota_deviation == sum(deviations))
+
+    # ── Symmetry breaking: order interchangeable doctors ──────────────
+    if symmetry_breaking:
+        rm.symmetry_classes = doctor_equivalence_classes(calendar, doctor_data, doctor_date_off,
+                                                         pinned=pinned, no_shift=no_shift)
+        for docs in rm.symmetry_classes:
+            # Equivalent doctors share eligibility, so their vectors line up position by position.
+            # On double days ward == ER, so only the ER variable is used.
+            vectors = [
+                _present(*(v for d in days for v in ((er[d][i],) if d in double_set else (er[d][i], ward[d][i]))))
+                for i in (doctors.index(doc) for doc in docs)
+            ]
+            for k in range(len(vectors) - 1):
+                _add_lex_geq(model, vectors[k], vectors[k + 1], f"lex_{k}_{docs[k]}")
+
+    if diagnose:
+        # Only feasibility matters when looking for a conflict
+        rm.build_time = time.perf_counter() - start
+        return rm
 
     # ── Objective: maximise co-work days for สุประวีณ์ + กุลพักตร์ ──────
     idx_su  = doctors.index("สุประวีณ์")
     idx_kul = doctors.index("กุลพักตร์")
     co_work_vars = []
-    for d in days:
-        if is_weekend(d) or is_holiday(d):
-            su_works  = model.NewBoolVar(f"su_works_d{d.day}")
-            kul_works = model.NewBoolVar(f"kul_works_d{d.day}")
-            model.AddMaxEquality(su_works,  [er[d][idx_su],  ward[d][idx_su]])
-            model.AddMaxEquality(kul_works, [er[d][idx_kul], ward[d][idx_kul]])
-            both = model.NewBoolVar(f"both_work_d{d.day}")
-            model.AddMinEquality(both, [su_works, kul_works])
-            co_work_vars.append(both)
-
-    co_work_count = model.NewIntVar(0, len(co_work_vars) if co_work_vars else 1, "co_work_count")
+    for d in wkend_days:
+        su_works  = new_worked(d, idx_su,  f"su_works_d{d.day}")
+        kul_works = new_worked(d, idx_kul, f"kul_works_d{d.day}")
+        if su_works is None or kul_works is None:
+            continue
+        both = model.NewBoolVar(f"both_work_d{d.day}")
+        model.AddMinEquality(both, [su_works, kul_works])
+        co_work_vars.append(both)
+
+    co_work_count = rm.co_work_count = model.NewIntVar(0, len(co_work_vars) if co_work_vars else 1, "co_work_count")
     if co_work_vars:
         model.Add(co_work_count == sum(co_work_vars))
     else:
@@ -318,54 +711,345 @@ def generate_real_schedule(year, month, doctor_data, date_doubles,
     for i in range(n_doc):
         # On a double day er[d][i] == ward[d][i], so er[d][i] alone == 1 iff assigned
         cnt = model.NewIntVar(0, len(double_days_list), f"double_cnt_doc{i}")
-        model.Add(cnt == sum(er[d][i] for d in double_days_list))
+        model.Add(cnt == sum(_present(*(er[d][i] for d in double_days_list))))
         doc_double_counts.append(cnt)
 
-    max_double = model.NewIntVar(0, len(double_days_list), "max_double")
+    max_double = rm.max_double = model.NewIntVar(0, len(double_days_list), "max_double")
     model.AddMaxEquality(max_double, doc_double_counts)
 
-    # Combined objective:
-    #   primary   : maximise co-work days         (weight 100)
-    #   secondary : minimise max double-day count  (weight 1)
-    model.Maximize(co_work_count - max_double)
+    # Objectives in priority order, solved lexicographically (see real_shift_stages):
+    #   primary   : maximise co-work days
+    #   secondary : minimise max double-day count, with the co-work optimum kept
 
-    # ── Solve ─────────────────────────────────────────────────────────
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = time_limit_seconds
-    solver.parameters.log_search_progress = False
+    rm.build_time = time.perf_counter() - start
+    return rm
+
+
+def real_shift_stages(rm, time_limit_seconds=60, stage_time_limits=None):
+    """
+    Lexicographic stages of the real-shift objective.
+    Args:
+        rm: RealShiftModel
+        time_limit_seconds: total budget, split evenly over the stages
+        stage_time_limits: optional (co_work seconds, max_double seconds), overrides the split;
+            a soft-quota model has a quota stage first and needs three limits
+    Returns:
+        list of LexStage
+    """
+    objectives = [("co_work", rm.co_work_count, True), ("max_double", rm.max_double, False)]
+    if rm.quota_deviation is not None:
+        objectives.insert(0, ("quota", rm.quota_deviation, False))
+    limits = stage_time_limits or [time_limit_seconds / len(objectives)] * len(objectives)
+    return [LexStage(name, expr, maximize, limit) for (name, expr, maximize), limit in zip(objectives, limits)]
+
+
+def _print_stage_results(results):
+    for result in results:
+        print(f"[OR-Tools] Stage {result.name:<10}: {result.value} "
+              f"({result.status}, {result.wall_time:.2f}s, stopped: {result.stop_reason})")
+
+
+def _prepare_real_solve(year, month, doctor_data, date_doubles, doctor_date_off, time_limit_seconds,
+                        calendar, pinned, no_shift, symmetry_breaking, hint, repair_hint,
+                        profile=None, log_search=False, encoding="windows"):
+    """
+    Build the real-shift model and a configured solver, shared by the blocking and streaming entry points.
+    Returns (None, None) when the pre-check rejects the inputs, before any model is built.
+    """
+    calendar = calendar or get_month_calendar(year, month)
+    pinned, no_shift = roster_constraints(year, month, pinned, no_shift)
+    issues, elapsed = timed_check(check_real_shift_inputs, calendar, doctor_data, date_doubles,
+                                  doctor_date_off=doctor_date_off, pinned=pinned, no_shift=no_shift)
+    if not report_issues(issues, "OR-Tools", elapsed):
+        return None, None
+    rm = build_real_model(calendar, doctor_data, date_doubles, doctor_date_off=doctor_date_off,
+                          pinned=pinned, no_shift=no_shift, symmetry_breaking=symmetry_breaking, encoding=encoding)
+    num_vars, num_constraints = rm.stats()
+    print(f"[OR-Tools] Model built in {rm.build_time:.3f}s ({num_vars} variables, {num_constraints} constraints, "
+          f"{encoding} encoding)")
+    if symmetry_breaking:
+        if rm.symmetry_classes:
+            print(f"[OR-Tools] Symmetry  : {', '.join('/'.join(docs) for docs in rm.symmetry_classes)}")
+        else:
+            print("[OR-Tools] Symmetry  : no interchangeable doctors")
+    if hint:
+        print(f"[OR-Tools] Hinted    : {rm.add_hint(hint)} of {2 * len(calendar.days)} shifts")
+
+    solver = make_solver(time_limit_seconds, profile, log_search)
+    if hint and repair_hint:
+        solver.parameters.repair_hint = True
+    return rm, solver
+
+
+def generate_real_schedule(year, month, doctor_data, date_doubles,
+                           doctor_date_off=None, time_limit_seconds=60, calendar=None,
+                           pinned=None, no_shift=None, symmetry_breaking=True,
+                           hint=None, repair_hint=False, stage_time_limits=None,
+                           profile=None, log_search=False, stop_policy=None, encoding="windows"):
+    """
+    Generate a simple daily schedule with exactly one ER and one ward
+    shift per day using OR-Tools CP-SAT.
+
+    Constraints
+    -----------
+    1. Each day has exactly one doctor assigned to ER and one to ward.
+    2. On date_doubles, the same doctor covers both ER and ward.
+    3. No doctor works on two consecutive calendar days.
+
+    Days off (doctor_date_off), pinned dates (date -> doctor) and no_shift
+    entries ((day, doctor, "ER" or "ward")) are optional. pinned and no_shift
+    left as None take the month's ROSTER_PINS / ROSTER_NO_SHIFT entries, as
+    the built-in April pins always applied before (see roster_constraints);
+    pass {} / [] to solve without them. symmetry_breaking
+    orders interchangeable doctors (see doctor_equivalence_classes).
+    hint is a previous schedule to warm-start from; with repair_hint the
+    solver may repair it when it breaks a constraint.
+
+    Objective
+    ---------
+    Solved in stages: first maximise the weekend/holiday days สุประวีณ์ and
+    กุลพักตร์ work together, then, with that optimum fixed, minimise the
+    largest number of double days given to one doctor. time_limit_seconds
+    is split evenly over the stages unless stage_time_limits gives one
+    limit per stage. profile selects a solver parameter profile (see
+    solver_tools.SOLVER_PROFILES) and log_search prints the CP-SAT log.
+    stop_policy (solver_tools.StopPolicy) ends each stage early once it
+    stops improving or its gap is small enough. encoding picks how the
+    spacing rules are posted (see build_real_model).
+    """
+    rm, solver = _prepare_real_solve(year, month, doctor_data, date_doubles, doctor_date_off, time_limit_seconds,
+                                     calendar, pinned, no_shift, symmetry_breaking, hint, repair_hint,
+                                     profile, log_search, encoding)
+    if rm is None:
+        return None
 
     print("[OR-Tools] Solving real shift schedule...")
-    status = solver.Solve(model)
+    stages = real_shift_stages(rm, time_limit_seconds, stage_time_limits)
+    status, results, solution = solve_lexicographic(solver, rm.model, stages, rm.extract_schedule, stop_policy)
 
-    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+    if solution is None:
         print(f"[OR-Tools] No solution found. Status: {solver.StatusName(status)}")
+        if status == cp_model.INFEASIBLE:
+            diagnose_real_schedule(year, month, doctor_data, date_doubles, doctor_date_off=doctor_date_off,
+                                   calendar=calendar, pinned=pinned, no_shift=no_shift)
         return None
 
+    _print_stage_results(results)
+    values = {result.name: result.value for result in results}
+    print(f"[OR-Tools] Wall time : {sum(result.wall_time for result in results):.2f}s")
+    print(f"[OR-Tools] Co-work   : {values['co_work']} weekend/holiday days สุประวีณ์+กุลพักตร์")
+    if "max_double" in values:
+        print(f"[OR-Tools] Max double: {values['max_double']} double-day shifts (max per doctor)")
+    return solution
+
+
+def generate_real_schedule_pool(year, month, doctor_data, date_doubles, count=3, min_distance=6,
+                                doctor_date_off=None, time_limit_seconds=60, calendar=None,
+                                pinned=None, no_shift=None, stage_time_limits=None, profile=None):
+    """
+    Generate up to `count` alternative schedules that differ pairwise in at least
+    `min_distance` ER/ward shifts. The objectives are optimised first, as in
+    generate_real_schedule, and every alternative keeps those optimal values; each
+    alternative adds a no-good cut to the same model instead of starting a new solve.
+    With the stage values fixed there is nothing left to optimise, so each alternative
+    stops at its first feasible solution, within time_limit_seconds.
+    Returns:
+        list of (schedule, shift_count), may be shorter than count
+    """
+    # Lexicographic ordering of interchangeable doctors would hide alternatives that only swap them
+    rm, solver = _prepare_real_solve(year, month, doctor_data, date_doubles, doctor_date_off, time_limit_seconds,
+                                     calendar, pinned, no_shift, False, None, False, profile)
+    if rm is None:
+        return []
+    stages = real_shift_stages(rm, time_limit_seconds, stage_time_limits)
+    status, results, solution = solve_lexicographic(solver, rm.model, stages, rm.extract_schedule)
+    if solution is None:
+        print(f"[OR-Tools] No solution found. Status: {solver.StatusName(status)}")
+        return []
+    _print_stage_results(results)
+
+    # Every alternative gets exactly the stage values reached above, not just the last stage's
+    for stage, result in zip(stages, results):
+        rm.model.Add(stage.expr == result.value)
+    rm.model.ClearObjective()
+    solver.parameters.max_time_in_seconds = time_limit_seconds
+    print(f"[OR-Tools] Solving for {count} alternatives at least {min_distance} shifts apart...")
+    decision_vars = [var for d in rm.calendar.days for var in rm.er[d] + rm.ward[d] if var is not None]
+    pool = solve_diverse(solver, rm.model, decision_vars, rm.extract_schedule, count, min_distance)
+    print(f"[OR-Tools] Found {len(pool)} alternative(s)")
+    return pool
+
+
+def compare_real_encodings(year, month, doctor_data, date_doubles, doctor_date_off=None, calendar=None,
+                           pinned=None, no_shift=None, symmetry_breaking=True):
+    """
+    Build the real-shift model with each spacing-rule encoding and report its size.
+    Returns:
+        dict encoding -> (variables, constraints, build seconds)
+    """
+    calendar = calendar or get_month_calendar(year, month)
+    pinned, no_shift = roster_constraints(year, month, pinned, no_shift)
+    sizes = {}
+    for encoding in ENCODINGS:
+        rm = build_real_model(calendar, doctor_data, date_doubles, doctor_date_off=doctor_date_off,
+                              pinned=pinned, no_shift=no_shift, symmetry_breaking=symmetry_breaking,
+                              encoding=encoding)
+        sizes[encoding] = rm.stats() + (rm.build_time,)
+        print(f"[OR-Tools] {encoding:<9} encoding: {sizes[encoding][0]} variables, "
+              f"{sizes[encoding][1]} constraints, built in {rm.build_time:.3f}s")
+    return sizes
+
+
+def diagnose_real_schedule(year, month, doctor_data, date_doubles, doctor_date_off=None,
+                           time_limit_seconds=30, calendar=None, pinned=None, no_shift=None):
+    """
+    Explain why the real-shift roster has no solution.
+    Returns:
+        list of DIAGNOSIS_FAMILIES keys that cannot all hold together ([] if the roster is
+        feasible, None if the solver could not decide within the time limit)
+    """
+    calendar = calendar or get_month_calendar(year, month)
+    pinned, no_shift = roster_constraints(year, month, pinned, no_shift)
+    rm = build_real_model(calendar, doctor_data, date_doubles, doctor_date_off=doctor_date_off,
+                          pinned=pinned, no_shift=no_shift, diagnose=True)
+    print("[OR-Tools] Diagnosing...")
+    status, conflict = explain_infeasibility(rm.model, rm.assumptions, time_limit_seconds)
+    if conflict:
+        print("[OR-Tools] Conflicting constraints (relaxing any one of them removes this conflict):")
+        for family in conflict:
+            print(f"  - {DIAGNOSIS_FAMILIES[family]}")
+    elif conflict == []:
+        print("[OR-Tools] No conflict: the constraints are satisfiable together.")
+    else:
+        print(f"[OR-Tools] Diagnosis inconclusive. Status: {status}")
+    return conflict
+
+
+def stream_real_schedule(year, month, doctor_data, date_doubles,
+                         doctor_date_off=None, time_limit_seconds=60, calendar=None,
+                         pinned=None, no_shift=None, symmetry_breaking=True,
+                         hint=None, repair_hint=False, stage_time_limits=None,
+                         profile=None, log_search=False, stop_policy=None, encoding="windows"):
+    """
+    Streaming variant of generate_real_schedule (same arguments). Yields a SolutionUpdate
+    per improving solution; its solution is (schedule, shift_count) and its objective is
+    that of the stage being solved (co-work days, then max double days).
+    Stop iterating to stop the search early.
+    """
+    rm, solver = _prepare_real_solve(year, month, doctor_data, date_doubles, doctor_date_off, time_limit_seconds,
+                                     calendar, pinned, no_shift, symmetry_breaking, hint, repair_hint,
+                                     profile, log_search, encoding)
+    if rm is None:
+        return
+
+    print("[OR-Tools] Solving real shift schedule (streaming)...")
+    stages = real_shift_stages(rm, time_limit_seconds, stage_time_limits)
+    status, results = yield from stream_lexicographic(solver, rm.model, stages, rm.extract_schedule, stop_policy)
+    _print_stage_results(results)
     print(f"[OR-Tools] Status    : {solver.StatusName(status)}")
-    print(f"[OR-Tools] Wall time : {solver.WallTime():.2f}s")
-    print(f"[OR-Tools] Co-work   : {solver.Value(co_work_count)} weekend/holiday days สุประวีณ์+กุลพักตร์")
-    print(f"[OR-Tools] Max double: {solver.Value(max_double)} double-day shifts (max per doctor)")
 
-    # ── Extract schedule ───────────────────────────────────────────────
-    schedule    = {}
-    shift_count = defaultdict(int)
 
-    for d in days:
-        er_doc   = next(doctors[i] for i in range(n_doc) if solver.Value(er[d][i]))
-        ward_doc = next(doctors[i] for i in range(n_doc) if solver.Value(ward[d][i]))
-        schedule[d] = {"ER": er_doc, "ward": ward_doc}
-        shift_count[er_doc]   += 1
-        shift_count[ward_doc] += 1
+def repair_real_schedule(year, month, doctor_data, date_doubles, published, new_off,
+                         doctor_date_off=None, pinned=None, no_shift=None,
+                         neighbourhood_days=2, time_limit_seconds=10, calendar=None, profile=None):
+    """
+    Repair a published schedule after new unavailability with as few changes as possible.
 
-    return schedule, dict(shift_count)
+    Days whose published doctor is now unavailable are reopened together with
+    neighbourhood_days on each side; every other day stays frozen, so the model only
+    has variables for the reopened days. If that neighbourhood has no repair it is
+    doubled until it covers the month.
+
+    Args:
+        published: dict date -> {"ER": doctor, "ward": doctor}
+        new_off: dict doctor -> list of newly unavailable dates
+        neighbourhood_days: days reopened before and after each affected day
+        profile: solver profile name or parameter dict
+    Returns:
+        (schedule, shift_count, changes) where changes lists (date, shift, old doctor, new doctor),
+        or None when no repair exists
+    """
+    calendar = calendar or get_month_calendar(year, month)
+    pinned, no_shift = roster_constraints(year, month, pinned, no_shift)
+    off = {doc: list(dates) for doc, dates in (doctor_date_off or {}).items()}
+    for doc, dates in new_off.items():
+        off.setdefault(doc, []).extend(dates)
+    unavailable = {(doc, d) for doc, dates in off.items() for d in dates}
+    affected = sorted(d for d in calendar.days
+                      if any((published[d][shift], d) in unavailable for shift in ("ER", "ward")))
+    if not affected:
+        print("[OR-Tools] Repair    : the published schedule already respects the new unavailability")
+        return published, _count_shifts(published), []
+
+    radius = neighbourhood_days
+    while True:
+        reopened = {d for d in calendar.days
+                    if any(abs((d - a).days) <= radius for a in affected)}
+        frozen = {d: published[d] for d in calendar.days if d not in reopened}
+        rm = build_real_model(calendar, doctor_data, date_doubles, doctor_date_off=off, pinned=pinned,
+                              no_shift=no_shift, symmetry_breaking=False, frozen=frozen)
+        # Minimise the reopened shifts that move away from their published doctor
+        kept = []
+        for d in sorted(reopened):
+            for shift, variables in (("ER", rm.er[d]), ("ward", rm.ward[d])):
+                doc = published[d][shift]
+                var = variables[rm.doctors.index(doc)] if doc in rm.doctors else None
+                if var is not None:
+                    kept.append(var)
+        rm.model.Maximize(sum(kept))
+        num_vars, _ = rm.stats()
+        print(f"[OR-Tools] Repair    : reopened {len(reopened)} days (±{radius} around {len(affected)} affected), "
+              f"{num_vars} variables")
+
+        solver = make_solver(time_limit_seconds, profile)
+        status = solver.Solve(rm.model)
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            break
+        if len(reopened) == len(calendar.days):
+            print(f"[OR-Tools] Repair    : no repair found. Status: {solver.StatusName(status)}")
+            return None
+        radius = max(1, 2 * radius)
+
+    schedule, shift_count = rm.extract_schedule(solver.Value)
+    changes = [
+        (d, shift, published[d][shift], schedule[d][shift])
+        for d in calendar.days for shift in ("ER", "ward")
+        if schedule[d][shift] != published[d][shift]
+    ]
+    print(f"[OR-Tools] Repair    : {solver.StatusName(status)}, {len(changes)} changed shifts "
+          f"({solver.WallTime():.2f}s)")
+    for d, shift, old, new in changes:
+        print(f"  {d} {shift:<4}: {old} -> {new}")
+    return schedule, shift_count, changes
+
+
+def _count_shifts(schedule):
+    shift_count = defaultdict(int)
+    for entry in schedule.values():
+        shift_count[entry["ER"]]   += 1
+        shift_count[entry["ward"]] += 1
+    return dict(shift_count)
 
 
 # ─────────────────────────────────────────────────────────
 #  Pretty-print helper
 # ─────────────────────────────────────────────────────────
 
-def print_schedule(schedule, shift_count):
+def _day_notes(date, calendar, double_set):
+    notes = []
+    if date in double_set:
+        notes.append("double")
+    if date in calendar.holidays:
+        notes.append("holiday")
+    elif date.weekday() >= 5:
+        notes.append("weekend")
+    return notes
+
+
+def print_schedule(schedule, shift_count, calendar=None):
     DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    calendar   = calendar or calendar_for_schedule(schedule)
+    double_set = set(date_doubles)
 
     print("\n" + "=" * 60)
     print(f"  Schedule  {Year}/{Month:02d}")
@@ -377,15 +1061,7 @@ def print_schedule(schedule, shift_count):
         entry    = schedule[date]
         day_name = DAY_NAMES[date.weekday()]
 
-        notes = []
-        if date in set(date_doubles):
-            notes.append("double")
-        if date in THAI_HOLIDAYS:
-            notes.append("holiday")
-        elif date.weekday() >= 5:
-            notes.append("weekend")
-
-        note_str = ", ".join(notes)
+        note_str = ", ".join(_day_notes(date, calendar, double_set))
         print(f"  {str(date):<14} {day_name:<5} {entry['ER']:<16} {entry['ward']:<16} {note_str}")
 
     print("=" * 60)
@@ -398,12 +1074,13 @@ def print_schedule(schedule, shift_count):
 #  Excel export
 # ─────────────────────────────────────────────────────────
 
-def save_real_schedule_to_xlsx(schedule, shift_count, filename="real_schedule.xlsx"):
-    """Export the real-shift schedule to a styled Excel file."""
+def _write_real_schedule_sheet(ws, schedule, shift_count, calendar):
+    """Fill one worksheet with a styled real-shift schedule and its per-doctor totals."""
     import openpyxl
     from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 
     DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    double_set  = set(date_doubles)
     thin      = Side(style="thin")
     border    = Border(left=thin, right=thin, top=thin, bottom=thin)
     orange_fill = PatternFill(start_color="FFF8CBAD", end_color="FFF8CBAD", fill_type="solid")
@@ -411,10 +1088,6 @@ def save_real_schedule_to_xlsx(schedule, shift_count, filename="real_schedule.xl
     header_fill = PatternFill(start_color="FF4F81BD", end_color="FF4F81BD", fill_type="solid")
     header_font = Font(bold=True, color="FFFFFFFF")
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Schedule"
-
     # Header row
     headers = ["Date", "Day", "Type", "ER", "Ward"]
     for col, h in enumerate(headers, 1):
@@ -428,16 +1101,9 @@ def save_real_schedule_to_xlsx(schedule, shift_count, filename="real_schedule.xl
     for row_idx, date in enumerate(sorted(schedule), 2):
         entry    = schedule[date]
         day_name = DAY_NAMES[date.weekday()]
-        is_wkend = is_weekend(date) or is_holiday(date)
-        fill     = orange_fill if is_wkend else green_fill
-
-        notes = []
-        if date in set(date_doubles):
-            notes.append("double")
-        if date in THAI_HOLIDAYS:
-            notes.append("holiday")
-        elif date.weekday() >= 5:
-            notes.append("weekend")
+        fill     = orange_fill if calendar.period[date] == "weekend" else green_fill
+
+        notes    = _day_notes(date, calendar, double_set)
         day_type = ", ".join(notes) if notes else "weekday"
 
         for col, val in enumerate([str(date), day_name, day_type, entry["ER"], entry["ward"]], 1):
@@ -459,10 +1125,53 @@ def save_real_schedule_to_xlsx(schedule, shift_count, filename="real_schedule.xl
     for col, width in zip(range(1, 9), [14, 6, 12, 16, 16, 2, 16, 14]):
         ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = width
 
+
+def save_real_schedule_to_xlsx(schedule, shift_count, filename="real_schedule.xlsx", calendar=None):
+    """Export the real-shift schedule to a styled Excel file."""
+    import openpyxl
+
+    calendar = calendar or calendar_for_schedule(schedule)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Schedule"
+    _write_real_schedule_sheet(ws, schedule, shift_count, calendar)
     wb.save(filename)
     print(f"Schedule saved to {os.path.abspath(filename)}")
 
 
+def save_real_schedules_to_xlsx(results, filename="real_schedules.xlsx", calendar=None):
+    """Export alternative real-shift schedules, one (schedule, shift_count) per sheet "Option 1", "Option 2", ..."""
+    import openpyxl
+
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for k, (schedule, shift_count) in enumerate(results, 1):
+        ws = wb.create_sheet(f"Option {k}")
+        _write_real_schedule_sheet(ws, schedule, shift_count, calendar or calendar_for_schedule(schedule))
+    wb.save(filename)
+    print(f"{len(results)} schedules saved to {os.path.abspath(filename)}")
+
+
+def load_real_schedule_from_xlsx(filename="real_schedule.xlsx"):
+    """Read a schedule written by save_real_schedule_to_xlsx back into {date: {"ER": doc, "ward": doc}}."""
+    import openpyxl
+
+    ws = openpyxl.load_workbook(filename, read_only=True)["Schedule"]
+    schedule = {}
+    for row in ws.iter_rows(min_row=2, max_col=5, values_only=True):
+        date_value, _, _, er_doc, ward_doc = row
+        if not date_value:
+            continue
+        if isinstance(date_value, datetime.datetime):
+            date = date_value.date()
+        elif isinstance(date_value, datetime.date):
+            date = date_value
+        else:
+            date = datetime.date.fromisoformat(str(date_value).strip())
+        schedule[date] = {"ER": er_doc, "ward": ward_doc}
+    return schedule
+
+
 # ─────────────────────────────────────────────────────────
 #  Entry point
 # ─────────────────────────────────────────────────────────
@@ -473,14 +1182,136 @@ if __name__ == "__main__":
                         help="Save schedule to Excel file (e.g. schedule.xlsx)")
     parser.add_argument("--time-limit", type=int, default=60,
                         metavar="SECONDS", help="Solver time limit in seconds (default: 60)")
+    parser.add_argument("--no-symmetry-breaking", action="store_true",
+                        help="Do not order interchangeable doctors (for benchmarking)")
+    parser.add_argument("--hint", metavar="FILE",
+                        help="Warm-start from a schedule saved with -o (hand edits allowed)")
+    parser.add_argument("--repair-hint", action="store_true",
+                        help="Let the solver repair a hint that breaks constraints")
+    parser.add_argument("--stream", action="store_true",
+                        help="Report every improving solution while solving (Ctrl+C saves the latest to -o FILE)")
+    parser.add_argument("--diagnose", action="store_true",
+                        help="Only check which constraint families conflict, without optimising")
+    parser.add_argument("--stage-time-limits", type=float, nargs=2, metavar=("CO_WORK", "MAX_DOUBLE"),
+                        help="Per-stage time limits in seconds (default: --time-limit split evenly)")
+    parser.add_argument("--profile", default=None, metavar="NAME|FILE",
+                        help=f"Solver parameter profile: {', '.join(SOLVER_PROFILES)} "
+                             "or a JSON file written by tuning.py (default: balanced)")
+    parser.add_argument("--log-search", action="store_true",
+                        help="Print the CP-SAT search log")
+    parser.add_argument("--stop-no-improvement", type=float, metavar="SECONDS",
+                        help="Stop a stage after this long without a better solution")
+    parser.add_argument("--stop-gap", type=float, metavar="FRACTION",
+                        help="Stop a stage once its relative gap is at most this (e.g. 0.01)")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="windows",
+                        help="Spacing-rule encoding: one constraint per window or one automaton per doctor "
+                             "(default: windows)")
+    parser.add_argument("--compare-encodings", action="store_true",
+                        help="Only build the model with each encoding and report its size")
+    parser.add_argument("--decompose", action="store_true",
+                        help="Solve week blocks in sequence and reconcile the month (long-horizon mode)")
+    parser.add_argument("--block-days", type=int, default=7, metavar="DAYS",
+                        help="Days per block with --decompose (default: 7)")
+    parser.add_argument("--batch", nargs=2, metavar=("START", "END"),
+                        help="Solve the months START..END (YYYY-MM) concurrently, quotas rescaled per month")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="Months solved at the same time with --batch (default: one per CPU)")
+    parser.add_argument("--pool", type=int, metavar="N",
+                        help="Generate N alternative schedules (saved as sheets of -o FILE)")
+    parser.add_argument("--min-distance", type=int, default=6, metavar="SHIFTS",
+                        help="Minimum number of differing shifts between alternatives (default: 6)")
+    parser.add_argument("--repair", metavar="FILE",
+                        help="Repair a published schedule (saved with -o) instead of solving from scratch")
+    parser.add_argument("--off", nargs=2, action="append", default=[], metavar=("DOCTOR", "YYYY-MM-DD"),
+                        help="New unavailability for --repair (repeatable)")
+    parser.add_argument("--neighbourhood", type=int, default=2, metavar="DAYS",
+                        help="Days reopened around each affected day in --repair (default: 2)")
     args = parser.parse_args()
+    if args.profile:
+        try:
+            resolve_profile(args.profile)
+        except (ValueError, OSError) as e:
+            parser.error(str(e))
+    if args.stage_time_limits:
+        # Block, batch and repair solves split --time-limit themselves (the block models add a quota stage)
+        ignored = [flag for flag, used in (("--decompose", args.decompose), ("--batch", args.batch),
+                                           ("--repair", args.repair)) if used]
+        if ignored:
+            parser.error(f"--stage-time-limits cannot be combined with {ignored[0]}; use --time-limit")
 
-    result = generate_real_schedule(Year, Month, doctor_data, date_doubles,
-                                    doctor_date_off=doctor_date_off,
-                                    time_limit_seconds=args.time_limit)
+    calendar = get_month_calendar(Year, Month)
+    stop_policy = None
+    if args.stop_no_improvement is not None or args.stop_gap is not None:
+        stop_policy = StopPolicy(args.stop_no_improvement, args.stop_gap)
+    hint = load_real_schedule_from_xlsx(args.hint) if args.hint else None
+    solve_args = dict(doctor_date_off=doctor_date_off,
+                      time_limit_seconds=args.time_limit,
+                      calendar=calendar,
+                      pinned=pinned, no_shift=no_shift,
+                      symmetry_breaking=not args.no_symmetry_breaking,
+                      hint=hint, repair_hint=args.repair_hint,
+                      stage_time_limits=args.stage_time_limits,
+                      profile=args.profile, log_search=args.log_search,
+                      stop_policy=stop_policy, encoding=args.encoding)
+    if args.compare_encodings:
+        compare_real_encodings(Year, Month, doctor_data, date_doubles, doctor_date_off=doctor_date_off,
+                               calendar=calendar, pinned=pinned, no_shift=no_shift,
+                               symmetry_breaking=not args.no_symmetry_breaking)
+        result = None
+    elif args.batch:
+        from batch import batch_real_schedule, real_shift_months, month_range  # batch imports this module
+        months = real_shift_months(month_range(*args.batch), doctor_data, date_doubles, doctor_date_off=doctor_date_off,
+                                   pinned=pinned, no_shift=no_shift, roster_month=(Year, Month))
+        batch_real_schedule(months, processes=args.processes, time_limit_seconds=args.time_limit,
+                            profile=args.profile, output_dir=os.path.dirname(args.output or "") or ".")
+        result = None
+    elif args.pool:
+        pool = generate_real_schedule_pool(Year, Month, doctor_data, date_doubles, count=args.pool,
+                                           min_distance=args.min_distance,
+                                           doctor_date_off=doctor_date_off, time_limit_seconds=args.time_limit,
+                                           calendar=calendar, pinned=pinned, no_shift=no_shift,
+                                           stage_time_limits=args.stage_time_limits, profile=args.profile)
+        for k, (schedule, shift_count) in enumerate(pool, 1):
+            print(f"\nOption {k}")
+            print_schedule(schedule, shift_count, calendar=calendar)
+        if pool and args.output:
+            save_real_schedules_to_xlsx(pool, filename=args.output, calendar=calendar)
+        result = None
+    elif args.repair:
+        new_off = defaultdict(list)
+        for doc, date_text in args.off:
+            new_off[doc].append(datetime.date.fromisoformat(date_text))
+        repaired = repair_real_schedule(Year, Month, doctor_data, date_doubles,
+                                        load_real_schedule_from_xlsx(args.repair), new_off,
+                                        doctor_date_off=doctor_date_off, pinned=pinned, no_shift=no_shift,
+                                        neighbourhood_days=args.neighbourhood,
+                                        time_limit_seconds=args.time_limit, calendar=calendar,
+                                        profile=args.profile)
+        result = repaired[:2] if repaired else None
+    elif args.decompose:
+        from decomposition import decompose_real_schedule, RealShiftMonth  # decomposition imports this module
+        result = decompose_real_schedule([RealShiftMonth(Year, Month, doctor_data, date_doubles, doctor_date_off,
+                                                         pinned, no_shift)],
+                                         block_days=args.block_days, time_limit_seconds=args.time_limit,
+                                         profile=args.profile)
+    elif args.diagnose:
+        diagnose_real_schedule(Year, Month, doctor_data, date_doubles, doctor_date_off=doctor_date_off,
+                               calendar=calendar, pinned=pinned, no_shift=no_shift)
+        result = None
+    elif args.stream:
+        result = None
+        try:
+            for update in stream_real_schedule(Year, Month, doctor_data, date_doubles, **solve_args):
+                print(f"[OR-Tools] Solution #{update.index}: objective {update.objective:g}, "
+                      f"bound {update.bound:g}, {update.elapsed:.2f}s")
+                result = update.solution
+        except KeyboardInterrupt:
+            print("[OR-Tools] Stopped, keeping the latest solution.")
+    else:
+        result = generate_real_schedule(Year, Month, doctor_data, date_doubles, **solve_args)
     if result:
         schedule, shift_count = result
-        print_schedule(schedule, shift_count)
+        print_schedule(schedule, shift_count, calendar=calendar)
         if args.output:
-            save_real_schedule_to_xlsx(schedule, shift_count, filename=args.output)
+            save_real_schedule_to_xlsx(schedule, shift_count, filename=args.output, calendar=calendar)
 
@@ -0,0 +1,259 @@
+import datetime
+from collections import namedtuple
+from functools import lru_cache
+
+# Shift rules of the schedule_ortools month model, declared once over a slot timeline and
+# compiled for both engines. The timeline puts the shift times of consecutive days in
+# order, DAY -> EVENING -> NIGHT -> next DAY, one position each, with one padding day on
+# each side of the month for the days around it (carried-in days, autopsies next door).
+# On weekdays every doctor already works the regular day hours, so a weekday DAY
+# position counts as occupied wherever a rule counts shifts in a row. Windows run into
+# the trailing padding day too: when the next month starts on a weekday, its regular day
+# work rules out EVENING + NIGHT on the month's last day. The annealer always checked this;
+# the CP-SAT model now does as well (before the shared rules it stopped at the month end).
+#
+# compile_rules(calendar) turns the declarations into position tables, cached per month:
+# ConstraintChecker (constraints.py) reads them to flag assignments for the annealer and
+# verify_schedule, add_cpsat_rules posts them as linear constraints on a CP-SAT model, and
+# eligibility.autopsy_blocked_times takes the autopsy neighbourhood from them.
+# add_cpsat_interval_rules posts the same rules as intervals on an hourly timeline instead.
+
+DAY, EVENING, NIGHT = range(3)
+TIMES_PER_DAY = 3
+HOURS_PER_SHIFT = 8
+
+# At most `limit` shifts per doctor at one position (ER and ward at the same time)
+SameTime = namedtuple("SameTime", ["family", "limit"])
+# At most `limit` occupied positions in any `length` consecutive ones, regular weekday day work included
+Window = namedtuple("Window", ["family", "length", "limit"])
+# Shifts at these times on consecutive positions, starting at times[0], may not all be worked
+Sequence = namedtuple("Sequence", ["family", "times"])
+# No shift within `radius` positions of an autopsy
+Neighbourhood = namedtuple("Neighbourhood", ["family", "radius"])
+
+# Families are the DIAGNOSIS_FAMILIES keys of schedule_ortools
+SHIFT_RULES = (
+    SameTime("same_time", 1),
+    Sequence("consecutive", (NIGHT, DAY)),
+    Window("consecutive", 3, 2),
+)
+AUTOPSY_RULE = Neighbourhood("autopsy", 1)
+
+
+class CompiledRules:
+    """
+    Position tables of SHIFT_RULES and AUTOPSY_RULE for one calendar.
+    Position 3 * (day + 1) + t is shift time t of calendar.days[day]; day -1 and
+    len(days) are the padding days.
+    Attributes:
+        num_positions: positions including both padding days
+        implicit: implicit[p] is 1 on weekday DAY positions (regular day work)
+        same_time_limit: shifts allowed per doctor at one position
+        windows: list of (family, positions, limit), every Window placement
+        sequences: list of (family, positions), every Sequence placement
+        checks: checks[p] lists (other positions, budget): a shift at p breaks a rule when the
+            shifts held at the other positions add up to more than budget (the implicit
+            positions and the shift itself are already taken off the limit)
+    """
+
+    def __init__(self, days, holidays):
+        self.days = list(days)
+        self.first = self.days[0]
+        self.num_positions = TIMES_PER_DAY * (len(self.days) + 2)
+        self.implicit = [0] * self.num_positions
+        for day in range(-1, len(self.days) + 1):
+            date = self.first + datetime.timedelta(days=day)
+            if date.weekday() < 5 and date not in holidays:
+                self.implicit[self.position(day, DAY)] = 1
+
+        self.same_time_limit = None
+        self.windows, self.sequences = [], []
+        for rule in SHIFT_RULES:
+            if isinstance(rule, SameTime):
+                self.same_time_limit = rule.limit
+            elif isinstance(rule, Window):
+                for start in range(self.num_positions - rule.length + 1):
+                    self.windows.append((rule.family, tuple(range(start, start + rule.length)), rule.limit))
+            elif isinstance(rule, Sequence):
+                for start in range(rule.times[0], self.num_positions - len(rule.times) + 1, TIMES_PER_DAY):
+                    positions = tuple(range(start, start + len(rule.times)))
+                    if all(p % TIMES_PER_DAY == t for p, t in zip(positions, rule.times)):
+                        self.sequences.append((rule.family, positions))
+
+        # Sequences only count real shifts: a night before regular weekday work is allowed
+        self.checks = [[] for _ in range(self.num_positions)]
+        for _, positions, limit in self.windows:
+            for p in positions:
+                others = tuple(q for q in positions if q != p)
+                self.checks[p].append((others, limit - 1 - sum(self.implicit[q] for q in others)))
+        for _, positions in self.sequences:
+            for p in positions:
+                self.checks[p].append((tuple(q for q in positions if q != p), len(positions) - 2))
+
+    def position(self, day, t):
+        """Position of shift time t on calendar day index `day` (-1 and len(days) are the padding days)."""
+        return TIMES_PER_DAY * (day + 1) + t
+
+    def position_of(self, date, t):
+        """Position of shift time t on `date`, None when the date is outside the padded month."""
+        p = self.position((date - self.first).days, t)
+        return p if 0 <= p < self.num_positions else None
+
+    def day_time(self, p):
+        """(calendar day index, shift time) of a position."""
+        return p // TIMES_PER_DAY - 1, p % TIMES_PER_DAY
+
+    def autopsy_positions(self, autopsy_date, a):
+        """Positions a doctor cannot work around an autopsy at shift time `a` on `autopsy_date`."""
+        radius = AUTOPSY_RULE.radius
+        center = self.position((autopsy_date - self.first).days, a)
+        return [p for p in range(center - radius, center + radius + 1) if 0 <= p < self.num_positions]
+
+
+@lru_cache(maxsize=None)
+def _compiled(days, holidays):
+    return CompiledRules(days, holidays)
+
+
+def compile_rules(calendar):
+    """Shared CompiledRules per calendar days and holidays (a month or a block of it)."""
+    return _compiled(tuple(calendar.days), calendar.holidays)
+
+
+def add_cpsat_rules(rules, model, time_vars, guard, carried=None):
+    """
+    Post SHIFT_RULES on a CP-SAT month model.
+    Args:
+        rules: CompiledRules of the model's calendar
+        model: cp_model.CpModel
+        time_vars: time_vars[day][t][i] lists doctor i's variables at shift time t of day index `day`
+        guard: function family -> enforcement literals (ScheduleModel.guard)
+        carried: dict doctor index -> set of shift times worked on the day before the first
+            day; they count as constant shifts at the leading padding positions
+    """
+    n_days = len(time_vars)
+    n_doc = len(time_vars[0][0]) if n_days else 0
+    carried = carried or {}
+
+    def variables(p, i):
+        day, t = rules.day_time(p)
+        return time_vars[day][t][i] if 0 <= day < n_days else []
+
+    def constant(p, i):
+        day, t = rules.day_time(p)
+        return 1 if day == -1 and t in carried.get(i, ()) else 0
+
+    # Same time
+    for p in range(rules.position(0, DAY), rules.position(n_days, DAY)):
+        for i in range(n_doc):
+            shifts = variables(p, i)
+            if len(shifts) > rules.same_time_limit:
+                model.Add(sum(shifts) <= rules.same_time_limit).OnlyEnforceIf(guard("same_time"))
+
+    # Windows count the implicit positions, sequences do not. A budget already broken by the
+    # carried-in day alone cannot be repaired here and is left out.
+    placements = [(family, positions, limit, True) for family, positions, limit in rules.windows]
+    placements += [(family, positions, len(positions) - 1, False) for family, positions in rules.sequences]
+    for family, positions, limit, counts_implicit in placements:
+        implicit = sum(rules.implicit[p] for p in positions) if counts_implicit else 0
+        for i in range(n_doc):
+            shifts = [var for p in positions for var in variables(p, i)]
+            budget = limit - implicit - sum(constant(p, i) for p in positions)
+            if budget < 0 or len(shifts) <= budget:
+                continue
+            if budget == 1:
+                model.AddAtMostOne(shifts).OnlyEnforceIf(guard(family))
+            else:
+                model.Add(sum(shifts) <= budget).OnlyEnforceIf(guard(family))
+
+
+def add_cpsat_interval_rules(rules, model, time_vars, carried=None, blocked=None):
+    """
+    Post SHIFT_RULES and the autopsy blocks as intervals on an hourly timeline per doctor,
+    position p covering hours [8p, 8p + 8):
+      - SameTime (limit 1) and autopsies: the 8-hour shift intervals and one fixed interval per
+        run of blocked positions share an AddNoOverlap
+      - Sequence (two times): a shift at times[0] is stretched over the next position and
+        must not overlap a shift at times[1], in a second AddNoOverlap
+      - Window: each shift reserves the `length` positions starting at it; an AddCumulative
+        of capacity `limit` over them, regular weekday day work as fixed intervals, then
+        allows at most `limit` occupied positions in any `length` consecutive ones
+    Intervals cannot be enforced under a literal, so there is no guard (diagnose mode keeps
+    add_cpsat_rules).
+    Args:
+        rules: CompiledRules of the model's calendar
+        model: cp_model.CpModel
+        time_vars: time_vars[day][t][i] lists doctor i's variables at shift time t of day index `day`
+        carried: dict doctor index -> set of shift times worked on the day before the first day
+        blocked: dict doctor index -> set of positions a doctor cannot work (autopsies)
+    """
+    n_days = len(time_vars)
+    n_doc = len(time_vars[0][0]) if n_days else 0
+    carried = carried or {}
+    blocked = blocked or {}
+    for rule in SHIFT_RULES:
+        if (isinstance(rule, SameTime) and rule.limit != 1) or (isinstance(rule, Sequence) and len(rule.times) != 2):
+            raise ValueError(f"{rule} has no interval form")
+    sequences = [rule for rule in SHIFT_RULES if isinstance(rule, Sequence)]
+    windows = [rule for rule in SHIFT_RULES if isinstance(rule, Window)]
+
+    def hours(p):
+        return HOURS_PER_SHIFT * p
+
+    def interval(p, var, length):
+        """`length` positions from p, present when var is (always for a constant shift, var None)."""
+        if var is None:
+            return model.NewFixedSizeIntervalVar(hours(p), hours(length), "")
+        return model.NewOptionalFixedSizeIntervalVar(hours(p), hours(length), var, "")
+
+    # Regular weekday day work, shared by every doctor, wherever it meets a window with a month position
+    first = rules.position(0, DAY)
+    fixed = {
+        length: [model.NewFixedSizeIntervalVar(hours(p), hours(length), "")
+                 for p in range(max(0, first - length + 1), rules.num_positions) if rules.implicit[p]]
+        for length in {rule.length for rule in windows}
+    }
+
+    for i in range(n_doc):
+        # (position, literal) of every shift of the doctor; carried-in shifts are constants
+        shifts = [(rules.position(day, t), var) for day in range(n_days) for t in range(TIMES_PER_DAY)
+                  for var in time_vars[day][t][i]]
+        constants = sorted(rules.position(-1, t) for t in carried.get(i, ()))
+
+        # One shift at a time, none inside an autopsy block
+        timeline = [interval(p, var, 1) for p, var in shifts]
+        runs = sorted(blocked.get(i, ()))
+        run_start = None
+        for k, p in enumerate(runs):
+            if run_start is None:
+                run_start = p
+            if k + 1 == len(runs) or runs[k + 1] != p + 1:
+                timeline.append(model.NewFixedSizeIntervalVar(hours(run_start), hours(p - run_start + 1), ""))
+                run_start = None
+        if len(timeline) > 1:
+            model.AddNoOverlap(timeline)
+
+        # Rest gaps: a shift at times[0] may not run straight into one at times[1]
+        for rule in sequences:
+            before, after = rule.times
+            rest = [interval(p, var, 2) for p, var in shifts + [(q, None) for q in constants]
+                    if p % TIMES_PER_DAY == before]
+            rest += [interval(p, var, 1) for p, var in shifts if p % TIMES_PER_DAY == after]
+            if len(rest) > 1:
+                model.AddNoOverlap(rest)
+
+        # Shifts in a row, regular weekday day work included. Only carried-in shifts sharing a
+        # window with the month count; a window already broken by them alone cannot be repaired
+        # and is left out, as in add_cpsat_rules, by dropping the earliest of them until none is
+        for rule in windows:
+            reaching = [q for q in constants if q + rule.length > first]
+            while reaching and any(
+                sum(1 for q in reaching if start <= q < start + rule.length)
+                + sum(rules.implicit[q] for q in range(start, start + rule.length)) > rule.limit
+                for start in range(max(0, first - rule.length + 1), first)
+            ):
+                reaching.pop(0)
+            reserved = [interval(p, var, rule.length) for p, var in shifts]
+            reserved += [interval(q, None, rule.length) for q in reaching]
+            model.AddCumulative(reserved + fixed[rule.length], [1] * (len(reserved) + len(fixed[rule.length])),
+                                rule.limit)
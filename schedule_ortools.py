@@ -1,312 +1,419 @@
 import datetime
+import time
 from collections import defaultdict
 from ortools.sat.python import cp_model
-from doctor_data import adjust_doctor_data, SHIFT_TIMES, DOCTOR_AUTOPSY_DATA
-from constraints import is_weekend, is_holiday
-
-WEEKDAY_SHIFTS = [
-    ("ER", SHIFT_TIMES["EVENING"]),
-    ("ER", SHIFT_TIMES["NIGHT"]),
-    ("ward", SHIFT_TIMES["EVENING"])
-]
-WEEKEND_SHIFTS = [
-    ("ER", SHIFT_TIMES["DAY"]),
-    ("ER", SHIFT_TIMES["EVENING"]),
-    ("ER", SHIFT_TIMES["NIGHT"]),
-    ("ward", SHIFT_TIMES["DAY"]),
-    ("ward", SHIFT_TIMES["EVENING"]),
-    ("ward", SHIFT_TIMES["NIGHT"])
-]
-
-
-def generate_schedule_ortools(year, month, doctor_data, time_limit_seconds=300):
+from doctor_data import adjust_doctor_data, DOCTOR_AUTOPSY_DATA
+from constraints import SHIFT_TIME_INDEX, SHIFT_TYPE_INDEX
+from rules import compile_rules, add_cpsat_rules, add_cpsat_interval_rules
+from month_calendar import get_month_calendar
+from eligibility import schedule_eligibility
+from solver_tools import stream_solutions, explain_infeasibility, solve_diverse, make_solver, solve_with_policy
+from feasibility import check_schedule_inputs, report_issues, timed_check
+
+SHIFT_TIME_ORDER = list(SHIFT_TIME_INDEX)
+SHIFT_TYPE_ORDER = list(SHIFT_TYPE_INDEX)
+# How build_schedule_model posts the time-conflict rules: linear constraints over the
+# Boolean variables, or intervals on an hourly timeline per doctor (see benchmark.py)
+FORMULATIONS = ("boolean", "interval")
+
+
+class ScheduleModel:
     """
-    Generate a schedule using OR-Tools CP-SAT solver.
-    
+    CP-SAT model of one month with variables addressed by integer indices.
+    Attributes:
+        model: cp_model.CpModel
+        calendar: MonthCalendar the model was built for
+        doctors: list of doctor names, doctor index -> name
+        slots: calendar.slots, slot index -> (date, shift_type, shift_time, period)
+        x: x[s][i] is the BoolVar of doctor i working slot s, None when the pair is ineligible
+        time_vars: time_vars[day][t][i] lists doctor i's variables at shift time t of day index `day`
+        penalty_vars: soft-constraint penalties, minimised by the objective
+        quota_deviation: per-quota deviation IntVars, only filled with soft_quotas
+        objective: the minimised expression, None in diagnose mode or without penalties
+        formulation: FORMULATIONS entry the time-conflict rules were posted with
+        assumptions: family -> enforcement literal, only filled in diagnose mode
+        build_time: seconds spent building the model
+    """
+
+    def __init__(self, calendar, doctors):
+        self.model = cp_model.CpModel()
+        self.calendar = calendar
+        self.doctors = doctors
+        self.slots = calendar.slots
+        self.x = []
+        self.time_vars = []
+        self.penalty_vars = []
+        self.quota_deviation = []
+        self.objective = None
+        self.formulation = "boolean"
+        self.assumptions = {}
+        self.build_time = 0.0
+
+    def extract_schedule(self, value):
+        """Build the date-keyed schedule from a value function (solver.Value or a callback's Value)."""
+        schedule = defaultdict(list)
+        for s, (date, shift_type, shift_time, key) in enumerate(self.slots):
+            for i, var in enumerate(self.x[s]):
+                if var is not None and value(var) == 1:
+                    schedule[date].append((shift_type, shift_time, self.doctors[i]))
+                    break
+        return dict(schedule)
+
+    def stats(self):
+        proto = self.model.Proto()
+        return len(proto.variables), len(proto.constraints)
+
+    def guard(self, family):
+        """Enforcement literals of a constraint family: none normally, its assumption literal when diagnosing."""
+        if family not in self.assumptions:
+            return []
+        return [self.assumptions[family]]
+
+    def add_hint(self, schedule):
+        """
+        Hint every variable from a date-keyed schedule (previous run, edited sheet, annealer result).
+        Slots missing from the schedule or held by an unknown/ineligible doctor are left unhinted.
+        Returns:
+            hinted: number of slots whose doctor was hinted
+        """
+        doctor_index = {doc: i for i, doc in enumerate(self.doctors)}
+        hinted = 0
+        for s, (date, shift_type, shift_time, _) in enumerate(self.slots):
+            chosen = None
+            for stype, stime, doc in schedule.get(date, []):
+                if stype == shift_type and stime == shift_time:
+                    chosen = doctor_index.get(doc)
+                    break
+            if chosen is None or self.x[s][chosen] is None:
+                continue
+            for i, var in enumerate(self.x[s]):
+                if var is not None:
+                    self.model.AddHint(var, i == chosen)
+            hinted += 1
+        return hinted
+
+
+# Constraint families that diagnose mode guards with assumption literals
+DIAGNOSIS_FAMILIES = {
+    "quotas": "per-doctor shift quotas (DOCTOR_DATA after adjustment)",
+    "autopsy": "autopsy blocks (DOCTOR_AUTOPSY_DATA)",
+    "same_time": "one shift at a time per doctor",
+    "consecutive": "consecutive-shift rules (no night before day, at most 2 in a row)",
+}
+
+
+def build_schedule_model(calendar, doctor_data, autopsy_data=None, name_vars=False, diagnose=False,
+                         carry_in=None, soft_quotas=False, formulation="boolean"):
+    """
+    Build the CP-SAT model for one month.
+
     Args:
-        year: int, the year for the schedule
-        month: int, the month for the schedule
-        doctor_data: dict, the doctor availability data
-        time_limit_seconds: int, maximum time for solver (default 300 seconds)
-    
+        calendar: MonthCalendar
+        doctor_data: dict, already adjusted with adjust_doctor_data
+        autopsy_data: dict, doctor -> list of (date, shift_time), DOCTOR_AUTOPSY_DATA when omitted
+        name_vars: bool, give variables readable names (useful when debugging, off in production)
+        diagnose: bool, create every variable, enforce each DIAGNOSIS_FAMILIES family only under
+            its literal in sm.assumptions and leave out the objective (see diagnose_schedule_ortools)
+        carry_in: schedule (same format as the result) of the days before calendar.days[0]; the
+            cross-day rules and the same-time penalty are applied between its last day and the first day
+        soft_quotas: bool, treat the quotas as targets: deviations go to sm.quota_deviation and
+            the objective puts them before the penalties (used for the blocks of decomposition.py)
+        formulation: "boolean" posts the time-conflict rules as linear constraints and prunes the
+            autopsy conflicts from the variables; "interval" creates every variable and posts the
+            rules and the autopsies as intervals (rules.add_cpsat_interval_rules). Diagnose mode
+            always uses "boolean", since intervals cannot be guarded by assumption literals.
+
     Returns:
-        schedule: dict mapping date to list of (shift_type, shift_time, doctor)
+        ScheduleModel
     """
-    doctor_data = adjust_doctor_data(doctor_data)
-    days_in_month = (datetime.date(year, month % 12 + 1, 1) - datetime.timedelta(days=1)).day
-    days = [datetime.date(year, month, d) for d in range(1, days_in_month + 1)]
+    if formulation not in FORMULATIONS:
+        raise ValueError(f"Unknown formulation {formulation!r}, expected one of {', '.join(FORMULATIONS)}")
+    start = time.perf_counter()
     doctors = list(doctor_data.keys())
-    
-    # Prepare all shifts to assign
-    all_shifts = []
-    for date in days:
-        is_wkend = is_weekend(date) or is_holiday(date)
-        shifts = WEEKEND_SHIFTS if is_wkend else WEEKDAY_SHIFTS
-        key = "weekend" if is_wkend else "weekday"
-        for shift_type, shift_time in shifts:
-            all_shifts.append((date, shift_type, shift_time, key))
-    
-    # Create the model
-    model = cp_model.CpModel()
-    
-    # Create decision variables: shifts[(date, shift_type, shift_time, doctor)] = BoolVar
-    shifts = {}
-    for date, shift_type, shift_time, key in all_shifts:
-        for doctor in doctors:
-            var_name = f"shift_d{date.day}_st{shift_type}_t{shift_time}_doc{doctor}"
-            shifts[(date, shift_type, shift_time, doctor)] = model.NewBoolVar(var_name)
-    
+    n_doc = len(doctors)
+    days = calendar.days
+    n_days = len(days)
+    sm = ScheduleModel(calendar, doctors)
+    model = sm.model
+    if diagnose:
+        sm.assumptions = {family: model.NewBoolVar(f"assume_{family}") for family in DIAGNOSIS_FAMILIES}
+        formulation = "boolean"
+    sm.formulation = formulation
+    guard = sm.guard
+
+    # Create decision variables only for eligible pairs: x[s][i] = doctor i works slot s
+    # Autopsy conflicts are handled here (Constraint 5) by never creating the variable,
+    # or by the autopsy intervals of the interval formulation
+    # time_vars[day][t][i] collects the ER/ward variables of doctor i at shift time t
+    if formulation == "interval":
+        eligible = [[True] * n_doc for _ in calendar.slots]
+    else:
+        eligible = schedule_eligibility(calendar, doctors, autopsy_data)
+    autopsy_blocked = []
+    if diagnose:
+        # Autopsy conflicts become a guarded constraint instead of missing variables
+        autopsy_blocked = [(s, i) for s, row in enumerate(eligible) for i in range(n_doc) if not row[i]]
+        eligible = [[True] * n_doc for _ in eligible]
+    sm.time_vars = [[[[] for _ in range(n_doc)] for _ in range(3)] for _ in range(n_days)]
+    slots_by_key = defaultdict(list)
+    for s, (date, shift_type, shift_time, key) in enumerate(sm.slots):
+        day = calendar.day_index[date]
+        t = SHIFT_TIME_INDEX[shift_time]
+        row = [
+            model.NewBoolVar(f"shift_d{date.day}_st{shift_type}_t{shift_time}_doc{doctors[i]}" if name_vars else "")
+            if eligible[s][i] else None
+            for i in range(n_doc)
+        ]
+        sm.x.append(row)
+        slots_by_key[(key, shift_type)].append(s)
+        for i in range(n_doc):
+            if row[i] is not None:
+                sm.time_vars[day][t][i].append(row[i])
+    tv = sm.time_vars
+    for s, i in autopsy_blocked:
+        model.Add(sm.x[s][i] == 0).OnlyEnforceIf(guard("autopsy"))
+
     # Constraint 1: Each shift must be assigned to exactly one doctor
-    for date, shift_type, shift_time, key in all_shifts:
-        model.Add(sum(shifts[(date, shift_type, shift_time, doctor)] for doctor in doctors) == 1)
-    
+    for row in sm.x:
+        model.AddExactlyOne([var for var in row if var is not None])
+
     # Constraint 2: Each doctor must work exactly their allocated number of shifts per period/type
-    for doctor in doctors:
+    for i, doctor in enumerate(doctors):
         for period in ["weekday", "weekend"]:
             for shift_type in ["ER", "ward"]:
-                expected_shifts = doctor_data[doctor][period][shift_type]
-                relevant_shifts = [
-                    shifts[(date, st, shift_time, doctor)]
-                    for date, st, shift_time, key in all_shifts
-                    if key == period and st == shift_type and (date, st, shift_time, doctor) in shifts
-                ]
-                if relevant_shifts:
-                    model.Add(sum(relevant_shifts) == expected_shifts)
-    
-    # Constraint 3: No doctor can work two different shift types at the same time
-    for date in days:
-        for shift_time in [SHIFT_TIMES["DAY"], SHIFT_TIMES["EVENING"], SHIFT_TIMES["NIGHT"]]:
-            for doctor in doctors:
-                # Get all shifts for this doctor at this time
-                shift_types_at_time = []
-                for shift_type in ["ER", "ward"]:
-                    if (date, shift_type, shift_time, doctor) in shifts:
-                        shift_types_at_time.append(shifts[(date, shift_type, shift_time, doctor)])
-                # At most one shift type per time slot
-                if len(shift_types_at_time) > 1:
-                    model.Add(sum(shift_types_at_time) <= 1)
-    
-    # Constraint 4: No more than 2 consecutive shifts per doctor
-    # We need to check for consecutive shift patterns
-    for doctor in doctors:
-        for date in days:
-            is_wkday = not (is_weekend(date) or is_holiday(date))
-            prev_date = date - datetime.timedelta(days=1)
-            next_date = date + datetime.timedelta(days=1)
-            
-            # Pattern 1: Night shift -> Day shift (forbidden)
-            if next_date <= days[-1]:
-                if (date, "ER", SHIFT_TIMES["NIGHT"], doctor) in shifts or (date, "ward", SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                    night_vars = []
-                    if (date, "ER", SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                        night_vars.append(shifts[(date, "ER", SHIFT_TIMES["NIGHT"], doctor)])
-                    if (date, "ward", SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                        night_vars.append(shifts[(date, "ward", SHIFT_TIMES["NIGHT"], doctor)])
-                    
-                    next_day_vars = []
-                    if (next_date, "ER", SHIFT_TIMES["DAY"], doctor) in shifts:
-                        next_day_vars.append(shifts[(next_date, "ER", SHIFT_TIMES["DAY"], doctor)])
-                    if (next_date, "ward", SHIFT_TIMES["DAY"], doctor) in shifts:
-                        next_day_vars.append(shifts[(next_date, "ward", SHIFT_TIMES["DAY"], doctor)])
-                    
-                    # If works night shift, cannot work day shift next day
-                    for night_var in night_vars:
-                        for day_var in next_day_vars:
-                            model.Add(night_var + day_var <= 1)
-            
-            # Pattern 2: More than 2 consecutive shifts in a row
-            # For weekdays: every doctor already has 1 day shift (08:30-16:30)
-            if is_wkday:
-                # Since day shift is already taken, can only work evening OR night, not both
-                # This prevents: Day + Evening + Night (3 consecutive)
-                curr_evening_vars = []
-                curr_night_vars = []
-                
-                if (date, "ER", SHIFT_TIMES["EVENING"], doctor) in shifts:
-                    curr_evening_vars.append(shifts[(date, "ER", SHIFT_TIMES["EVENING"], doctor)])
-                if (date, "ward", SHIFT_TIMES["EVENING"], doctor) in shifts:
-                    curr_evening_vars.append(shifts[(date, "ward", SHIFT_TIMES["EVENING"], doctor)])
-                
-                if (date, "ER", SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                    curr_night_vars.append(shifts[(date, "ER", SHIFT_TIMES["NIGHT"], doctor)])
-                if (date, "ward", SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                    curr_night_vars.append(shifts[(date, "ward", SHIFT_TIMES["NIGHT"], doctor)])
-                
-                # At most 1 shift on weekdays (since day shift already counts as 1)
-                all_weekday_shifts = curr_evening_vars + curr_night_vars
-                if len(all_weekday_shifts) > 1:
-                    model.Add(sum(all_weekday_shifts) <= 1)
-                
-                # Also prevent: Night (prev day) + Day (implicit) + Evening (current day)
-                # If worked night previous day, cannot work evening current day
-                if prev_date >= days[0] and curr_evening_vars:
-                    prev_night_vars = []
-                    if (prev_date, "ER", SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                        prev_night_vars.append(shifts[(prev_date, "ER", SHIFT_TIMES["NIGHT"], doctor)])
-                    if (prev_date, "ward", SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                        prev_night_vars.append(shifts[(prev_date, "ward", SHIFT_TIMES["NIGHT"], doctor)])
-                    
-                    if prev_night_vars:
-                        model.Add(sum(prev_night_vars) + sum(curr_evening_vars) <= 1)
-                
-                # Prevent: Evening (prev day) + Night (prev day) + Day (implicit current day)
-                # If worked both evening AND night on previous day, that's already 2 consecutive shifts
-                # So cannot have the implicit day shift on current weekday
-                if prev_date >= days[0]:
-                    prev_evening_vars = []
-                    prev_night_vars = []
-                    
-                    if (prev_date, "ER", SHIFT_TIMES["EVENING"], doctor) in shifts:
-                        prev_evening_vars.append(shifts[(prev_date, "ER", SHIFT_TIMES["EVENING"], doctor)])
-                    if (prev_date, "ward", SHIFT_TIMES["EVENING"], doctor) in shifts:
-                        prev_evening_vars.append(shifts[(prev_date, "ward", SHIFT_TIMES["EVENING"], doctor)])
-                    
-                    if (prev_date, "ER", SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                        prev_night_vars.append(shifts[(prev_date, "ER", SHIFT_TIMES["NIGHT"], doctor)])
-                    if (prev_date, "ward", SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                        prev_night_vars.append(shifts[(prev_date, "ward", SHIFT_TIMES["NIGHT"], doctor)])
-                    
-                    # If worked both evening and night on prev day, prevent having current weekday
-                    # Since we can't directly forbid "having a weekday", we forbid working evening AND night together on prev day when current is weekday
-                    if prev_evening_vars and prev_night_vars:
-                        model.Add(sum(prev_evening_vars) + sum(prev_night_vars) <= 1)
-            else:
-                # Weekend: Check Day -> Evening -> Night
-                curr_day_vars = []
-                curr_evening_vars = []
-                curr_night_vars = []
-                
-                if (date, "ER", SHIFT_TIMES["DAY"], doctor) in shifts:
-                    curr_day_vars.append(shifts[(date, "ER", SHIFT_TIMES["DAY"], doctor)])
-                if (date, "ward", SHIFT_TIMES["DAY"], doctor) in shifts:
-                    curr_day_vars.append(shifts[(date, "ward", SHIFT_TIMES["DAY"], doctor)])
-                
-                if (date, "ER", SHIFT_TIMES["EVENING"], doctor) in shifts:
-                    curr_evening_vars.append(shifts[(date, "ER", SHIFT_TIMES["EVENING"], doctor)])
-                if (date, "ward", SHIFT_TIMES["EVENING"], doctor) in shifts:
-                    curr_evening_vars.append(shifts[(date, "ward", SHIFT_TIMES["EVENING"], doctor)])
-                
-                if (date, "ER", SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                    curr_night_vars.append(shifts[(date, "ER", SHIFT_TIMES["NIGHT"], doctor)])
-                if (date, "ward", SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                    curr_night_vars.append(shifts[(date, "ward", SHIFT_TIMES["NIGHT"], doctor)])
-                
-                for curr_day_var in curr_day_vars:
-                    for curr_evening_var in curr_evening_vars:
-                        for curr_night_var in curr_night_vars:
-                            model.Add(curr_day_var + curr_evening_var + curr_night_var <= 2)
-
-    # Constraint 5: Autopsy conflicts - doctors cannot work shifts that conflict with autopsy
-    for doctor in doctors:
-        if doctor in DOCTOR_AUTOPSY_DATA:
-            for autopsy_date, autopsy_time in DOCTOR_AUTOPSY_DATA[doctor]:
-                # Cannot work the same shift time on autopsy date
-                for shift_type in ["ER", "ward"]:
-                    if (autopsy_date, shift_type, autopsy_time, doctor) in shifts:
-                        model.Add(shifts[(autopsy_date, shift_type, autopsy_time, doctor)] == 0)
-                
-                # Additional autopsy conflict rules
-                # If autopsy at DAY time, cannot work Evening shift (same day)
-                if autopsy_time == SHIFT_TIMES["DAY"]:
-                    for shift_type in ["ER", "ward"]:
-                        if (autopsy_date, shift_type, SHIFT_TIMES["EVENING"], doctor) in shifts:
-                            model.Add(shifts[(autopsy_date, shift_type, SHIFT_TIMES["EVENING"], doctor)] == 0)
-
-                # If autopsy at EVENING time, cannot work any shift that day (blocks DAY, EVENING, NIGHT)
-                if autopsy_time == SHIFT_TIMES["EVENING"]:
-                    for shift_time in [SHIFT_TIMES["DAY"], SHIFT_TIMES["EVENING"], SHIFT_TIMES["NIGHT"]]:
-                        for shift_type in ["ER", "ward"]:
-                            if (autopsy_date, shift_type, shift_time, doctor) in shifts:
-                                model.Add(shifts[(autopsy_date, shift_type, shift_time, doctor)] == 0)
-                
-                # If autopsy at NIGHT time, cannot work EVENING shift (same day)
-                if autopsy_time == SHIFT_TIMES["NIGHT"]:
-                    for shift_type in ["ER", "ward"]:
-                        if (autopsy_date, shift_type, SHIFT_TIMES["EVENING"], doctor) in shifts:
-                            model.Add(shifts[(autopsy_date, shift_type, SHIFT_TIMES["EVENING"], doctor)] == 0)
-                
-                # Cross-day conflicts
-                prev_date = autopsy_date - datetime.timedelta(days=1)
-                next_date = autopsy_date + datetime.timedelta(days=1)
-                
-                # If autopsy DAY on day D, cannot work NIGHT on day D-1
-                if autopsy_time == SHIFT_TIMES["DAY"] and prev_date >= days[0]:
-                    for shift_type in ["ER", "ward"]:
-                        if (prev_date, shift_type, SHIFT_TIMES["NIGHT"], doctor) in shifts:
-                            model.Add(shifts[(prev_date, shift_type, SHIFT_TIMES["NIGHT"], doctor)] == 0)
-                
-                # If autopsy NIGHT on day D, cannot work DAY on day D+1
-                if autopsy_time == SHIFT_TIMES["NIGHT"] and next_date <= days[-1]:
-                    for shift_type in ["ER", "ward"]:
-                        if (next_date, shift_type, SHIFT_TIMES["DAY"], doctor) in shifts:
-                            model.Add(shifts[(next_date, shift_type, SHIFT_TIMES["DAY"], doctor)] == 0)
-    
+                relevant = slots_by_key[(period, shift_type)]
+                if relevant:
+                    assigned = sum(sm.x[s][i] for s in relevant if sm.x[s][i] is not None)
+                    target = doctor_data[doctor][period][shift_type]
+                    if soft_quotas:
+                        deviation = model.NewIntVar(0, max(len(relevant), target), "")
+                        model.Add(assigned - target <= deviation)
+                        model.Add(target - assigned <= deviation)
+                        sm.quota_deviation.append(deviation)
+                    else:
+                        model.Add(assigned == target).OnlyEnforceIf(guard("quotas"))
+
+    # Constraints 3 and 4: one shift at a time, no night before a day shift and no more than
+    # 2 shifts in a row, compiled from rules.SHIFT_RULES (with the autopsy blocks in the interval
+    # formulation). The carried-in day (if any) takes part as constant shifts before the first day.
+    carried_times = defaultdict(set)
+    if carry_in and days:
+        doctor_index = {doc: i for i, doc in enumerate(doctors)}
+        for _, shift_time, doc in carry_in.get(days[0] - datetime.timedelta(days=1), []):
+            if doc in doctor_index:
+                carried_times[doctor_index[doc]].add(SHIFT_TIME_INDEX[shift_time])
+    rules = compile_rules(calendar)
+    if formulation == "boolean":
+        add_cpsat_rules(rules, model, tv, guard, carried_times)
+    else:
+        if autopsy_data is None:
+            autopsy_data = DOCTOR_AUTOPSY_DATA
+        blocked = defaultdict(set)
+        for i, doctor in enumerate(doctors):
+            for autopsy_date, autopsy_time in autopsy_data.get(doctor, []):
+                blocked[i].update(rules.autopsy_positions(autopsy_date, SHIFT_TIME_INDEX[autopsy_time]))
+        add_cpsat_interval_rules(rules, model, tv, carried_times, blocked)
+
+    if diagnose:
+        # Only feasibility matters when looking for a conflict
+        sm.build_time = time.perf_counter() - start
+        return sm
+
     # Soft constraints: Minimize consecutive shifts with same time on consecutive days
-    penalty_vars = []
-    for doctor in doctors:
-        for i in range(len(days) - 1):
-            date = days[i]
-            next_date = days[i + 1]
-            
-            for shift_time in [SHIFT_TIMES["DAY"], SHIFT_TIMES["EVENING"], SHIFT_TIMES["NIGHT"]]:
-                # Collect all shifts at this time on current day
-                curr_shifts = []
-                for shift_type in ["ER", "ward"]:
-                    curr_key = (date, shift_type, shift_time, doctor)
-                    if curr_key in shifts:
-                        curr_shifts.append(shifts[curr_key])
-                
-                # Collect all shifts at this time on next day
-                next_shifts = []
-                for shift_type in ["ER", "ward"]:
-                    next_key = (next_date, shift_type, shift_time, doctor)
-                    if next_key in shifts:
-                        next_shifts.append(shifts[next_key])
-                
+    for i in range(n_doc):
+        for day in range(n_days - 1):
+            for t in range(3):
+                curr_shifts = tv[day][t][i]
+                next_shifts = tv[day + 1][t][i]
                 # If doctor works any shift at this time on both days, add penalty
                 if curr_shifts and next_shifts:
-                    penalty_var = model.NewBoolVar(f"penalty_{doctor}_d{date.day}_{date.day+1}_t{shift_time}")
+                    d = days[day].day
+                    penalty_var = model.NewBoolVar(f"penalty_{doctors[i]}_d{d}_{d+1}_t{SHIFT_TIME_ORDER[t]}" if name_vars else "")
                     # penalty_var = 1 iff (any curr_shift) AND (any next_shift)
-                    curr_any = model.NewBoolVar(f"curr_any_{doctor}_d{date.day}_t{shift_time}")
-                    next_any = model.NewBoolVar(f"next_any_{doctor}_d{date.day+1}_t{shift_time}")
+                    curr_any = model.NewBoolVar(f"curr_any_{doctors[i]}_d{d}_t{SHIFT_TIME_ORDER[t]}" if name_vars else "")
+                    next_any = model.NewBoolVar(f"next_any_{doctors[i]}_d{d+1}_t{SHIFT_TIME_ORDER[t]}" if name_vars else "")
                     model.AddMaxEquality(curr_any, curr_shifts)
                     model.AddMaxEquality(next_any, next_shifts)
                     model.AddMultiplicationEquality(penalty_var, [curr_any, next_any])
-                    penalty_vars.append(penalty_var)
+                    sm.penalty_vars.append(penalty_var)
+    for i, times in carried_times.items():
+        for t in times:
+            if tv[0][t][i]:
+                penalty_var = model.NewBoolVar(f"penalty_{doctors[i]}_carry_t{SHIFT_TIME_ORDER[t]}" if name_vars else "")
+                model.AddMaxEquality(penalty_var, tv[0][t][i])
+                sm.penalty_vars.append(penalty_var)
+
+    # Minimize the total penalty, after the quota deviation when quotas are soft
+    if sm.quota_deviation:
+        sm.objective = (len(sm.penalty_vars) + 1) * sum(sm.quota_deviation) + sum(sm.penalty_vars)
+    elif sm.penalty_vars:
+        sm.objective = sum(sm.penalty_vars)
+    if sm.objective is not None:
+        model.Minimize(sm.objective)
+
+    sm.build_time = time.perf_counter() - start
+    return sm
+
+
+def _prepare_ortools(year, month, doctor_data, time_limit_seconds, calendar, name_vars, hint, repair_hint,
+                     profile=None, log_search=False, formulation="boolean"):
+    """
+    Build the month model and a configured solver, shared by the blocking and streaming entry points.
+    Returns (None, None) when the pre-check rejects the inputs, before any model is built.
+    """
+    doctor_data = adjust_doctor_data(doctor_data)
+    calendar = calendar or get_month_calendar(year, month)
+    issues, elapsed = timed_check(check_schedule_inputs, calendar, doctor_data)
+    if not report_issues(issues, "OR-Tools CP-SAT", elapsed):
+        return None, None
+    sm = build_schedule_model(calendar, doctor_data, name_vars=name_vars, formulation=formulation)
+    num_vars, num_constraints = sm.stats()
+    print(f"[OR-Tools CP-SAT] Model built in {sm.build_time:.3f}s ({num_vars} variables, {num_constraints} constraints, "
+          f"{formulation} formulation)")
+    if hint:
+        print(f"[OR-Tools CP-SAT] Hinted {sm.add_hint(hint)} of {len(sm.slots)} slots")
+
+    solver = make_solver(time_limit_seconds, profile, log_search)
+    if hint and repair_hint:
+        solver.parameters.repair_hint = True
+    return sm, solver
+
+
+def generate_schedule_ortools(year, month, doctor_data, time_limit_seconds=300, calendar=None, name_vars=False,
+                              hint=None, repair_hint=False, profile=None, log_search=False, stop_policy=None,
+                              formulation="boolean"):
+    """
+    Generate a schedule using OR-Tools CP-SAT solver.
     
-    # Minimize the total penalty
-    if penalty_vars:
-        model.Minimize(sum(penalty_vars))
-
-    # Create the solver and solve
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = time_limit_seconds
-    solver.parameters.log_search_progress = True
+    Args:
+        year: int, the year for the schedule
+        month: int, the month for the schedule
+        doctor_data: dict, the doctor availability data
+        time_limit_seconds: int, maximum time for solver (default 300 seconds)
+        calendar: MonthCalendar, built from year and month when omitted
+        name_vars: bool, give model variables readable names (default off)
+        hint: schedule in the same format as the return value, used as a warm start
+        repair_hint: bool, let the solver repair a hint that breaks constraints
+        profile: solver profile name (see solver_tools.SOLVER_PROFILES) or parameter dict
+        log_search: bool, print the CP-SAT search log (default off)
+        stop_policy: solver_tools.StopPolicy, ends the search early on a plateau or a small gap
+        formulation: "boolean" or "interval", see build_schedule_model
+    
+    Returns:
+        schedule: dict mapping date to list of (shift_type, shift_time, doctor)
+    """
+    sm, solver = _prepare_ortools(year, month, doctor_data, time_limit_seconds, calendar, name_vars, hint, repair_hint,
+                                  profile, log_search, formulation)
+    if sm is None:
+        return {}
     
     print("[OR-Tools CP-SAT] Solving...")
-    status = solver.Solve(model)
+    status, reason = solve_with_policy(solver, sm.model, stop_policy)
     
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
         print(f"[OR-Tools CP-SAT] Solution found with status: {solver.StatusName(status)}")
-        print(f"[OR-Tools CP-SAT] Wall time: {solver.WallTime():.2f}s")
-        
-        # Extract the solution
-        schedule = defaultdict(list)
-        for date, shift_type, shift_time, key in all_shifts:
-            for doctor in doctors:
-                if (date, shift_type, shift_time, doctor) in shifts:
-                    if solver.Value(shifts[(date, shift_type, shift_time, doctor)]) == 1:
-                        schedule[date].append((shift_type, shift_time, doctor))
-                        break
-        
-        return dict(schedule)
+        print(f"[OR-Tools CP-SAT] Wall time: {solver.WallTime():.2f}s (stopped: {reason})")
+        return sm.extract_schedule(solver.Value)
     else:
         print(f"[OR-Tools CP-SAT] No solution found. Status: {solver.StatusName(status)}")
+        if status == cp_model.INFEASIBLE:
+            # Only a proof of infeasibility has a conflict to explain; UNKNOWN just ran out of time
+            diagnose_schedule_ortools(year, month, doctor_data, calendar=calendar)
         print("[OR-Tools CP-SAT] Falling back to empty schedule.")
         return {}
 
 
-def generate_schedule(year, month, doctor_data, max_iter=100000, initial_temp=10.0, cooling_rate=0.995):
+def generate_schedule_pool_ortools(year, month, doctor_data, count=3, min_distance=10, time_limit_seconds=300,
+                                   calendar=None, profile=None):
+    """
+    Generate up to `count` alternative schedules that differ pairwise in at least
+    `min_distance` shifts, from one model strengthened by a no-good cut after each solution.
+    Only the first schedule is optimised; the others stop at their first schedule whose
+    penalty is no higher than the first one's (see solver_tools.solve_diverse), so each
+    alternative costs at most time_limit_seconds and usually far less.
+
+    Args:
+        year: int
+        month: int
+        doctor_data: dict, the doctor availability data
+        count: int, number of alternatives wanted
+        min_distance: int, minimum number of shifts assigned to a different doctor between any two alternatives
+        time_limit_seconds: int, solver time limit per alternative
+        calendar: MonthCalendar, built from year and month when omitted
+        profile: solver profile name or parameter dict
+
+    Returns:
+        schedules: list of schedule dicts, best first (may be shorter than count)
+    """
+    sm, solver = _prepare_ortools(year, month, doctor_data, time_limit_seconds, calendar, False, None, False, profile)
+    if sm is None:
+        return []
+    print(f"[OR-Tools CP-SAT] Solving for {count} alternatives at least {min_distance} shifts apart...")
+    decision_vars = [var for row in sm.x for var in row if var is not None]
+    objective = None if sm.objective is None else (sm.objective, False)
+    schedules = solve_diverse(solver, sm.model, decision_vars, sm.extract_schedule, count, min_distance, objective)
+    print(f"[OR-Tools CP-SAT] Found {len(schedules)} alternative(s)")
+    return schedules
+
+
+def diagnose_schedule_ortools(year, month, doctor_data, time_limit_seconds=30, calendar=None):
+    """
+    Explain why a month has no schedule, without optimising.
+
+    Args:
+        year: int
+        month: int
+        doctor_data: dict, the doctor availability data (adjusted here)
+        time_limit_seconds: int, limit for each diagnosis solve
+        calendar: MonthCalendar, built from year and month when omitted
+
+    Returns:
+        conflict: list of DIAGNOSIS_FAMILIES keys that cannot all hold together,
+            [] if the roster is feasible, None if the solver could not decide in time
+    """
+    doctor_data = adjust_doctor_data(doctor_data)
+    calendar = calendar or get_month_calendar(year, month)
+    sm = build_schedule_model(calendar, doctor_data, diagnose=True)
+    print("[OR-Tools CP-SAT] Diagnosing...")
+    status, conflict = explain_infeasibility(sm.model, sm.assumptions, time_limit_seconds)
+    if conflict:
+        print("[OR-Tools CP-SAT] Conflicting constraints (relaxing any one of them removes this conflict):")
+        for family in conflict:
+            print(f"  - {DIAGNOSIS_FAMILIES[family]}")
+    elif conflict == []:
+        print("[OR-Tools CP-SAT] No conflict: the constraints are satisfiable together.")
+    else:
+        print(f"[OR-Tools CP-SAT] Diagnosis inconclusive. Status: {status}")
+    return conflict
+
+
+def stream_schedule_ortools(year, month, doctor_data, time_limit_seconds=300, calendar=None, name_vars=False,
+                            hint=None, repair_hint=False, profile=None, log_search=False, stop_policy=None,
+                            formulation="boolean"):
+    """
+    Streaming variant of generate_schedule_ortools: yields every improving schedule while
+    the solver runs. Stop iterating to stop the search early.
+
+    Args:
+        same as generate_schedule_ortools
+
+    Yields:
+        SolutionUpdate whose solution is a schedule dict (date -> list of (shift_type, shift_time, doctor))
+    """
+    sm, solver = _prepare_ortools(year, month, doctor_data, time_limit_seconds, calendar, name_vars, hint, repair_hint,
+                                  profile, log_search, formulation)
+    if sm is None:
+        return
+
+    print("[OR-Tools CP-SAT] Solving (streaming)...")
+    status, reason = yield from stream_solutions(solver, sm.model, sm.extract_schedule, stop_policy)
+    print(f"[OR-Tools CP-SAT] Finished with status: {solver.StatusName(status)} after {solver.WallTime():.2f}s "
+          f"(stopped: {reason})")
+
+
+def generate_schedule(year, month, doctor_data, max_iter=100000, initial_temp=10.0, cooling_rate=0.995, calendar=None,
+                      hint=None, repair_hint=False, profile=None, log_search=False, stop_policy=None,
+                      formulation="boolean"):
     """
     Wrapper function that uses OR-Tools CP-SAT solver.
     The signature matches the original simulated annealing function for compatibility.
@@ -318,8 +425,17 @@ def generate_schedule(year, month, doctor_data, max_iter=100000, initial_temp=10
         max_iter: int (unused, kept for API compatibility)
         initial_temp: float (unused, kept for API compatibility)
         cooling_rate: float (unused, kept for API compatibility)
+        calendar: MonthCalendar, built from year and month when omitted
+        hint: previous schedule to warm-start from
+        repair_hint: bool, let the solver repair an infeasible hint
+        profile: solver profile name or parameter dict
+        log_search: bool, print the CP-SAT search log
+        stop_policy: solver_tools.StopPolicy for an early stop
+        formulation: "boolean" or "interval", see build_schedule_model
     
     Returns:
         schedule: dict mapping date to list of (shift_type, shift_time, doctor)
     """
-    return generate_schedule_ortools(year, month, doctor_data, time_limit_seconds=300)
+    return generate_schedule_ortools(year, month, doctor_data, time_limit_seconds=300, calendar=calendar,
+                                     hint=hint, repair_hint=repair_hint, profile=profile, log_search=log_search,
+                                     stop_policy=stop_policy, formulation=formulation)
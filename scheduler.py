@@ -1,25 +1,189 @@
-import copy
-import datetime
+from array import array
+import math
+import os
 import random
 from collections import defaultdict
-from doctor_data import adjust_doctor_data, SHIFT_TIMES
-from constraints import is_weekend, is_holiday, violates_constraints
-
-WEEKDAY_SHIFTS = [
-    ("ER", SHIFT_TIMES["EVENING"]),
-    ("ER", SHIFT_TIMES["NIGHT"]),
-    ("ward", SHIFT_TIMES["EVENING"])
-]
-WEEKEND_SHIFTS = [
-    ("ER", SHIFT_TIMES["DAY"]),
-    ("ER", SHIFT_TIMES["EVENING"]),
-    ("ER", SHIFT_TIMES["NIGHT"]),
-    ("ward", SHIFT_TIMES["DAY"]),
-    ("ward", SHIFT_TIMES["EVENING"]),
-    ("ward", SHIFT_TIMES["NIGHT"])
-]
-
-def generate_schedule(year, month, doctor_data, max_iter=100000, initial_temp=10.0, cooling_rate=0.995):
+from concurrent.futures import ProcessPoolExecutor
+from doctor_data import adjust_doctor_data, DOCTOR_AUTOPSY_DATA
+from constraints import ConstraintChecker, SHIFT_TIME_INDEX, SHIFT_TYPE_INDEX
+from month_calendar import get_month_calendar, calendar_for_schedule
+
+SHIFT_TIME_ORDER = list(SHIFT_TIME_INDEX)
+SHIFT_TYPE_ORDER = list(SHIFT_TYPE_INDEX)
+PERIOD_ORDER = ["weekday", "weekend"]
+
+
+class _AnnealingState:
+    """
+    Compact integer state for the annealer.
+    Every shift of the month is a slot index with precomputed day, period, type and time,
+    the assignment is a slot -> doctor id array and the constraint checker's occupancy
+    bitmasks replace the date-keyed lists of string tuples.
+    Day indices are 1-based with a padding day on each side of the month.
+    Quotas are per (doctor, period) with ER and ward combined; with per_type they are per
+    (doctor, period, shift type) like the CP-SAT model, and swaps stay within one shift type.
+    """
+
+    def __init__(self, year, month, doctor_data, calendar=None, per_type=False):
+        doctor_data = adjust_doctor_data(doctor_data)
+        calendar = calendar or get_month_calendar(year, month)
+        self.days = calendar.days
+        self.doctors = list(doctor_data.keys())
+        self.num_day_slots = len(self.days) + 2
+
+        # Slot metadata
+        self.slot_day = array("i")
+        self.slot_period = array("i")
+        self.slot_type = array("i")
+        self.slot_time = array("i")
+        self.day_slots = [range(0, 0)] * self.num_day_slots
+        for day, date in enumerate(self.days, start=1):
+            first = len(self.slot_day)
+            for shift_type, shift_time in calendar.day_slots[date]:
+                self.slot_day.append(day)
+                self.slot_period.append(PERIOD_ORDER.index(calendar.period[date]))
+                self.slot_type.append(SHIFT_TYPE_INDEX[shift_type])
+                self.slot_time.append(SHIFT_TIME_INDEX[shift_time])
+            self.day_slots[day] = range(first, len(self.slot_day))
+        self.num_slots = len(self.slot_day)
+        # Quota group of every slot: its period, or its (period, shift type) with per_type
+        if per_type:
+            self.groups = [(period, shift_type) for period in PERIOD_ORDER for shift_type in SHIFT_TYPE_ORDER]
+            self.slot_group = array("i", (p * len(SHIFT_TYPE_ORDER) + t for p, t in zip(self.slot_period, self.slot_type)))
+        else:
+            self.groups = [(period,) for period in PERIOD_ORDER]
+            self.slot_group = array("i", self.slot_period)
+        self.slots_by_group = [
+            [s for s in range(self.num_slots) if self.slot_group[s] == g] for g in range(len(self.groups))
+        ]
+
+        # Occupancy index and autopsy blocks live in the shared constraint checker
+        self.checker = ConstraintChecker(calendar, self.doctors, DOCTOR_AUTOPSY_DATA)
+
+        # Quota per (doctor, group)
+        self.quota = [
+            [sum(doctor_data[doctor][group[0]][shift_type] for shift_type in group[1:] or SHIFT_TYPE_ORDER)
+             for group in self.groups]
+            for doctor in self.doctors
+        ]
+
+        self.assign = array("i", [-1] * self.num_slots)
+        self.violations = array("b", [0] * self.num_slots)
+        self.cost = 0
+
+    def place(self, s, doc):
+        self.assign[s] = doc
+        self.checker.add(doc, self.slot_day[s], self.slot_type[s], self.slot_time[s])
+
+    def unplace(self, s):
+        self.checker.remove(self.assign[s], self.slot_day[s], self.slot_type[s], self.slot_time[s])
+        self.assign[s] = -1
+
+    def violates(self, s, doc):
+        """Same rules as constraints.violates_constraints, for doctor `doc` on slot `s`."""
+        return self.checker.violates_at(doc, self.slot_day[s], self.slot_type[s], self.slot_time[s])
+
+    def clear(self):
+        for s in range(self.num_slots):
+            self.assign[s] = -1
+        self.checker.clear()
+
+    def random_fill(self, rng):
+        self.clear()
+        remaining = [row[:] for row in self.quota]
+        doctor_ids = range(len(self.doctors))
+        for s in range(self.num_slots):
+            g = self.slot_group[s]
+            possible_doctors = [doc for doc in doctor_ids if remaining[doc][g] > 0 and not self.violates(s, doc)]
+            if not possible_doctors:
+                possible_doctors = [doc for doc in doctor_ids if remaining[doc][g] > 0]
+            if not possible_doctors:
+                date = self.days[self.slot_day[s] - 1]
+                shift_type = SHIFT_TYPE_ORDER[self.slot_type[s]]
+                shift_time = SHIFT_TIME_ORDER[self.slot_time[s]]
+                raise RuntimeError(f"No doctors with remaining quota for {date} {shift_type} {shift_time} ({PERIOD_ORDER[self.slot_period[s]]}). Please verify doctor_data.")
+            doc = rng.choice(possible_doctors)
+            self.place(s, doc)
+            remaining[doc][g] -= 1
+        self.recompute_cost()
+
+    def recompute_cost(self):
+        for s in range(self.num_slots):
+            self.violations[s] = self.violates(s, self.assign[s])
+        self.cost = sum(self.violations)
+        return self.cost
+
+    def affected_slots(self, s1, s2):
+        # A violation only depends on the doctor's own shifts on the same, previous and next day
+        doctors = (self.assign[s1], self.assign[s2])
+        touched = set()
+        for day in (self.slot_day[s1], self.slot_day[s2]):
+            for d in (day - 1, day, day + 1):
+                for s in self.day_slots[d]:
+                    if self.assign[s] in doctors:
+                        touched.add(s)
+        return touched
+
+    def swap(self, s1, s2):
+        doc1 = self.assign[s1]
+        doc2 = self.assign[s2]
+        self.unplace(s1)
+        self.unplace(s2)
+        self.place(s1, doc2)
+        self.place(s2, doc1)
+
+    def load(self, assign):
+        """Replace the current assignment and rebuild occupancy and violations from it."""
+        self.clear()
+        for s, doc in enumerate(assign):
+            self.place(s, doc)
+        return self.recompute_cost()
+
+    def anneal(self, rng, iterations, temp, cooling_rate):
+        """
+        Run up to `iterations` swap moves from the current assignment.
+        Stops early once a zero-cost assignment is found.
+        Returns:
+            (iterations run, final temperature, best assignment, best cost)
+        """
+        best_assign = self.assign[:]
+        best_cost = self.cost
+        # Slots never move between quota groups, so the candidates for a swap are fixed up front
+        groups_with_enough = [slots for slots in self.slots_by_group if len(slots) >= 2]
+        iteration = 0
+        while iteration < iterations and best_cost > 0 and groups_with_enough:
+            iteration += 1
+            s1, s2 = rng.sample(rng.choice(groups_with_enough), 2)
+            touched = self.affected_slots(s1, s2)
+            old_flags = sum(self.violations[s] for s in touched)
+            # Apply the move in place and rescore only the assignments it can influence
+            self.swap(s1, s2)
+            new_flags = {s: self.violates(s, self.assign[s]) for s in touched}
+            delta = sum(new_flags.values()) - old_flags
+            if delta <= 0 or (temp > 0 and rng.random() < math.exp(-delta / temp)):
+                for s, flag in new_flags.items():
+                    self.violations[s] = flag
+                self.cost += delta
+                if self.cost < best_cost:
+                    best_assign = self.assign[:]
+                    best_cost = self.cost
+            else:
+                # Undo the rejected move
+                self.swap(s1, s2)
+            temp *= cooling_rate
+        return iteration, temp, best_assign, best_cost
+
+    def to_schedule(self, assign=None):
+        assign = self.assign if assign is None else assign
+        schedule = defaultdict(list)
+        for s in range(self.num_slots):
+            date = self.days[self.slot_day[s] - 1]
+            schedule[date].append((SHIFT_TYPE_ORDER[self.slot_type[s]], SHIFT_TIME_ORDER[self.slot_time[s]], self.doctors[assign[s]]))
+        return schedule
+
+
+def generate_schedule(year, month, doctor_data, max_iter=100000, initial_temp=10.0, cooling_rate=0.995, seed=42,
+                      calendar=None):
     """
     Generate a schedule using simulated annealing.
     Args:
@@ -28,99 +192,127 @@ def generate_schedule(year, month, doctor_data, max_iter=100000, initial_temp=10
         max_iter: int, number of iterations
         initial_temp: float, starting temperature
         cooling_rate: float, temperature decay per iteration
+        seed: int, seed of the local random generator
+        calendar: MonthCalendar, built from year and month when omitted
     Returns:
         schedule: dict mapping date to list of (shift_type, shift_time, doctor)
     """
-    doctor_data = adjust_doctor_data(doctor_data)
-    days_in_month = (datetime.date(year, month % 12 + 1, 1) - datetime.timedelta(days=1)).day
-    days = [datetime.date(year, month, d) for d in range(1, days_in_month+1)]
-    doctors = list(doctor_data.keys())
+    state = _AnnealingState(year, month, doctor_data, calendar)
 
     # Use a local random instance for reproducibility
     local_random = random.Random()
-    local_random.seed(42)
-
-    # Prepare all shifts to assign: list of (date, shift_type, shift_time, period_key)
-    all_shifts = []
-    for date in days:
-        is_wkend = is_weekend(date) or is_holiday(date)
-        shifts = WEEKEND_SHIFTS if is_wkend else WEEKDAY_SHIFTS
-        key = "weekend" if is_wkend else "weekday"
-        for shift_type, shift_time in shifts:
-            all_shifts.append((date, shift_type, shift_time, key))
-
-    def get_initial_remaining():
-        return {
-            doctor: {period: sum(types.values()) for period, types in doctor_data[doctor].items()}
-            for doctor in doctor_data
-        }
-
-    def random_schedule():
-        schedule = defaultdict(list)
-        remaining = get_initial_remaining()
-        for date, shift_type, shift_time, key in all_shifts:
-            possible_doctors = [doctor for doctor in doctors if remaining[doctor][key] > 0 and not violates_constraints(schedule, doctor, date, shift_type, shift_time)]
-            if possible_doctors:
-                doctor = local_random.choice(possible_doctors)
-                schedule[date].append((shift_type, shift_time, doctor))
-                remaining[doctor][key] -= 1
-            else:
-                fallback_doctors = [doctor for doctor in doctors if remaining[doctor][key] > 0]
-                if fallback_doctors:
-                    doctor = local_random.choice(fallback_doctors)
-                    schedule[date].append((shift_type, shift_time, doctor))
-                    remaining[doctor][key] -= 1
-                else:
-                    raise RuntimeError(f"No doctors with remaining quota for {date} {shift_type} {shift_time} ({key}). Please verify doctor_data.")
-        return schedule, 0
-
-    def cost(schedule):
-        return sum(
-            1
-            for date in schedule
-            for shift_type, shift_time, doctor in schedule[date]
-            if violates_constraints(schedule, doctor, date, shift_type, shift_time)
-        )
-
-    def neighbor(schedule):
-        new_schedule = copy.deepcopy(schedule)
-        def get_period(date):
-            return "weekend" if is_weekend(date) or is_holiday(date) else "weekday"
-        assigned_by_period = {"weekday": [], "weekend": []}
-        for date in new_schedule:
-            period = get_period(date)
-            for idx, s in enumerate(new_schedule[date]):
-                assigned_by_period[period].append((date, idx, s))
-        periods_with_enough = [p for p in assigned_by_period if len(assigned_by_period[p]) >= 2]
-        if not periods_with_enough:
-            return new_schedule
-        period = local_random.choice(periods_with_enough)
-        (date1, idx1, (shift_type1, shift_time1, doctor1)), (date2, idx2, (shift_type2, shift_time2, doctor2)) = local_random.sample(assigned_by_period[period], 2)
-        new_schedule[date1][idx1] = (shift_type1, shift_time1, doctor2)
-        new_schedule[date2][idx2] = (shift_type2, shift_time2, doctor1)
-        return new_schedule
-
-    current_schedule, _ = random_schedule()
-    current_cost = cost(current_schedule)
-    best_schedule = copy.deepcopy(current_schedule)
-    best_cost = current_cost
-    temp = initial_temp
-    for iteration in range(max_iter):
-        new_schedule = neighbor(current_schedule)
-        new_cost = cost(new_schedule)
-        delta = new_cost - current_cost
-        if delta < 0 or local_random.random() < (2.71828 ** (-delta / temp)):
-            current_schedule = new_schedule
-            current_cost = new_cost
-            if new_cost < best_cost:
-                best_schedule = copy.deepcopy(new_schedule)
-                best_cost = new_cost
-        temp *= cooling_rate
-        if best_cost == 0:
-            print(f"[Simulated Annealing] Found best cost 0 after {iteration} iterations.")
-            break
+    local_random.seed(seed)
+
+    state.random_fill(local_random)
+    iterations, _, best_assign, best_cost = state.anneal(local_random, max_iter, initial_temp, cooling_rate)
+    if best_cost == 0:
+        print(f"[Simulated Annealing] Found best cost 0 after {iterations} iterations.")
     print(f"[Simulated Annealing] Best cost: {best_cost}")
-    return best_schedule
+    return state.to_schedule(best_assign)
+
+
+# Per-process annealing state for parallel tempering workers, built once by the pool initializer
+_worker_state = None
+
+
+def _init_tempering_worker(year, month, doctor_data, calendar):
+    global _worker_state
+    _worker_state = _AnnealingState(year, month, doctor_data, calendar)
+
+
+def _run_tempering_round(assign, rng_state, iterations, temp, cooling_rate):
+    state = _worker_state
+    rng = random.Random()
+    rng.setstate(rng_state)
+    state.load(assign)
+    iterations_run, temp, best_assign, best_cost = state.anneal(rng, iterations, temp, cooling_rate)
+    return state.assign[:], state.cost, best_assign, best_cost, iterations_run, temp, rng.getstate()
+
+
+def generate_schedule_parallel(year, month, doctor_data, seeds=(42, 43, 44, 45), max_iter=100000,
+                               initial_temp=10.0, temp_ratio=1.5, cooling_rate=0.995,
+                               exchange_interval=1000, max_workers=None, calendar=None):
+    """
+    Generate a schedule using parallel tempering across a process pool.
+    One annealing chain runs per seed, chain k starting at initial_temp * temp_ratio**k.
+    Every exchange_interval iterations neighbouring chains may swap their current
+    schedules, and all chains stop after the round in which any chain reaches cost 0.
+    The result only depends on the seed set, not on the pool size or process timing.
+    Args:
+        year, month: int
+        doctor_data: dict
+        seeds: sequence of int, one chain per seed
+        max_iter: int, number of iterations per chain
+        initial_temp: float, starting temperature of the coldest chain
+        temp_ratio: float, temperature ratio between neighbouring chains
+        cooling_rate: float, temperature decay per iteration
+        exchange_interval: int, iterations between replica exchanges
+        max_workers: int, process pool size (default: one per chain, capped by the CPU count)
+        calendar: MonthCalendar, built from year and month when omitted
+    Returns:
+        schedule: dict mapping date to list of (shift_type, shift_time, doctor)
+    """
+    calendar = calendar or get_month_calendar(year, month)
+    state = _AnnealingState(year, month, doctor_data, calendar)
+    exchange_random = random.Random(",".join(str(seed) for seed in seeds))
+
+    chains = []
+    for k, seed in enumerate(seeds):
+        rng = random.Random()
+        rng.seed(seed)
+        state.random_fill(rng)
+        chains.append({
+            "seed": seed,
+            "assign": state.assign[:],
+            "cost": state.cost,
+            "best_assign": state.assign[:],
+            "best_cost": state.cost,
+            "temp": initial_temp * temp_ratio ** k,
+            "rng_state": rng.getstate(),
+            "iterations": 0,
+        })
+
+    if max_workers is None:
+        max_workers = min(len(chains), os.cpu_count() or 1)
+    done = 0
+    rounds = 0
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_tempering_worker,
+                             initargs=(year, month, doctor_data, calendar)) as executor:
+        while done < max_iter and all(chain["best_cost"] > 0 for chain in chains):
+            round_iterations = min(exchange_interval, max_iter - done)
+            futures = [
+                executor.submit(_run_tempering_round, chain["assign"], chain["rng_state"],
+                                round_iterations, chain["temp"], cooling_rate)
+                for chain in chains
+            ]
+            for chain, future in zip(chains, futures):
+                assign, cost, best_assign, best_cost, iterations_run, temp, rng_state = future.result()
+                chain.update(assign=assign, cost=cost, temp=temp, rng_state=rng_state)
+                chain["iterations"] += iterations_run
+                if best_cost < chain["best_cost"]:
+                    chain["best_assign"] = best_assign
+                    chain["best_cost"] = best_cost
+            done += round_iterations
+            rounds += 1
+
+            # Replica exchange between neighbouring temperatures, alternating even and odd pairs
+            for k in range(rounds % 2, len(chains) - 1, 2):
+                cold, hot = chains[k], chains[k + 1]
+                if cold["temp"] <= 0 or hot["temp"] <= 0:
+                    continue
+                exponent = (cold["cost"] - hot["cost"]) * (1 / cold["temp"] - 1 / hot["temp"])
+                if exponent >= 0 or exchange_random.random() < math.exp(exponent):
+                    cold["assign"], hot["assign"] = hot["assign"], cold["assign"]
+                    cold["cost"], hot["cost"] = hot["cost"], cold["cost"]
+
+    # Lowest best cost wins. Ties go to the chain that ran fewer iterations, which only differs
+    # between chains that reached cost 0 in the last round (anneal stops there), then to seed order
+    winner = min(chains, key=lambda chain: (chain["best_cost"], chain["iterations"]))
+    if winner["best_cost"] == 0:
+        print(f"[Parallel Tempering] Chain with seed {winner['seed']} found best cost 0 after {winner['iterations']} iterations.")
+    print(f"[Parallel Tempering] Best cost: {winner['best_cost']} ({len(chains)} chains)")
+    return state.to_schedule(winner["best_assign"])
+
 
 def print_schedule(schedule):
     for date in sorted(schedule.keys()):
@@ -142,10 +334,11 @@ def print_expected_shifts(doctor_data):
         print(f"Doctor: {doctor} | weekday ER: {wd_er}, ward: {wd_ward}, total: {wd_total} | weekend ER: {we_er}, ward: {we_ward}, total: {we_total}")
     print()
 
-def print_schedule_summary(schedule):
+def print_schedule_summary(schedule, calendar=None):
     summary = {}
+    calendar = calendar or calendar_for_schedule(schedule)
     for date in schedule:
-        period = "weekend" if is_weekend(date) or is_holiday(date) else "weekday"
+        period = calendar.period_of(date)
         for shift_type, shift_time, doctor in schedule[date]:
             if doctor == "Unassigned":
                 continue
@@ -161,13 +354,14 @@ def print_schedule_summary(schedule):
             print(f"    {period} total: {summary[doctor][period]['ER'] + summary[doctor][period]['ward']}")
     print()
 
-def verify_schedule(schedule, doctor_data):
+def verify_schedule(schedule, doctor_data, calendar=None):
     adjusted = adjust_doctor_data(doctor_data)
+    calendar = calendar or calendar_for_schedule(schedule)
     # Track total shifts per doctor per period (ignore ER/ward distinction)
     summary = {doctor: {"weekday": 0, "weekend": 0} for doctor in adjusted}
     unassigned_count = 0
     for date in schedule:
-        period = "weekend" if is_weekend(date) or is_holiday(date) else "weekday"
+        period = calendar.period_of(date)
         for shift_type, shift_time, doctor in schedule[date]:
             if doctor == "Unassigned":
                 unassigned_count += 1
@@ -191,17 +385,39 @@ def verify_schedule(schedule, doctor_data):
         print("Schedule verification WARNING: All counts match but there are unassigned shifts.")
     else:
         print("Schedule verification FAILED: See errors above.")
-
-def verify_total_shifts_against_doctor_data(year, month, doctor_data):
-    num_days = (datetime.date(year, month % 12 + 1, 1) - datetime.timedelta(days=1)).day
-    days = [datetime.date(year, month, d) for d in range(1, num_days+1)]
-    total = {"weekday": 0, "weekend": 0}
-    for date in days:
-        is_wkend = is_weekend(date) or is_holiday(date)
-        if is_wkend:
-            total["weekend"] += 6  # 3 ER + 3 ward
+    if schedule:
+        checker = ConstraintChecker(calendar, adjusted, DOCTOR_AUTOPSY_DATA)
+        violations = checker.find_violations(schedule)
+        for date, shift_type, shift_time, doctor in violations:
+            print(f"ERROR: {doctor} {date} {shift_type} {shift_time} breaks a shift constraint")
+        if violations:
+            print(f"Constraint check FAILED: {len(violations)} assignments break shift constraints.")
         else:
-            total["weekday"] += 3  # 2 ER + 1 ward
+            print("Constraint check PASSED: No assignment breaks shift constraints.")
+
+def quota_mismatches(schedule, doctor_data, calendar=None):
+    """
+    Per-type quota check, as enforced by the CP-SAT model (verify_schedule only compares ER+ward totals).
+    Returns:
+        list of (doctor, period, shift_type, expected, actual), empty when every quota is met
+    """
+    adjusted = adjust_doctor_data(doctor_data)
+    calendar = calendar or calendar_for_schedule(schedule)
+    actual = defaultdict(int)
+    for date, shifts in schedule.items():
+        for shift_type, _, doctor in shifts:
+            actual[(doctor, calendar.period_of(date), shift_type)] += 1
+    return [
+        (doctor, period, shift_type, adjusted[doctor][period][shift_type], actual[(doctor, period, shift_type)])
+        for doctor in adjusted
+        for period in PERIOD_ORDER
+        for shift_type in SHIFT_TYPE_ORDER
+        if adjusted[doctor][period][shift_type] != actual[(doctor, period, shift_type)]
+    ]
+
+def verify_total_shifts_against_doctor_data(year, month, doctor_data, calendar=None):
+    calendar = calendar or get_month_calendar(year, month)
+    total = {period: calendar.slot_count(period) for period in ["weekday", "weekend"]}
     adjusted = adjust_doctor_data(doctor_data)
     sum_doctors = {"weekday": 0, "weekend": 0}
     for doctor in adjusted:
@@ -0,0 +1,476 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from ortools.sat.python import cp_model
+
+# One improving solution reported while CP-SAT is still searching.
+#   solution: whatever the model's extract function built from the callback values
+#   objective / bound: objective value and best proven bound at that point
+#   elapsed: solver wall time in seconds
+#   index: 1-based number of the solution
+SolutionUpdate = namedtuple("SolutionUpdate", ["solution", "objective", "bound", "elapsed", "index"])
+
+_DONE = object()
+
+# Named CpSolver parameter sets. Values are CpSolver.parameters fields; list values are
+# repeated fields (subsolver names). The time limit is not part of a profile: callers keep
+# their own max_time_in_seconds.
+#   fast-feasible: good solutions quickly; bound-proving workers are dropped and the search
+#                  stops at a 5% gap or after 60 units of deterministic time
+#   balanced:      CP-SAT defaults on all cores, searches until proved optimal or out of time
+#   prove-optimal: heavier LP relaxation and extra bound-proving workers for closing the gap
+SOLVER_PROFILES = {
+    "fast-feasible": {
+        "num_workers": 8,
+        "linearization_level": 0,
+        "relative_gap_limit": 0.05,
+        "max_deterministic_time": 60.0,
+        "ignore_subsolvers": ["core", "lb_tree_search", "max_lp", "objective_lb_search",
+                              "probing", "pseudo_costs", "reduced_costs"],
+    },
+    "balanced": {
+        "num_workers": 0,
+        "linearization_level": 1,
+        "relative_gap_limit": 0.0,
+    },
+    "prove-optimal": {
+        "num_workers": 0,
+        "linearization_level": 2,
+        "relative_gap_limit": 0.0,
+        "extra_subsolvers": ["core", "lb_tree_search", "max_lp", "objective_lb_search"],
+    },
+}
+DEFAULT_PROFILE = "balanced"
+
+
+def save_profile(filename, parameters, name="tuned", **details):
+    """Write a parameter dict as a JSON profile file; extra keyword details are stored alongside."""
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump({"name": name, "parameters": parameters, **details}, f, ensure_ascii=False, indent=2)
+
+
+def load_profile(filename):
+    """Parameter dict of a JSON profile file written by save_profile."""
+    with open(filename, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not isinstance(data.get("parameters"), dict):
+        raise ValueError(f"{filename} is not a solver profile file (no \"parameters\" object)")
+    return data["parameters"]
+
+
+def resolve_profile(profile=None):
+    """
+    Parameter dict of a profile given by name, as a dict, as the path of an existing JSON
+    profile file (see save_profile), or None for DEFAULT_PROFILE. Names take precedence
+    over files of the same name.
+    """
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if isinstance(profile, str):
+        if profile in SOLVER_PROFILES:
+            return SOLVER_PROFILES[profile]
+        if os.path.isfile(profile):
+            return load_profile(profile)
+        raise ValueError(f"Unknown solver profile {profile!r}: expected one of {', '.join(SOLVER_PROFILES)} "
+                         f"or the path of a profile file")
+    return profile
+
+
+def make_solver(time_limit_seconds, profile=None, log_search=False):
+    """
+    CpSolver configured from a profile.
+    Args:
+        time_limit_seconds: max_time_in_seconds
+        profile: profile name, parameter dict, JSON profile path or None (DEFAULT_PROFILE)
+        log_search: bool, print the CP-SAT search log
+    """
+    solver = cp_model.CpSolver()
+    for name, value in resolve_profile(profile).items():
+        if isinstance(value, (list, tuple)):
+            field = getattr(solver.parameters, name)
+            field.clear()
+            field.extend(value)
+        else:
+            setattr(solver.parameters, name, value)
+    solver.parameters.max_time_in_seconds = time_limit_seconds
+    solver.parameters.log_search_progress = log_search
+    return solver
+
+
+# When to end a search before its time limit. Either field may be None (not used).
+#   no_improvement_seconds: stop once no better solution was found for this long
+#   relative_gap: stop once |objective - bound| / max(1, |objective|) is at most this
+StopPolicy = namedtuple("StopPolicy", ["no_improvement_seconds", "relative_gap"], defaults=(None, None))
+
+
+def relative_gap(objective, bound):
+    return abs(objective - bound) / max(1.0, abs(objective))
+
+
+class StopMonitor:
+    """
+    Applies a StopPolicy to one solver.Solve call, used as a context manager around it.
+    The solution callback reports every improving solution with on_solution; the best bound
+    is followed through solver.best_bound_callback, and a watchdog thread ends the search
+    when the no-improvement window runs out, since no callback fires while the search is
+    stuck. reason is "no_improvement" or "gap" when the policy stopped the search, else None.
+    """
+
+    def __init__(self, solver, policy):
+        self.solver = solver
+        self.policy = policy
+        self.reason = None
+        self.objective = None
+        self.bound = None
+        self._last_improvement = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._watchdog = None
+
+    def __enter__(self):
+        if self.policy.relative_gap is not None:
+            self.solver.best_bound_callback = self.on_bound
+        if self.policy.no_improvement_seconds is not None:
+            self._watchdog = threading.Thread(target=self._watch, daemon=True)
+            self._watchdog.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+        if self.policy.relative_gap is not None:
+            self.solver.best_bound_callback = None
+        return False
+
+    def on_solution(self, objective, bound):
+        with self._lock:
+            self.objective = objective
+            self.bound = bound
+            self._last_improvement = time.monotonic()
+        self._check_gap()
+
+    def on_bound(self, bound):
+        with self._lock:
+            self.bound = bound
+        self._check_gap()
+
+    def _check_gap(self):
+        threshold = self.policy.relative_gap
+        if threshold is None or self.objective is None or self.bound is None:
+            return
+        if relative_gap(self.objective, self.bound) <= threshold:
+            self._stop("gap")
+
+    def _stop(self, reason):
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+        self.solver.StopSearch()
+
+    def _watch(self):
+        window = self.policy.no_improvement_seconds
+        while not self._done.wait(min(0.1, window)):
+            last = self._last_improvement
+            # The window starts with the first solution: a search still looking for one is not on a plateau
+            if last is not None and time.monotonic() - last >= window:
+                self._stop("no_improvement")
+                return
+
+
+def stop_reason(status, monitor=None):
+    """
+    Why a search ended: "optimal" or "infeasible" when the status says so, else the policy's
+    reason ("no_improvement", "gap") or "time_limit". A policy stop racing the proof of
+    optimality is reported as "optimal".
+    """
+    if status == cp_model.OPTIMAL:
+        return "optimal"
+    if status == cp_model.INFEASIBLE:
+        return "infeasible"
+    if monitor is not None and monitor.reason is not None:
+        return monitor.reason
+    return "time_limit"
+
+
+class _ImprovementCallback(cp_model.CpSolverSolutionCallback):
+    """Hands the objective and bound of every improving solution to a StopMonitor."""
+
+    def __init__(self, monitor):
+        super().__init__()
+        self.monitor = monitor
+
+    def on_solution_callback(self):
+        self.monitor.on_solution(self.ObjectiveValue(), self.BestObjectiveBound())
+
+
+def solve_with_policy(solver, model, policy=None):
+    """
+    solver.Solve(model) under a StopPolicy.
+    Returns:
+        (status, reason): the solve status and why the search ended (see stop_reason)
+    """
+    if policy is None:
+        status = solver.Solve(model)
+        return status, stop_reason(status)
+    with StopMonitor(solver, policy) as monitor:
+        status = solver.Solve(model, _ImprovementCallback(monitor))
+    return status, stop_reason(status, monitor)
+
+
+class FirstSolutionTimer(cp_model.CpSolverSolutionCallback):
+    """Records the wall time of the first solution."""
+
+    def __init__(self):
+        super().__init__()
+        self.first = None
+
+    def on_solution_callback(self):
+        if self.first is None:
+            self.first = self.WallTime()
+
+
+class SolutionStreamer(cp_model.CpSolverSolutionCallback):
+    """
+    Solution callback that hands every improving solution to a queue.
+    Args:
+        extract: function taking a value function (the callback's Value) and returning the solution
+        updates: queue.Queue receiving SolutionUpdate objects
+        monitor: optional StopMonitor told about every solution
+    """
+
+    def __init__(self, extract, updates, monitor=None):
+        super().__init__()
+        self.extract = extract
+        self.updates = updates
+        self.monitor = monitor
+        self.count = 0
+
+    def on_solution_callback(self):
+        self.count += 1
+        update = SolutionUpdate(
+            solution=self.extract(self.Value),
+            objective=self.ObjectiveValue() + 0.0,  # normalise -0.0 from maximisation models
+            bound=self.BestObjectiveBound(),
+            elapsed=self.WallTime(),
+            index=self.count,
+        )
+        self.updates.put(update)
+        if self.monitor is not None:
+            self.monitor.on_solution(update.objective, update.bound)
+
+
+def stream_solutions(solver, model, extract, policy=None):
+    """
+    Solve `model` in a background thread and yield a SolutionUpdate per improving solution.
+    Closing the generator early (break, or an exception in the caller) stops the search.
+    When the search finishes on its own, the generator returns the solve status and why
+    the search ended (status, reason = yield from stream_solutions(...)).
+    Args:
+        solver: cp_model.CpSolver, parameters already set
+        model: cp_model.CpModel
+        extract: function(value) -> solution, see SolutionStreamer
+        policy: optional StopPolicy
+    Yields:
+        SolutionUpdate
+    """
+    updates = queue.Queue()
+    monitor = StopMonitor(solver, policy) if policy is not None else None
+    streamer = SolutionStreamer(extract, updates, monitor)
+    result = {}
+
+    def run():
+        try:
+            if monitor is None:
+                result["status"] = solver.Solve(model, streamer)
+            else:
+                with monitor:
+                    result["status"] = solver.Solve(model, streamer)
+        finally:
+            updates.put(_DONE)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while True:
+            update = updates.get()
+            if update is _DONE:
+                break
+            yield update
+    finally:
+        streamer.StopSearch()
+        thread.join()
+    status = result.get("status")
+    return status, stop_reason(status, monitor)
+
+
+def explain_infeasibility(model, assumptions, time_limit_seconds=30.0):
+    """
+    Find a small set of constraint families that cannot hold together.
+
+    Every family of `model` must be enforced by its own literal (OnlyEnforceIf). The model
+    is solved once under all literals as assumptions and the core reported by
+    SufficientAssumptionsForInfeasibility is then shrunk by deletion, so the result is
+    minimal: dropping any one family from it makes the rest feasible. The deletion solves
+    fix the literals instead of assuming them, which lets presolve and the LP see the
+    enforced constraints as plain constraints.
+
+    Args:
+        model: cp_model.CpModel; an objective is ignored, each solve stops at the first solution
+        assumptions: dict family name (any hashable) -> enforcement literal
+        time_limit_seconds: limit for each individual solve
+    Returns:
+        (status_name, conflict): conflict is the list of family names, [] when the families
+        are jointly feasible, None when the solver could not decide in time
+    """
+    family_of = {lit.Index(): family for family, lit in assumptions.items()}
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit_seconds
+    solver.parameters.stop_after_first_solution = True
+
+    def solve_fixed(families):
+        trial = model.Clone()
+        trial.ClearAssumptions()
+        for family, lit in assumptions.items():
+            trial.Add(trial.GetBoolVarFromProtoIndex(lit.Index()) == int(family in families))
+        return solver.Solve(trial)
+
+    model.ClearAssumptions()
+    model.AddAssumptions(list(assumptions.values()))
+    status = solver.Solve(model)
+    model.ClearAssumptions()
+    if status == cp_model.INFEASIBLE:
+        core = [family_of[index] for index in solver.SufficientAssumptionsForInfeasibility()]
+    else:
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            status = solve_fixed(set(assumptions))
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return solver.StatusName(status), []
+        if status != cp_model.INFEASIBLE:
+            return solver.StatusName(status), None
+        core = list(assumptions)
+
+    for family in list(core):
+        trial = [f for f in core if f != family]
+        if solve_fixed(set(trial)) == cp_model.INFEASIBLE:
+            core = trial
+    return "INFEASIBLE", core
+
+
+# One stage of a lexicographic solve: optimise `expr` (maximise or minimise) within time_limit seconds.
+LexStage = namedtuple("LexStage", ["name", "expr", "maximize", "time_limit"])
+
+# Outcome of one stage: the optimised value, the stage status name, its wall time and why
+# its search ended (see stop_reason).
+StageResult = namedtuple("StageResult", ["name", "value", "status", "wall_time", "stop_reason"],
+                         defaults=(None,))
+
+
+def _start_stage(solver, model, stage):
+    if stage.maximize:
+        model.Maximize(stage.expr)
+    else:
+        model.Minimize(stage.expr)
+    solver.parameters.max_time_in_seconds = stage.time_limit
+
+
+def _finish_stage(solver, model, stage, status, reason):
+    """Keep the stage's value for the next stages and hint the next stage with the current solution."""
+    value = solver.Value(stage.expr)
+    if status == cp_model.OPTIMAL:
+        model.Add(stage.expr == value)
+    elif stage.maximize:
+        model.Add(stage.expr >= value)
+    else:
+        model.Add(stage.expr <= value)
+    model.ClearHints()
+    for index in range(len(model.Proto().variables)):
+        var = model.GetIntVarFromProtoIndex(index)
+        model.AddHint(var, solver.Value(var))
+    return StageResult(stage.name, value, solver.StatusName(status), solver.WallTime(), reason)
+
+
+def solve_lexicographic(solver, model, stages, extract, policy=None):
+    """
+    Optimise the stages in priority order. After each stage its objective value is fixed
+    (kept at least as good when the stage was not proved optimal) and the solution becomes
+    the hint of the next stage.
+    Args:
+        solver: cp_model.CpSolver, parameters already set (the time limit is set per stage)
+        model: cp_model.CpModel, modified in place
+        stages: list of LexStage
+        extract: function(value) -> solution
+        policy: optional StopPolicy applied to every stage
+    Returns:
+        (status, results, solution): status of the last stage run, a StageResult per stage
+        that found a solution, and the solution of the last such stage (None if none did)
+    """
+    results, solution = [], None
+    status = cp_model.UNKNOWN
+    for stage in stages:
+        _start_stage(solver, model, stage)
+        status, reason = solve_with_policy(solver, model, policy)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            break
+        solution = extract(solver.Value)
+        results.append(_finish_stage(solver, model, stage, status, reason))
+    return status, results, solution
+
+
+def stream_lexicographic(solver, model, stages, extract, policy=None):
+    """
+    Streaming variant of solve_lexicographic: yields the SolutionUpdates of every stage in turn.
+    Returns (status, results) like solve_lexicographic once the last stage finishes.
+    """
+    results = []
+    status = cp_model.UNKNOWN
+    for stage in stages:
+        _start_stage(solver, model, stage)
+        status, reason = yield from stream_solutions(solver, model, extract, policy)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            break
+        results.append(_finish_stage(solver, model, stage, status, reason))
+    return status, results
+
+
+def solve_diverse(solver, model, decision_vars, extract, count, min_distance, objective=None):
+    """
+    Enumerate up to `count` solutions of one model that differ pairwise in at least
+    `min_distance` assignments. After each solution a no-good cut is added to the same
+    model: at least min_distance of the decision variables that were true must become false.
+    Only the first solution is optimised. The model's objective is then dropped, so every
+    further alternative stops at its first feasible solution; with `objective` it is bound
+    to be at least as good as the first solution's value. The later alternatives are thus
+    never worse than the first, at the cost of fewer alternatives when no other solution
+    reaches that value.
+    Args:
+        solver: cp_model.CpSolver, parameters already set (the time limit applies per solution)
+        model: cp_model.CpModel, modified in place
+        decision_vars: BoolVars whose true set identifies a solution (one per assignment)
+        extract: function(value) -> solution
+        count: number of solutions wanted
+        min_distance: minimum number of assignments in which two solutions differ
+        objective: optional (expression, maximize) of the model's objective
+    Returns:
+        list of solutions, shorter than count when no further distinct solution exists
+        or the solver runs out of time
+    """
+    solutions = []
+    while len(solutions) < count:
+        status = solver.Solve(model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            break
+        solutions.append(extract(solver.Value))
+        if len(solutions) == 1 and model.HasObjective():
+            if objective is not None:
+                expr, maximize = objective
+                value = solver.Value(expr)
+                model.Add(expr >= value if maximize else expr <= value)
+            model.ClearObjective()
+        chosen = [var for var in decision_vars if solver.Value(var)]
+        model.Add(sum(chosen) <= len(chosen) - min_distance)
+    return solutions
@@ -0,0 +1,24 @@
+from doctor_data import DOCTOR_DATA
+from month_calendar import get_month_calendar
+from batch import month_range, scale_quotas
+
+
+def test_month_range_crosses_the_year():
+    assert month_range("2025-11", "2026-02") == [(2025, 11), (2025, 12), (2026, 1), (2026, 2)]
+    assert month_range("2026-04", "2026-04") == [(2026, 4)]
+    assert month_range("2026-05", "2026-04") == []
+
+
+def test_scale_quotas_fill_the_other_month():
+    for year, month in month_range("2026-01", "2026-12"):
+        calendar = get_month_calendar(year, month)
+        scaled = scale_quotas(DOCTOR_DATA, calendar)
+        assert set(scaled) == {doc for doc, data in DOCTOR_DATA.items() if data}
+        for period, days in (("weekday", calendar.weekday_days), ("weekend", calendar.weekend_days)):
+            for shift in ("ER", "ward"):
+                assert sum(scaled[doc][period][shift] for doc in scaled) == len(days)
+
+
+def test_scale_quotas_keep_the_shares():
+    march = get_month_calendar(2026, 3)
+    assert scale_quotas(DOCTOR_DATA, march) == {doc: data for doc, data in DOCTOR_DATA.items() if data}
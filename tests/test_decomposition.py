@@ -0,0 +1,64 @@
+import datetime
+import random
+from month_calendar import get_month_calendar
+from decomposition import week_blocks, split_quota, fits_carry_in, reconcile_month, RealShiftMonth
+import real_shift
+
+APRIL = get_month_calendar(2026, 4)
+
+
+def test_week_blocks_cover_the_month_once():
+    calendar = get_month_calendar(2026, 3)
+    blocks = week_blocks(calendar, block_days=7, overlap=2)
+    assert [(start, stop) for start, stop, _ in blocks] == [(0, 7), (7, 14), (14, 21), (21, 31)]
+    assert [solve_stop for _, _, solve_stop in blocks] == [9, 16, 23, 31]
+    # A tail of at least half a block stays a block of its own
+    assert week_blocks(APRIL, block_days=6, overlap=0) == [(0, 6, 6), (6, 12, 12), (12, 18, 18),
+                                                            (18, 24, 24), (24, 30, 30)]
+    assert week_blocks(APRIL, block_days=8, overlap=0)[-1] == (24, 30, 30)
+
+
+def test_split_quota_shares_add_up_to_the_block():
+    rng = random.Random(0)
+    for _ in range(200):
+        remaining = {f"doctor-{k}": rng.randint(0, 12) for k in range(rng.randint(1, 8))}
+        remaining_slots = sum(remaining.values())
+        if remaining_slots == 0:
+            continue
+        block_slots = rng.randint(0, remaining_slots)
+        shares = split_quota(remaining, block_slots, remaining_slots)
+        assert sum(shares.values()) == block_slots
+        assert all(0 <= shares[doc] <= remaining[doc] for doc in remaining)
+
+
+def test_split_quota_edge_cases():
+    assert split_quota({"a": -2, "b": 4}, 2, 4) == {"a": 0, "b": 2}
+    assert split_quota({"a": 3, "b": 1}, 0, 4) == {"a": 0, "b": 0}
+    assert split_quota({"a": 3, "b": 1}, 4, 0) == {"a": 0, "b": 0}
+
+
+def _april_month():
+    return RealShiftMonth(2026, 4, real_shift.doctor_data, real_shift.date_doubles, real_shift.doctor_date_off,
+                          real_shift.pinned, real_shift.no_shift)
+
+
+def test_reconcile_month_fixes_a_broken_boundary():
+    spec = _april_month()
+    schedule, _ = real_shift.generate_real_schedule(2026, 4, real_shift.doctor_data, real_shift.date_doubles,
+                                                    doctor_date_off=real_shift.doctor_date_off,
+                                                    time_limit_seconds=30)
+    first = APRIL.days[0]
+    assert fits_carry_in(spec, schedule, {})
+    # The April 1 ward doctor also worked ward on March 31: no ward on consecutive days is broken.
+    # พัชรพร, off on April 1-6, takes the carried-in ER shift.
+    doc = schedule[first]["ward"]
+    assert doc != "พัชรพร"
+    carry_in = {first - datetime.timedelta(days=1): {"ER": "พัชรพร", "ward": doc}}
+    assert not fits_carry_in(spec, schedule, carry_in)
+
+    fixed = reconcile_month(spec, schedule, carry_in, time_limit_seconds=30)
+    assert fixed is not None
+    assert fixed[first]["ward"] != doc
+    assert fits_carry_in(spec, fixed, carry_in)
+    changed = sum(fixed[d][shift] != schedule[d][shift] for d in APRIL.days for shift in ("ER", "ward"))
+    assert changed < len(APRIL.days)
@@ -0,0 +1,44 @@
+import datetime
+from ortools.sat.python import cp_model
+from doctor_data import DOCTOR_DATA
+import schedule_ortools
+import real_shift
+from solver_tools import explain_infeasibility
+
+
+def _fail_diagnosis(*args, **kwargs):
+    raise AssertionError("diagnosis must only run after an INFEASIBLE proof")
+
+
+def test_no_diagnosis_after_a_time_limit(monkeypatch):
+    monkeypatch.setattr(schedule_ortools, "solve_with_policy", lambda solver, model, policy: (cp_model.UNKNOWN, "time limit"))
+    monkeypatch.setattr(schedule_ortools, "diagnose_schedule_ortools", _fail_diagnosis)
+    assert schedule_ortools.generate_schedule_ortools(2026, 3, DOCTOR_DATA, time_limit_seconds=1) == {}
+
+
+def test_diagnosis_after_infeasible(monkeypatch):
+    calls = []
+    monkeypatch.setattr(schedule_ortools, "solve_with_policy", lambda solver, model, policy: (cp_model.INFEASIBLE, "done"))
+    monkeypatch.setattr(schedule_ortools, "diagnose_schedule_ortools", lambda *args, **kwargs: calls.append(args))
+    assert schedule_ortools.generate_schedule_ortools(2026, 3, DOCTOR_DATA, time_limit_seconds=1) == {}
+    assert len(calls) == 1
+
+
+def test_pin_on_a_day_off_explains_as_a_minimal_core():
+    pinned = {**real_shift.pinned, datetime.date(2026, 4, 23): "ธนัท"}
+    assert datetime.date(2026, 4, 23) in real_shift.doctor_date_off["ธนัท"]
+    conflict = real_shift.diagnose_real_schedule(2026, 4, real_shift.doctor_data, real_shift.date_doubles,
+                                                 doctor_date_off=real_shift.doctor_date_off, pinned=pinned)
+    assert conflict == ["days_off", "pinned"]
+
+
+def test_explain_infeasibility_returns_a_minimal_core():
+    model = cp_model.CpModel()
+    x = model.NewBoolVar("x")
+    literals = {name: model.NewBoolVar(name) for name in ("a", "b", "c")}
+    model.Add(x == 1).OnlyEnforceIf(literals["a"])
+    model.Add(x == 0).OnlyEnforceIf(literals["b"])
+    model.Add(x == 0).OnlyEnforceIf(literals["c"])
+    status, core = explain_infeasibility(model, literals, 10)
+    assert status == "INFEASIBLE"
+    assert sorted(core) in (["a", "b"], ["a", "c"])
@@ -0,0 +1,113 @@
+import copy
+import datetime
+import pytest
+from doctor_data import DOCTOR_DATA, DOCTOR_AUTOPSY_DATA, SHIFT_TIMES, adjust_doctor_data
+from month_calendar import get_month_calendar
+from feasibility import check_schedule_inputs, check_real_shift_inputs
+import real_shift
+
+MARCH = get_month_calendar(2026, 3)
+APRIL = get_month_calendar(real_shift.Year, real_shift.Month)
+
+
+def _checks(issues):
+    return {issue.check for issue in issues}
+
+
+def _schedule_issues(change=None, autopsy_data=DOCTOR_AUTOPSY_DATA):
+    doctor_data = adjust_doctor_data(DOCTOR_DATA)
+    if change:
+        change(doctor_data)
+    return check_schedule_inputs(MARCH, doctor_data, autopsy_data)
+
+
+def _real_issues(doctor_data=None, **changes):
+    inputs = dict(doctor_date_off=real_shift.doctor_date_off, pinned=real_shift.pinned, no_shift=real_shift.no_shift)
+    inputs.update(changes)
+    return check_real_shift_inputs(APRIL, doctor_data or real_shift.doctor_data, real_shift.date_doubles, **inputs)
+
+
+def _first_doctor(doctor_data):
+    return next(doc for doc, data in doctor_data.items() if data)
+
+
+def test_shipped_inputs_pass():
+    assert _schedule_issues() == []
+    assert _real_issues() == []
+
+
+def test_schedule_quota_sum():
+    def bump(data):
+        data[_first_doctor(data)]["weekday"]["ER"] += 1
+    assert "quota_sum" in _checks(_schedule_issues(bump))
+
+
+def test_schedule_day_coverage():
+    # Every doctor has an autopsy at the same evening, so nobody can take its slots
+    evening = (datetime.date(2026, 3, 2), SHIFT_TIMES["EVENING"])
+    autopsy_data = {doc: [evening] for doc, data in DOCTOR_DATA.items() if data}
+    issues = _schedule_issues(autopsy_data=autopsy_data)
+    assert any(issue.check == "day_coverage" and issue.date == evening[0] for issue in issues)
+
+
+def test_schedule_doctor_capacity():
+    def overload(data):
+        data[_first_doctor(data)]["weekend"]["ER"] = 10 * len(MARCH.weekend_days)
+    assert "doctor_capacity" in _checks(_schedule_issues(overload))
+
+
+def test_schedule_rest_bound():
+    def overload(data):
+        data[_first_doctor(data)]["weekday"]["ER"] = len(MARCH.weekday_days) + 1
+    issues = _schedule_issues(overload)
+    assert any(issue.check == "rest_bound" and issue.doctor == _first_doctor(DOCTOR_DATA) for issue in issues)
+
+
+def _real_data(doc, period, shift, quota):
+    doctor_data = copy.deepcopy(real_shift.doctor_data)
+    doctor_data[doc][period][shift] = quota
+    return doctor_data
+
+
+def test_real_quota_sum():
+    assert "quota_sum" in _checks(_real_issues(_real_data("ฤชุกร", "weekday", "ER", 4)))
+
+
+def test_real_day_coverage():
+    day = datetime.date(2026, 4, 8)
+    off = {doc: [day] for doc in real_shift.doctor_data}
+    issues = _real_issues(doctor_date_off=off)
+    assert any(issue.check == "day_coverage" and issue.date == day for issue in issues)
+
+
+def test_real_doctor_capacity():
+    issues = _real_issues(_real_data("ฤชุกร", "weekend", "ER", len(APRIL.weekend_days) + 1))
+    assert any(issue.check == "doctor_capacity" and issue.doctor == "ฤชุกร" for issue in issues)
+
+
+def test_real_rest_bound():
+    # One ER in any 3 days allows at most 10 ER shifts in 30 days
+    issues = _real_issues(_real_data("ฤชุกร", "weekday", "ER", 11), doctor_date_off={})
+    assert any(issue.check == "rest_bound" and issue.doctor == "ฤชุกร" for issue in issues)
+
+
+@pytest.mark.parametrize("pin", [
+    (datetime.date(2026, 4, 23), "ธนัท"),            # day off
+    (datetime.date(2026, 5, 1), "ธนัท"),             # outside the month
+    (datetime.date(2026, 4, 8), "nobody"),           # not on the roster
+])
+def test_real_pinned(pin):
+    issues = _real_issues(pinned=dict([pin]))
+    assert any(issue.check == "pinned" and issue.date == pin[0] for issue in issues)
+
+
+def test_real_pinned_against_no_shift():
+    issues = _real_issues(pinned={datetime.date(2026, 4, 8): "ฤชุกร"}, doctor_date_off={},
+                          no_shift=[(8, "ฤชุกร", "ER"), (8, "ฤชุกร", "ward")])
+    assert any(issue.check == "pinned" for issue in issues)
+
+
+@pytest.mark.parametrize("row", [(3, "nobody", "ER"), (31, "ธนัท", "ER"), (3, "ธนัท", "night")])
+def test_real_malformed_no_shift(row):
+    issues = _real_issues(no_shift=[row])
+    assert _checks(issues) == {"no_shift"}
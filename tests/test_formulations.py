@@ -0,0 +1,76 @@
+from ortools.sat.python import cp_model
+from doctor_data import DOCTOR_DATA, adjust_doctor_data
+from month_calendar import get_month_calendar
+from constraints import ConstraintChecker
+from schedule_ortools import build_schedule_model, FORMULATIONS
+from real_shift import build_real_model, real_shift_stages, ENCODINGS
+from solver_tools import make_solver, solve_lexicographic
+import real_shift
+
+# The alternative encodings must accept the same schedules: each one reaches the same
+# optimum on a fixed month, and the schedule found with one is feasible in the other.
+
+
+def _solve_schedule(formulation):
+    calendar = get_month_calendar(2026, 3)
+    sm = build_schedule_model(calendar, adjust_doctor_data(DOCTOR_DATA), formulation=formulation)
+    solver = make_solver(60)
+    assert solver.Solve(sm.model) == cp_model.OPTIMAL
+    return sm, solver.ObjectiveValue(), sm.extract_schedule(solver.Value)
+
+
+def _fits_schedule_model(sm, schedule):
+    doctor_index = {doc: i for i, doc in enumerate(sm.doctors)}
+    for s, (date, shift_type, shift_time, _) in enumerate(sm.slots):
+        doc = next(doc for stype, stime, doc in schedule[date] if (stype, stime) == (shift_type, shift_time))
+        var = sm.x[s][doctor_index[doc]]
+        if var is None:
+            return False
+        sm.model.Add(var == 1)
+    solver = make_solver(30)
+    solver.parameters.stop_after_first_solution = True
+    return solver.Solve(sm.model) in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+
+def test_boolean_and_interval_formulations_agree():
+    solved = {formulation: _solve_schedule(formulation) for formulation in FORMULATIONS}
+    assert len({objective for _, objective, _ in solved.values()}) == 1
+    calendar = get_month_calendar(2026, 3)
+    for formulation, (sm, _, schedule) in solved.items():
+        assert ConstraintChecker(calendar, sm.doctors).find_violations(schedule) == []
+        for other in FORMULATIONS:
+            if other != formulation:
+                fresh = build_schedule_model(calendar, adjust_doctor_data(DOCTOR_DATA), formulation=other)
+                assert _fits_schedule_model(fresh, schedule)
+
+
+def _build_real(encoding, symmetry_breaking=True):
+    calendar = get_month_calendar(real_shift.Year, real_shift.Month)
+    return build_real_model(calendar, real_shift.doctor_data, real_shift.date_doubles,
+                            doctor_date_off=real_shift.doctor_date_off, pinned=real_shift.pinned,
+                            no_shift=real_shift.no_shift, symmetry_breaking=symmetry_breaking, encoding=encoding)
+
+
+def test_windows_and_automaton_encodings_agree():
+    solved = {}
+    for encoding in ENCODINGS:
+        rm = _build_real(encoding)
+        status, results, solution = solve_lexicographic(make_solver(60), rm.model, real_shift_stages(rm, 60),
+                                                        rm.extract_schedule)
+        assert solution is not None and all(result.status == "OPTIMAL" for result in results)
+        solved[encoding] = ([result.value for result in results], solution[0])
+    assert len({tuple(values) for values, _ in solved.values()}) == 1
+
+    for encoding, (_, schedule) in solved.items():
+        for other in ENCODINGS:
+            if other == encoding:
+                continue
+            rm = _build_real(other, symmetry_breaking=False)
+            for d, entry in schedule.items():
+                for shift, variables in (("ER", rm.er[d]), ("ward", rm.ward[d])):
+                    var = variables[rm.doctors.index(entry[shift])]
+                    assert var is not None
+                    rm.model.Add(var == 1)
+            solver = make_solver(30)
+            solver.parameters.stop_after_first_solution = True
+            assert solver.Solve(rm.model) in (cp_model.OPTIMAL, cp_model.FEASIBLE)
@@ -0,0 +1,49 @@
+from collections import Counter
+from doctor_data import DOCTOR_DATA
+from month_calendar import get_month_calendar
+from constraints import ConstraintChecker
+from scheduler import quota_mismatches
+from schedule_ortools import generate_schedule_pool_ortools
+import real_shift
+
+
+def _shift_doctors(schedule):
+    return {(date, shift_type, shift_time): doctor
+            for date, shifts in schedule.items() for shift_type, shift_time, doctor in shifts}
+
+
+def test_schedule_pool_alternatives_are_valid_and_apart():
+    calendar = get_month_calendar(2026, 3)
+    pool = generate_schedule_pool_ortools(2026, 3, DOCTOR_DATA, count=3, min_distance=10, time_limit_seconds=30,
+                                          calendar=calendar)
+    assert len(pool) == 3
+    checker = ConstraintChecker(calendar, DOCTOR_DATA)
+    for schedule in pool:
+        assert checker.find_violations(schedule) == []
+        assert quota_mismatches(schedule, DOCTOR_DATA, calendar) == []
+    shifts = [_shift_doctors(schedule) for schedule in pool]
+    for a in range(len(shifts)):
+        for b in range(a + 1, len(shifts)):
+            assert sum(shifts[a][key] != shifts[b][key] for key in shifts[a]) >= 10
+
+
+def _stage_values(schedule, calendar):
+    co_work = sum(1 for d in calendar.weekend_days
+                  if {"สุประวีณ์", "กุลพักตร์"} <= set(schedule[d].values()))
+    doubles = Counter(schedule[d]["ER"] for d in real_shift.date_doubles if d in schedule)
+    return co_work, max(doubles.values(), default=0)
+
+
+def test_real_pool_keeps_every_stage_optimum():
+    calendar = get_month_calendar(real_shift.Year, real_shift.Month)
+    best = real_shift.generate_real_schedule(real_shift.Year, real_shift.Month, real_shift.doctor_data,
+                                             real_shift.date_doubles, doctor_date_off=real_shift.doctor_date_off,
+                                             time_limit_seconds=30, calendar=calendar)
+    pool = real_shift.generate_real_schedule_pool(real_shift.Year, real_shift.Month, real_shift.doctor_data,
+                                                  real_shift.date_doubles, count=3,
+                                                  doctor_date_off=real_shift.doctor_date_off,
+                                                  time_limit_seconds=30, calendar=calendar)
+    assert pool
+    expected = _stage_values(best[0], calendar)
+    for schedule, _ in pool:
+        assert _stage_values(schedule, calendar) == expected
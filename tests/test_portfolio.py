@@ -0,0 +1,62 @@
+import random
+from doctor_data import DOCTOR_DATA
+from month_calendar import get_month_calendar
+from scheduler import _AnnealingState, quota_mismatches
+from constraints import ConstraintChecker
+import portfolio
+from portfolio import race_schedule
+
+CALENDAR = get_month_calendar(2026, 3)
+
+
+def test_per_type_annealer_meets_per_type_quotas():
+    state = _AnnealingState(2026, 3, DOCTOR_DATA, CALENDAR, per_type=True)
+    rng = random.Random(42)
+    state.random_fill(rng)
+    _, _, assign, cost = state.anneal(rng, 100000, 10.0, 0.995)
+    schedule = state.to_schedule(assign)
+    assert cost == 0
+    assert quota_mismatches(schedule, DOCTOR_DATA, CALENDAR) == []
+
+
+def test_quota_mismatches_sees_swapped_shift_types():
+    state = _AnnealingState(2026, 3, DOCTOR_DATA, CALENDAR, per_type=True)
+    state.random_fill(random.Random(0))
+    schedule = state.to_schedule()
+    # Swap the ER and ward doctors of a weekday evening: period totals stay, per-type counts do not
+    date = CALENDAR.weekday_days[0]
+    shifts = schedule[date]
+    er = next(k for k, (t, _, _) in enumerate(shifts) if t == "ER")
+    ward = next(k for k, (t, _, _) in enumerate(shifts) if t == "ward")
+    if shifts[er][2] == shifts[ward][2]:
+        return
+    shifts[er], shifts[ward] = (("ER", shifts[er][1], shifts[ward][2]), ("ward", shifts[ward][1], shifts[er][2]))
+    assert quota_mismatches(schedule, DOCTOR_DATA, CALENDAR)
+
+
+def test_annealer_win_satisfies_per_type_quotas():
+    result = race_schedule(2026, 3, DOCTOR_DATA, time_limit_seconds=30, calendar=CALENDAR)
+    assert result.winner is not None
+    if result.winner == "annealer":
+        assert quota_mismatches(result.schedule, DOCTOR_DATA, CALENDAR) == []
+        assert ConstraintChecker(CALENDAR, DOCTOR_DATA).find_violations(result.schedule) == []
+
+
+def _silent_cpsat_worker(year, month, doctor_data, calendar, time_limit_seconds, profile, events, hints):
+    events.put(("cpsat", "done", None, "UNKNOWN"))
+
+
+def _stuck_annealer_worker(year, month, doctor_data, calendar, seed, max_iter, time_limit_seconds, events):
+    state = _AnnealingState(year, month, doctor_data, calendar, per_type=True)
+    state.random_fill(random.Random(seed))
+    events.put(("annealer", "solution", dict(state.to_schedule()), max(state.cost, 1)))
+    events.put(("annealer", "done", None, "time limit, best cost 1"))
+
+
+def test_annealer_with_positive_cost_does_not_win(monkeypatch):
+    monkeypatch.setattr(portfolio, "_cpsat_worker", _silent_cpsat_worker)
+    monkeypatch.setattr(portfolio, "_annealer_worker", _stuck_annealer_worker)
+    result = race_schedule(2026, 3, DOCTOR_DATA, time_limit_seconds=5, calendar=CALENDAR)
+    assert result.reason == "exhausted"
+    assert result.winner is None
+    assert result.schedule == {}
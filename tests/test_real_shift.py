@@ -0,0 +1,99 @@
+import datetime
+import re
+import pytest
+from ortools.sat.python import cp_model
+from month_calendar import get_month_calendar, block_calendar
+import real_shift
+
+
+def test_roster_constraints_follow_the_month():
+    pinned, no_shift = real_shift.roster_constraints(2026, 4)
+    assert pinned[datetime.date(2026, 4, 10)] == "ธนัท"
+    assert (5, "ธนัท", "ER") in no_shift
+    assert real_shift.roster_constraints(2026, 5) == ({}, [])
+    assert real_shift.roster_constraints(2026, 4, pinned={}, no_shift=[]) == ({}, [])
+
+
+def test_omitted_pins_default_to_the_roster_month():
+    schedule, _ = real_shift.generate_real_schedule(real_shift.Year, real_shift.Month, real_shift.doctor_data,
+                                                    real_shift.date_doubles,
+                                                    doctor_date_off=real_shift.doctor_date_off,
+                                                    time_limit_seconds=30)
+    pinned, no_shift = real_shift.roster_constraints(real_shift.Year, real_shift.Month)
+    for d, doc in pinned.items():
+        assert doc in schedule[d].values()
+    for day, doc, shift in no_shift:
+        assert schedule[datetime.date(real_shift.Year, real_shift.Month, day)][shift] != doc
+
+
+def _forced_double(encoding, calendar, doctor, date, carry_in=None, doctor_date_off=real_shift.doctor_date_off):
+    """Status of the model with `doctor` forced onto both ER and ward on `date`."""
+    rm = real_shift.build_real_model(calendar, real_shift.doctor_data, real_shift.date_doubles,
+                                     doctor_date_off=doctor_date_off, symmetry_breaking=False,
+                                     carry_in=carry_in, soft_quotas=carry_in is not None, encoding=encoding)
+    i = rm.doctors.index(doctor)
+    rm.model.Add(rm.er[date][i] == 1)
+    rm.model.Add(rm.ward[date][i] == 1)
+    return cp_model.CpSolver().Solve(rm.model)
+
+
+@pytest.mark.parametrize("encoding", real_shift.ENCODINGS)
+def test_no_double_after_a_holiday_the_doctor_was_off(encoding):
+    # พัชรพร is off on the Apr 6 holiday, so Apr 7 still allows them one shift only (3c)
+    calendar = get_month_calendar(2026, 4)
+    assert datetime.date(2026, 4, 6) in real_shift.doctor_date_off["พัชรพร"]
+    assert _forced_double(encoding, calendar, "พัชรพร", datetime.date(2026, 4, 7)) == cp_model.INFEASIBLE
+
+
+@pytest.mark.parametrize("encoding", real_shift.ENCODINGS)
+def test_no_double_after_a_carried_in_holiday(encoding):
+    # A block starting after the Apr 6 holiday: ฤชุกร was off on the carried-in day
+    block = block_calendar(get_month_calendar(2026, 4), 6, 13)
+    carry_in = {datetime.date(2026, 4, 6): {"ER": "ธนัท", "ward": "สุประวีณ์"}}
+    assert _forced_double(encoding, block, "ฤชุกร", datetime.date(2026, 4, 7), carry_in, {}) == cp_model.INFEASIBLE
+
+
+def _published():
+    schedule, _ = real_shift.generate_real_schedule(real_shift.Year, real_shift.Month, real_shift.doctor_data,
+                                                    real_shift.date_doubles,
+                                                    doctor_date_off=real_shift.doctor_date_off,
+                                                    time_limit_seconds=30)
+    return schedule
+
+
+def _repair(published, new_off, neighbourhood_days):
+    return real_shift.repair_real_schedule(real_shift.Year, real_shift.Month, real_shift.doctor_data,
+                                           real_shift.date_doubles, published, new_off,
+                                           doctor_date_off=real_shift.doctor_date_off,
+                                           neighbourhood_days=neighbourhood_days)
+
+
+def test_repair_keeps_the_rest_and_changes_little(capsys):
+    published = _published()
+    day = datetime.date(2026, 4, 8)
+    new_off = {published[day]["ER"]: [day]}
+    capsys.readouterr()
+    schedule, _, changes = _repair(published, new_off, 0)
+    radii = [int(radius) for radius in re.findall(r"±(\d+) around", capsys.readouterr().out)]
+
+    # A single reopened day cannot keep the exact quotas, so the radius doubles until a repair exists
+    assert radii[0] == 0 and len(radii) > 1
+    assert radii[1:] == [max(1, 2 * radius) for radius in radii[:-1]]
+    final = radii[-1]
+    for d in get_month_calendar(2026, 4).days:
+        if abs((d - day).days) > final:
+            assert schedule[d] == published[d]
+    assert new_off.keys().isdisjoint({schedule[day]["ER"], schedule[day]["ward"]})
+
+    # As few changes as reopening the whole month with the same objective, and no more than
+    # a schedule solved from scratch
+    _, _, full_changes = _repair(published, new_off, len(published))
+    assert len(changes) == len(full_changes)
+    off = {doc: list(dates) for doc, dates in real_shift.doctor_date_off.items()}
+    for doc, dates in new_off.items():
+        off[doc] = off.get(doc, []) + dates
+    scratch, _ = real_shift.generate_real_schedule(real_shift.Year, real_shift.Month, real_shift.doctor_data,
+                                                   real_shift.date_doubles, doctor_date_off=off,
+                                                   time_limit_seconds=30)
+    moved = sum(scratch[d][shift] != published[d][shift] for d in published for shift in ("ER", "ward"))
+    assert 0 < len(changes) <= moved
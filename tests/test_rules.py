@@ -0,0 +1,69 @@
+import itertools
+import random
+import pytest
+from ortools.sat.python import cp_model
+import rules
+from rules import CompiledRules, SameTime, Sequence, Window, add_cpsat_rules, TIMES_PER_DAY
+from constraints import ConstraintChecker
+from month_calendar import get_month_calendar, block_calendar
+
+# ConstraintChecker and add_cpsat_rules must accept the same assignments, one rule at a time.
+# The block runs over a weekend into the month end, whose next day (Apr 1) is a weekday.
+CALENDAR = block_calendar(get_month_calendar(2026, 3), 26, 31)
+SAME_TIME = next(rule for rule in rules.SHIFT_RULES if isinstance(rule, SameTime))
+RULE_SETS = {
+    "same_time": (SAME_TIME,),
+    "sequence": (SAME_TIME,) + tuple(rule for rule in rules.SHIFT_RULES if isinstance(rule, Sequence)),
+    "window": (SAME_TIME,) + tuple(rule for rule in rules.SHIFT_RULES if isinstance(rule, Window)),
+}
+
+
+def _shift_keys(compiled):
+    """(day index, shift time, shift type) of every schedulable shift: no weekday DAY shifts."""
+    return [(day, t, shift_type)
+            for day in range(len(CALENDAR.days)) for t in range(TIMES_PER_DAY) for shift_type in (0, 1)
+            if not compiled.implicit[compiled.position(day, t)]]
+
+
+def _checker_accepts(compiled, assigned):
+    checker = ConstraintChecker(CALENDAR, ["doc"], autopsy_data={})
+    checker.rules = compiled
+    for day, t, shift_type in assigned:
+        checker.add(0, day + 1, shift_type, t)
+    return not any(checker.violates_at(0, day + 1, shift_type, t) for day, t, shift_type in assigned)
+
+
+def _cpsat_accepts(compiled, keys, assigned):
+    model = cp_model.CpModel()
+    time_vars = [[[[]] for _ in range(TIMES_PER_DAY)] for _ in CALENDAR.days]
+    for key in keys:
+        day, t, _ = key
+        var = model.NewBoolVar(str(key))
+        time_vars[day][t][0].append(var)
+        model.Add(var == int(key in assigned))
+    add_cpsat_rules(compiled, model, time_vars, lambda family: [])
+    return cp_model.CpSolver().Solve(model) == cp_model.OPTIMAL
+
+
+@pytest.mark.parametrize("rule_set", RULE_SETS)
+def test_checker_and_cpsat_agree_rule_by_rule(monkeypatch, rule_set):
+    monkeypatch.setattr(rules, "SHIFT_RULES", RULE_SETS[rule_set])
+    compiled = CompiledRules(CALENDAR.days, CALENDAR.holidays)
+    keys = _shift_keys(compiled)
+    rng = random.Random(rule_set)
+    samples = [set(rng.sample(keys, rng.randint(1, 6))) for _ in range(300)]
+    # Every pair of shifts as well, so each placement of the rule is hit on its own
+    samples += [set(pair) for pair in itertools.combinations(keys, 2)]
+    verdicts = {_checker_accepts(compiled, assigned) for assigned in samples}
+    assert verdicts == {True, False}
+    for assigned in samples:
+        assert _checker_accepts(compiled, assigned) == _cpsat_accepts(compiled, keys, assigned), sorted(assigned)
+
+
+def test_month_end_window_reaches_a_weekday_next_month():
+    compiled = CompiledRules(CALENDAR.days, CALENDAR.holidays)
+    last = len(CALENDAR.days) - 1
+    assert compiled.implicit[compiled.position(last + 1, rules.DAY)]
+    assert not _checker_accepts(compiled, {(last, rules.EVENING, 0), (last, rules.NIGHT, 1)})
+    keys = _shift_keys(compiled)
+    assert not _cpsat_accepts(compiled, keys, {(last, rules.EVENING, 0), (last, rules.NIGHT, 1)})
@@ -0,0 +1,21 @@
+import pytest
+from solver_tools import SOLVER_PROFILES, resolve_profile, save_profile
+
+
+def test_resolve_profile_by_name_file_or_dict(tmp_path):
+    assert resolve_profile("balanced") == SOLVER_PROFILES["balanced"]
+    assert resolve_profile({"num_workers": 1}) == {"num_workers": 1}
+    path = tmp_path / "tuned"
+    save_profile(path, {"num_workers": 4})
+    assert resolve_profile(str(path)) == {"num_workers": 4}
+
+
+def test_resolve_profile_rejects_unknown_names_and_files(tmp_path):
+    with pytest.raises(ValueError, match="Unknown solver profile 'fastest'"):
+        resolve_profile("fastest")
+    with pytest.raises(ValueError, match="Unknown solver profile"):
+        resolve_profile(str(tmp_path / "missing.json"))
+    not_a_profile = tmp_path / "other.json"
+    not_a_profile.write_text("[1, 2]", encoding="utf-8")
+    with pytest.raises(ValueError, match="not a solver profile file"):
+        resolve_profile(str(not_a_profile))
@@ -0,0 +1,39 @@
+import datetime
+import pytest
+from doctor_data import DOCTOR_DATA, SHIFT_TIMES
+from month_calendar import get_month_calendar
+import real_shift
+from whatif import RealShiftSession, ScheduleSession
+
+
+def _real_session():
+    calendar = get_month_calendar(real_shift.Year, real_shift.Month)
+    return RealShiftSession(calendar, real_shift.doctor_data, real_shift.date_doubles,
+                            doctor_date_off=real_shift.doctor_date_off, pinned=real_shift.pinned,
+                            no_shift=real_shift.no_shift, time_limit_seconds=10)
+
+
+def test_real_session_rejects_entries_outside_the_month():
+    session = _real_session()
+    outside = ("pin", datetime.date(real_shift.Year, real_shift.Month + 1, 1), "ธนัท")
+    with pytest.raises(ValueError, match="is not a day of"):
+        session.what_if(add=[outside])
+    with pytest.raises(ValueError, match="unknown doctor"):
+        session.commit(add=[("off", "nobody", datetime.date(real_shift.Year, real_shift.Month, 1))])
+    assert outside not in session.active
+    assert session.solve().solution is not None
+
+
+def test_real_session_rejects_no_shift_day_outside_the_month():
+    calendar = get_month_calendar(2026, 4)
+    with pytest.raises(ValueError, match="day 31"):
+        RealShiftSession(calendar, real_shift.doctor_data, real_shift.date_doubles, no_shift=[(31, "ธนัท", "ER")])
+
+
+def test_schedule_session_rejects_bad_autopsy():
+    session = ScheduleSession(get_month_calendar(2026, 3), DOCTOR_DATA, time_limit_seconds=10)
+    doc = session.doctors[0]
+    with pytest.raises(ValueError, match="is not a day of"):
+        session.what_if(add=[("autopsy", doc, datetime.date(2026, 4, 2), SHIFT_TIMES["DAY"])])
+    with pytest.raises(ValueError, match="shift time"):
+        session.what_if(add=[("autopsy", doc, datetime.date(2026, 3, 2), "noon")])
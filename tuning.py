@@ -0,0 +1,265 @@
+import argparse
+import itertools
+import random
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from ortools.sat.python import cp_model
+from doctor_data import DOCTOR_DATA, DOCTOR_AUTOPSY_DATA, adjust_doctor_data
+from month_calendar import get_month_calendar
+from schedule_ortools import build_schedule_model
+import real_shift
+from solver_tools import make_solver, resolve_profile, save_profile, FirstSolutionTimer
+
+# Parameter tuning harness. Every (configuration, instance) pair is one trial, solved in
+# its own process on a freshly built model; a trial records when the first solution was
+# found and when optimality was proved. The configuration with the most instances proved
+# optimal, then the lowest total time to optimal, then the lowest total time to first
+# solution, is written as a JSON profile that --profile / profile= can load.
+
+# One stored month instance. kind is "schedule" (schedule_ortools month model) or
+# "real_shift"; data holds the keyword inputs of the matching model builder.
+TuningInstance = namedtuple("TuningInstance", ["name", "kind", "year", "month", "data"])
+
+# Outcome of one trial.
+#   first_solution: seconds until the first solution, None when none was found
+#   optimal: seconds until optimality was proved, None when it was not
+TrialResult = namedtuple("TrialResult", ["config", "instance", "status", "objective",
+                                         "first_solution", "optimal", "wall_time"])
+
+# Parameters searched by default, laid over the base profile. num_workers is kept low
+# because several trials run side by side.
+TUNING_GRID = {
+    "num_workers": [4, 8],
+    "linearization_level": [0, 1, 2],
+    "cp_model_probing_level": [0, 2],
+    "symmetry_level": [0, 2],
+}
+
+
+def march_instance():
+    """The March DOCTOR_DATA / DOCTOR_AUTOPSY_DATA case solved by main.py."""
+    return TuningInstance("march", "schedule", 2026, 3,
+                          {"doctor_data": DOCTOR_DATA, "autopsy_data": DOCTOR_AUTOPSY_DATA})
+
+
+def april_instance():
+    """The April roster configured at the top of real_shift.py."""
+    return TuningInstance("april", "real_shift", real_shift.Year, real_shift.Month, {
+        "doctor_data": real_shift.doctor_data,
+        "date_doubles": real_shift.date_doubles,
+        "doctor_date_off": real_shift.doctor_date_off,
+        "pinned": real_shift.pinned,
+        "no_shift": real_shift.no_shift,
+    })
+
+
+def _spread(total, doctors, offset):
+    """Split `total` shifts over the doctors as evenly as possible, the extras starting at `offset`."""
+    base, extra = divmod(total, len(doctors))
+    return {doc: base + ((k - offset) % len(doctors) < extra) for k, doc in enumerate(doctors)}
+
+
+def balanced_quotas(calendar, doctors, rng):
+    """
+    Quotas with one shift per day and shift type of each period spread over the doctors.
+    For the schedule model these are raw quotas: adjust_doctor_data doubles weekday ER and
+    triples weekend shifts, matching its 2 weekday ER, 1 weekday ward and 3 + 3 weekend slots.
+    """
+    counts = {
+        (period, shift): _spread(len(days), doctors, rng.randrange(len(doctors)))
+        for period, days in (("weekday", calendar.weekday_days), ("weekend", calendar.weekend_days))
+        for shift in ("ER", "ward")
+    }
+    return {
+        doc: {period: {shift: counts[(period, shift)][doc] for shift in ("ER", "ward")}
+              for period in ("weekday", "weekend")}
+        for doc in doctors
+    }
+
+
+def synthetic_instances(count=2, seed=0, year=2026):
+    """
+    Generated months with balanced quotas, alternating between the two models.
+    Schedule instances use the DOCTOR_DATA doctors without autopsies; real_shift instances use
+    the real_shift doctors, Fridays as double days and one random 3-day block off per doctor.
+    Quotas always add up to the month's slots, but the days off can still make an instance
+    infeasible; such trials simply report INFEASIBLE.
+    """
+    rng = random.Random(seed)
+    instances = []
+    for k in range(count):
+        month = rng.randint(1, 12)
+        calendar = get_month_calendar(year, month)
+        if k % 2 == 0:
+            doctors = [doc for doc, data in DOCTOR_DATA.items() if data]
+            doctor_data = balanced_quotas(calendar, doctors, rng)
+            instances.append(TuningInstance(f"synthetic-{k + 1}", "schedule", year, month,
+                                            {"doctor_data": doctor_data, "autopsy_data": {}}))
+        else:
+            doctors = list(real_shift.doctor_data)
+            doctor_data = balanced_quotas(calendar, doctors, rng)
+            date_doubles = [d for d in calendar.weekday_days if d.weekday() == 4]
+            doctor_date_off = {}
+            for doc in doctors:
+                start = rng.randrange(len(calendar.days) - 2)
+                doctor_date_off[doc] = calendar.days[start:start + 3]
+            instances.append(TuningInstance(f"synthetic-{k + 1}", "real_shift", year, month, {
+                "doctor_data": doctor_data,
+                "date_doubles": date_doubles,
+                "doctor_date_off": doctor_date_off,
+            }))
+    return instances
+
+
+def _build_instance_model(instance):
+    """CpModel of an instance with a single objective."""
+    calendar = get_month_calendar(instance.year, instance.month)
+    data = instance.data
+    if instance.kind == "schedule":
+        sm = build_schedule_model(calendar, adjust_doctor_data(data["doctor_data"]),
+                                  autopsy_data=data.get("autopsy_data"))
+        return sm.model
+    # The two lexicographic real_shift objectives combined with weights that keep their
+    # priority, as in whatif.RealShiftSession, so that one solve times the whole search
+    rm = real_shift.build_real_model(calendar, data["doctor_data"], data["date_doubles"],
+                                     doctor_date_off=data.get("doctor_date_off"), pinned=data.get("pinned"),
+                                     no_shift=data.get("no_shift"))
+    double_weight = len(data["date_doubles"]) + 1
+    rm.model.Maximize(double_weight * rm.co_work_count - rm.max_double)
+    return rm.model
+
+
+def run_trial(config_index, parameters, instance, time_limit_seconds):
+    """
+    Solve one instance with one parameter dict.
+    Returns:
+        TrialResult
+    """
+    model = _build_instance_model(instance)
+    solver = make_solver(time_limit_seconds, parameters)
+    timer = FirstSolutionTimer()
+    status = solver.Solve(model, timer)
+    found = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return TrialResult(
+        config=config_index,
+        instance=instance.name,
+        status=solver.StatusName(status),
+        objective=solver.ObjectiveValue() + 0.0 if found else None,
+        first_solution=timer.first,
+        optimal=solver.WallTime() if status == cp_model.OPTIMAL else None,
+        wall_time=solver.WallTime(),
+    )
+
+
+def _run_trial(args):
+    return run_trial(*args)
+
+
+def grid_configs(grid=None):
+    """Every combination of the grid values, as parameter dicts."""
+    grid = grid or TUNING_GRID
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def random_configs(samples, grid=None, seed=0):
+    """`samples` distinct combinations drawn at random from the grid (fewer if the grid is smaller)."""
+    configs = grid_configs(grid)
+    return random.Random(seed).sample(configs, min(samples, len(configs)))
+
+
+def score_config(trials, time_limit_seconds):
+    """
+    Sort key of a configuration from its trials, lower is better: most instances proved
+    optimal, then total time to optimal, then total time to first solution. A missing
+    time counts as the full time limit.
+    """
+    proved = sum(1 for trial in trials if trial.optimal is not None)
+    to_optimal = sum(time_limit_seconds if trial.optimal is None else trial.optimal for trial in trials)
+    to_first = sum(time_limit_seconds if trial.first_solution is None else trial.first_solution
+                   for trial in trials)
+    return (-proved, to_optimal, to_first)
+
+
+def tune_parameters(instances, configs, time_limit_seconds=30, processes=2, base_profile=None):
+    """
+    Run every configuration on every instance in parallel processes.
+    Args:
+        instances: list of TuningInstance
+        configs: list of parameter dicts, each laid over the base profile
+        time_limit_seconds: limit of each trial
+        processes: number of trials solved at the same time
+        base_profile: profile the configurations start from (DEFAULT_PROFILE when omitted)
+    Returns:
+        ranking: list of (parameters, trials) pairs, best first; parameters include the base profile
+    """
+    base = resolve_profile(base_profile)
+    parameters = [{**base, **config} for config in configs]
+    jobs = [(k, params, instance, time_limit_seconds)
+            for k, params in enumerate(parameters) for instance in instances]
+    print(f"[Tuning] {len(configs)} configurations x {len(instances)} instances, "
+          f"{processes} processes, {time_limit_seconds}s per trial")
+    trials = [[] for _ in parameters]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for trial in pool.map(_run_trial, jobs):
+            trials[trial.config].append(trial)
+    order = sorted(range(len(parameters)), key=lambda k: score_config(trials[k], time_limit_seconds))
+    return [(parameters[k], trials[k]) for k in order]
+
+
+def format_time(seconds):
+    """Seconds as printed in the rankings, "-" when the event never happened."""
+    return "-" if seconds is None else f"{seconds:.2f}s"
+
+
+def print_ranking(ranking, configs_shown=None):
+    """Print time to first solution / time to optimal per configuration and instance."""
+    for rank, (parameters, trials) in enumerate(ranking[:configs_shown], 1):
+        searched = ", ".join(f"{name}={parameters[name]}" for name in TUNING_GRID if name in parameters)
+        print(f"#{rank} {searched}")
+        for trial in trials:
+            print(f"    {trial.instance:<12} {trial.status:<10} first {format_time(trial.first_solution):>8}  "
+                  f"optimal {format_time(trial.optimal):>8}")
+
+
+INSTANCE_SETS = {
+    "march": lambda args: [march_instance()],
+    "april": lambda args: [april_instance()],
+    "synthetic": lambda args: synthetic_instances(args.synthetic, seed=args.seed),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune CP-SAT parameters over stored month instances")
+    parser.add_argument("--instances", nargs="+", choices=list(INSTANCE_SETS), default=list(INSTANCE_SETS),
+                        help="Instance sets to run (default: all)")
+    parser.add_argument("--synthetic", type=int, default=2, metavar="N",
+                        help="Number of synthetic instances (default: 2)")
+    parser.add_argument("--search", choices=["grid", "random"], default="grid",
+                        help="Try every grid combination or a random sample (default: grid)")
+    parser.add_argument("--samples", type=int, default=8, metavar="N",
+                        help="Configurations tried by --search random (default: 8)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random choices (default: 0)")
+    parser.add_argument("--time-limit", type=float, default=30, metavar="SECONDS",
+                        help="Time limit of each trial (default: 30)")
+    parser.add_argument("--processes", type=int, default=2, help="Trials run in parallel (default: 2)")
+    parser.add_argument("--base-profile", default=None, metavar="NAME|FILE",
+                        help="Profile the searched parameters are laid over (default: balanced)")
+    parser.add_argument("-o", "--output", default="tuned_profile.json", metavar="FILE",
+                        help="Where to save the best configuration (default: tuned_profile.json)")
+    args = parser.parse_args()
+
+    instances = [instance for name in args.instances for instance in INSTANCE_SETS[name](args)]
+    if args.search == "grid":
+        configs = grid_configs()
+    else:
+        configs = random_configs(args.samples, seed=args.seed)
+    ranking = tune_parameters(instances, configs, time_limit_seconds=args.time_limit,
+                              processes=args.processes, base_profile=args.base_profile)
+    print_ranking(ranking, configs_shown=5)
+    best, trials = ranking[0]
+    save_profile(args.output, best, name="tuned",
+                 instances=[instance.name for instance in instances],
+                 time_limit_seconds=args.time_limit,
+                 trials=[trial._asdict() for trial in trials])
+    print(f"[Tuning] Best configuration saved to {args.output} (use --profile {args.output})")
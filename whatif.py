@@ -0,0 +1,255 @@
+import datetime
+from collections import namedtuple
+from ortools.sat.python import cp_model
+from doctor_data import DOCTOR_AUTOPSY_DATA, adjust_doctor_data
+from constraints import SHIFT_TIME_INDEX
+from eligibility import autopsy_blocked_times
+from month_calendar import get_month_calendar
+from schedule_ortools import build_schedule_model
+from real_shift import build_real_model
+from solver_tools import explain_infeasibility, make_solver
+
+# Interactive what-if sessions. The model is built once with every roster entry that a
+# scheduler may want to change (day off, pin, no_shift row, autopsy) expressed as its own
+# enforcement literal. A query only changes which literals are passed as assumptions, and
+# the previous solution is used as the hint, so answering it is a warm re-solve of the
+# same model instead of a rebuild.
+
+# Outcome of one query.
+#   status: solver status name
+#   solution: what the model's extract function returns, None when there is no solution
+#   objective: objective value, None when there is no solution
+#   conflicts: a minimal set of roster entries that cannot hold together when the query is infeasible
+#   wall_time: seconds spent in the solver
+WhatIfResult = namedtuple("WhatIfResult", ["status", "solution", "objective", "conflicts", "wall_time"])
+
+
+class _WhatIfSession:
+    """
+    Shared solve loop. Subclasses build self.model, define self.extract(value) and
+    implement _check_entry(entry) to reject a malformed roster entry and
+    _add_entry(entry, literal) to post the constraints of a valid one.
+    Entries are hashable tuples; self.active is the set currently in force.
+    """
+
+    def __init__(self, time_limit_seconds=10, profile=None):
+        self.literals = {}
+        self.active = set()
+        self.last_values = None
+        self.solver = make_solver(time_limit_seconds, profile)
+
+    def _check_date(self, entry, date):
+        if date not in self.calendar.day_index:
+            raise ValueError(f"What-if entry {entry!r}: {date} is not a day of "
+                             f"{self.calendar.year}-{self.calendar.month:02d}")
+
+    def _check_doctor(self, entry, doc):
+        if doc not in self.doctors:
+            raise ValueError(f"What-if entry {entry!r}: unknown doctor {doc!r}")
+
+    def _validate(self, entries):
+        """Check every entry not yet in the model, before any of them changes the session."""
+        for entry in entries:
+            if entry not in self.literals:
+                if not isinstance(entry, tuple) or not entry:
+                    raise ValueError(f"Unknown what-if entry {entry!r}")
+                self._check_entry(entry)
+
+    def _literal(self, entry):
+        """Literal of a roster entry, created (with its constraints) the first time it is used."""
+        if entry not in self.literals:
+            literal = self.model.NewBoolVar(f"entry_{len(self.literals)}")
+            self._add_entry(entry, literal)
+            self.literals[entry] = literal
+        return self.literals[entry]
+
+    def _solve(self, entries):
+        self._validate(entries)
+        model = self.model
+        model.ClearAssumptions()
+        model.AddAssumptions([self._literal(entry) for entry in entries])
+        model.ClearHints()
+        if self.last_values is not None:
+            for index, value in enumerate(self.last_values):
+                model.AddHint(model.GetIntVarFromProtoIndex(index), value)
+
+        solver = self.solver
+        status = solver.Solve(model)
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            self.last_values = [
+                solver.Value(model.GetIntVarFromProtoIndex(index))
+                for index in range(len(model.Proto().variables))
+            ]
+            return WhatIfResult(solver.StatusName(status), self.extract(solver.Value),
+                                solver.ObjectiveValue(), [], solver.WallTime())
+        conflicts = []
+        if status == cp_model.INFEASIBLE:
+            _, core = explain_infeasibility(model, {entry: self.literals[entry] for entry in entries},
+                                            solver.parameters.max_time_in_seconds)
+            conflicts = sorted(core or [])
+        return WhatIfResult(solver.StatusName(status), None, None, conflicts, solver.WallTime())
+
+    def solve(self):
+        """Solve the current roster."""
+        return self._solve(self.active)
+
+    def what_if(self, add=(), remove=()):
+        """
+        Solve the roster with `add` entries switched on and `remove` entries switched off,
+        without changing the session's roster.
+        """
+        return self._solve((self.active | set(add)) - set(remove))
+
+    def commit(self, add=(), remove=()):
+        """Make a what-if change part of the session's roster and solve it."""
+        self._validate(add)
+        self.active = (self.active | set(add)) - set(remove)
+        return self.solve()
+
+
+class RealShiftSession(_WhatIfSession):
+    """
+    What-if session over the real_shift model.
+    Entries:
+        ("off", doctor, date)          doctor has the day off
+        ("pin", date, doctor)          doctor must work that day
+        ("no_shift", date, doctor, shift)  doctor may not take that shift ("ER" or "ward")
+    The two real_shift objectives are combined with weights that keep their priority
+    (one co-work day outweighs any max double-day difference), since fixing stage values
+    as in generate_real_schedule would freeze the persistent model.
+    """
+
+    def __init__(self, calendar, doctor_data, date_doubles, doctor_date_off=None, pinned=None, no_shift=None,
+                 time_limit_seconds=10, profile=None):
+        super().__init__(time_limit_seconds, profile)
+        # Built without any roster entry and without symmetry breaking: the doctor
+        # equivalence classes change as entries are toggled.
+        self.rm = build_real_model(calendar, doctor_data, date_doubles, symmetry_breaking=False)
+        self.model = self.rm.model
+        self.calendar = calendar
+        self.doctors = self.rm.doctors
+        self.extract = self.rm.extract_schedule
+        double_weight = len(date_doubles) + 1
+        self.model.Maximize(double_weight * self.rm.co_work_count - self.rm.max_double)
+
+        for doc, dates in (doctor_date_off or {}).items():
+            self.active.update(("off", doc, d) for d in dates if d in calendar.day_index)
+        self.active.update(("pin", d, doc) for d, doc in (pinned or {}).items())
+        for day_num, doc, shift in (no_shift or []):
+            if not 1 <= day_num <= len(calendar.days):
+                raise ValueError(f"no_shift row {(day_num, doc, shift)!r}: day {day_num} is not in "
+                                 f"{calendar.year}-{calendar.month:02d}")
+            self.active.add(("no_shift", datetime.date(calendar.year, calendar.month, day_num), doc, shift))
+        self._validate(self.active)
+
+    def _check_entry(self, entry):
+        kind = entry[0]
+        if kind in ("off", "pin") and len(entry) == 3:
+            doc, date = (entry[1], entry[2]) if kind == "off" else (entry[2], entry[1])
+        elif kind == "no_shift" and len(entry) == 4:
+            _, date, doc, shift = entry
+            if shift not in ("ER", "ward"):
+                raise ValueError(f"What-if entry {entry!r}: shift must be 'ER' or 'ward'")
+        else:
+            raise ValueError(f"Unknown what-if entry {entry!r}")
+        self._check_doctor(entry, doc)
+        self._check_date(entry, date)
+
+    def _add_entry(self, entry, literal):
+        kind, model = entry[0], self.model
+        if kind == "off":
+            _, doc, date = entry
+            i = self.doctors.index(doc)
+            model.Add(self.rm.er[date][i] == 0).OnlyEnforceIf(literal)
+            model.Add(self.rm.ward[date][i] == 0).OnlyEnforceIf(literal)
+        elif kind == "pin":
+            _, date, doc = entry
+            i = self.doctors.index(doc)
+            model.AddBoolOr([self.rm.er[date][i], self.rm.ward[date][i]]).OnlyEnforceIf(literal)
+        elif kind == "no_shift":
+            _, date, doc, shift = entry
+            variables = self.rm.er if shift == "ER" else self.rm.ward
+            model.Add(variables[date][self.doctors.index(doc)] == 0).OnlyEnforceIf(literal)
+        else:
+            raise ValueError(f"Unknown what-if entry {entry!r}")
+
+
+class ScheduleSession(_WhatIfSession):
+    """
+    What-if session over the schedule_ortools month model.
+    Entries:
+        ("off", doctor, date)             doctor takes no ER/ward shift that day
+        ("autopsy", doctor, date, time)   autopsy at shift time `time`, with its blocked neighbours
+    autopsy_data entries outside the month are left out, like days off outside it in
+    RealShiftSession; an entry passed to a query must fall inside the month.
+    """
+
+    def __init__(self, calendar, doctor_data, autopsy_data=None, time_limit_seconds=10, profile=None):
+        super().__init__(time_limit_seconds, profile)
+        if autopsy_data is None:
+            autopsy_data = DOCTOR_AUTOPSY_DATA
+        # Built without autopsy pruning so every (slot, doctor) variable exists
+        self.sm = build_schedule_model(calendar, adjust_doctor_data(doctor_data), autopsy_data={})
+        self.model = self.sm.model
+        self.calendar = calendar
+        self.doctors = self.sm.doctors
+        self.extract = self.sm.extract_schedule
+        self.slots_at = {}
+        for s, (date, _, shift_time, _) in enumerate(self.sm.slots):
+            self.slots_at.setdefault((calendar.day_index[date], SHIFT_TIME_INDEX[shift_time]), []).append(s)
+        for doc, entries in autopsy_data.items():
+            self.active.update(("autopsy", doc, date, shift_time) for date, shift_time in entries
+                               if date in calendar.day_index)
+        self._validate(self.active)
+
+    def _check_entry(self, entry):
+        kind = entry[0]
+        if kind == "off" and len(entry) == 3:
+            _, doc, date = entry
+        elif kind == "autopsy" and len(entry) == 4:
+            _, doc, date, shift_time = entry
+            if shift_time not in SHIFT_TIME_INDEX:
+                raise ValueError(f"What-if entry {entry!r}: shift time must be one of {', '.join(SHIFT_TIME_INDEX)}")
+        else:
+            raise ValueError(f"Unknown what-if entry {entry!r}")
+        self._check_doctor(entry, doc)
+        self._check_date(entry, date)
+
+    def _add_entry(self, entry, literal):
+        kind, model = entry[0], self.model
+        if kind == "off":
+            _, doc, date = entry
+            i = self.doctors.index(doc)
+            day = self.calendar.day_index[date]
+            for t in range(3):
+                for s in self.slots_at.get((day, t), []):
+                    model.Add(self.sm.x[s][i] == 0).OnlyEnforceIf(literal)
+        elif kind == "autopsy":
+            _, doc, date, shift_time = entry
+            i = self.doctors.index(doc)
+            for key in autopsy_blocked_times(self.calendar, date, SHIFT_TIME_INDEX[shift_time]):
+                for s in self.slots_at.get(key, []):
+                    model.Add(self.sm.x[s][i] == 0).OnlyEnforceIf(literal)
+        else:
+            raise ValueError(f"Unknown what-if entry {entry!r}")
+
+
+def real_shift_session(year, month, doctor_data, date_doubles, doctor_date_off=None, pinned=None, no_shift=None,
+                       calendar=None, time_limit_seconds=10, profile=None):
+    """RealShiftSession for a month, solved once so later queries start from a hint."""
+    calendar = calendar or get_month_calendar(year, month)
+    session = RealShiftSession(calendar, doctor_data, date_doubles, doctor_date_off=doctor_date_off,
+                               pinned=pinned, no_shift=no_shift, time_limit_seconds=time_limit_seconds,
+                               profile=profile)
+    session.solve()
+    return session
+
+
+def schedule_session(year, month, doctor_data, autopsy_data=None, calendar=None, time_limit_seconds=10,
+                     profile=None):
+    """ScheduleSession for a month, solved once so later queries start from a hint."""
+    calendar = calendar or get_month_calendar(year, month)
+    session = ScheduleSession(calendar, doctor_data, autopsy_data=autopsy_data,
+                              time_limit_seconds=time_limit_seconds, profile=profile)
+    session.solve()
+    return session